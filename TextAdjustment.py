@@ -1,4 +1,4 @@
-import sys
+import sys, multiprocessing
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QFont
 from gui import MainWindow, UI_FONT_FAMILY
@@ -11,4 +11,5 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # exe化時、見積もり等のプロセスプールのため
     main()
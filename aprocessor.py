@@ -0,0 +1,136 @@
+import asyncio, threading
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from archives import archive_kind, ArchiveCanceled
+from rules import ruleset_for
+from processor import (
+    DEFAULT_TEXT_EXTS, PROCESSED_STATUSES, PatternTimeout, decode_for, init_stats, iter_batch_targets,
+    needs_line_streaming, process_file, process_text, transform_bytes, validate_settings, write_bytes_output,
+)
+from report import start_report, write_diff_part, finish_report
+from utils import lower_exts, read_if_text
+
+# ===== asyncio 用API =====
+# CPU処理（変換）は executor（省略時はイベントループ既定のスレッドプール。ProcessPoolExecutor も可）へ、
+# ファイルの読み書きは asyncio.to_thread へ逃がし、イベントループを塞がない。
+# 進捗はコールバックではなく非同期イテレータのイベントdictで返す:
+#   {"event": "total", "total": N}
+#   {"event": "file", "path": 相対パス, "status": "written"/"unchanged"/..., "done": k, "total": N}
+#   {"event": "done", "count": 処理できた件数, "stats": 集計dict}
+# キャンセルは呼び出し側タスクの cancel() で行う（未着手のファイルは処理しない。書き込みは一時ファイル経由
+# なので途中のファイルが中途半端に残ることはない）。
+# settings["diff_report_dir"] による差分レポートは process_directory と同じ形で出す（差分は executor で作る）。
+# ※ settings["journal_dir"] によるジャーナル出力は process_directory / cli.py 側のみ対応。
+
+DEFAULT_CONCURRENCY = 4
+
+async def aprocess_text(text: str, settings: dict, executor: Optional[Executor] = None) -> str:
+    """process_text の非同期版"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, process_text, text, settings)
+
+def _write_diff_part(settings: dict, rel: str, raw: bytes, data: bytes) -> None:
+    """差分レポートの1ファイル分（executor 上で実行）"""
+    write_diff_part(settings, rel, decode_for(raw, settings), decode_for(data, settings))
+
+async def _aprocess_file(p: Path, rel: str, src_root: Path, dst_root: Path, settings: dict, stats: dict,
+                         executor: Optional[Executor], canceled: threading.Event, exts_low: frozenset) -> str:
+    """1ファイル分。結果と stats の数え方は processor.process_file と同じ。exts_low は対象の拡張子（小文字）"""
+    if settings.get("archives", False) and p.suffix.lower() not in exts_low and archive_kind(p) \
+            or needs_line_streaming(p, settings):
+        # アーカイブと、全体を読まずに重複削除/並べ替えする大きいファイルは、読み書きと変換がストリームで
+        # 交互に進むので、まとめてスレッドで処理する
+        local = init_stats()
+        status = await asyncio.to_thread(process_file, p, src_root, dst_root, settings, local,
+                                         canceled.is_set)
+        for k, v in local.items():
+            if isinstance(v, list): stats[k].extend(v)
+            else: stats[k] += v
+        return status
+    loop = asyncio.get_running_loop()
+    try:
+        raw = await asyncio.to_thread(read_if_text if settings.get("skip_binary", True) else Path.read_bytes, p)
+        if raw is None:
+            stats["binary"] += 1; stats["binary_files"].append(rel)
+            return "binary"
+        data = await loop.run_in_executor(executor, transform_bytes, raw, settings)
+        if settings.get("diff_report_dir") and data != raw:
+            await loop.run_in_executor(executor, _write_diff_part, settings, rel, raw, data)
+        written = await asyncio.to_thread(write_bytes_output, dst_root / rel, data, settings)
+    except PatternTimeout:
+        stats["timed_out"] += 1; stats["timed_out_files"].append(rel)
+        return "timed_out"
+    except Exception:
+        stats["failed"] += 1
+        return "failed"
+    status = "written" if written else "unchanged"
+    stats[status] += 1
+    return status
+
+async def aprocess_directory(
+    in_dir: str, out_dir: str, settings: dict,
+    executor: Optional[Executor] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    stats: Optional[dict] = None
+) -> AsyncIterator[dict]:
+    """process_directory の非同期版。進捗イベントを順に返す非同期ジェネレータ。
+    同時に処理するファイル数は semaphore（省略時は Semaphore(concurrency)）で制限する。
+    複数の呼び出しで同じ semaphore を渡せば、サービス全体での同時実行数を揃えられる。
+    settings["diff_report_dir"] があれば差分レポートを書き、書いたファイルを stats["diff_reports"] に残す
+    （キャンセル時もそこまでに処理した分は出す）。
+    設定中の正規表現や置換辞書が不正なら、1件も処理せずに PatternError / DictionaryError を送出する。"""
+    await asyncio.to_thread(validate_settings, settings)
+    src_root = Path(in_dir); dst_root = Path(out_dir)
+    stats = init_stats(stats)
+    report = bool(settings.get("diff_report_dir")); reported: list = []
+    if report:
+        await asyncio.to_thread(start_report, settings)
+    sem = semaphore or asyncio.Semaphore(max(1, concurrency))
+    canceled = threading.Event()
+    exts_low = lower_exts(settings.get("exts") or DEFAULT_TEXT_EXTS)  # ルールでは変わらない（FIXED_KEYS）
+
+    rules = await asyncio.to_thread(ruleset_for, settings)
+    targets = await asyncio.to_thread(lambda: list(iter_batch_targets(in_dir, settings)))
+    total = len(targets)
+    yield {"event": "total", "total": total}
+
+    async def one(p: Path, rel: str):
+        async with sem:
+            eff = rules.settings_for(rel) if rules else settings
+            return rel, await _aprocess_file(p, rel, src_root, dst_root, eff, stats, executor, canceled, exts_low)
+
+    # 未着手のタスクを大量に抱えないよう、同時実行数の2倍までずつ投入する
+    window = max(1, concurrency) * 2
+    pending: set = set()
+    it = iter(targets)
+    done_count = 0; count = 0
+    try:
+        while True:
+            while len(pending) < window:
+                nxt = next(it, None)
+                if nxt is None: break
+                pending.add(asyncio.ensure_future(one(*nxt)))
+            if not pending:
+                break
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in finished:
+                try:
+                    rel, status = t.result()
+                except ArchiveCanceled:
+                    continue
+                done_count += 1
+                if status in PROCESSED_STATUSES:
+                    count += 1
+                    if report: reported.append(rel)
+                yield {"event": "file", "path": rel, "status": status, "done": done_count, "total": total}
+    finally:
+        if pending:
+            # キャンセル・途中での break 時：投入済みのタスクも止め、アーカイブ処理には中断を知らせる
+            canceled.set()
+            for t in pending: t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if report:
+            stats["diff_reports"].extend(await asyncio.to_thread(finish_report, settings, reported))
+    yield {"event": "done", "count": count, "stats": stats}
@@ -0,0 +1,115 @@
+import copy, gzip, bz2, io, lzma, shutil, tarfile, zipfile
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+from utils import atomic_open
+
+# ===== アーカイブ/圧縮ファイルのストリーム処理 =====
+# 一時展開はせず、メンバーを順に読み → 変換 → 同じ形式の出力アーカイブへ順に書き込む。
+# 対象拡張子に一致しないメンバーはそのままコピーする。
+
+COPY_CHUNK = 1 << 20
+
+# 長いものから判定（.tar.gz を .gz より先に）
+_TAR_SUFFIXES = {
+    ".tar.gz": "gz", ".tgz": "gz", ".tar.bz2": "bz2", ".tbz2": "bz2",
+    ".tar.xz": "xz", ".txz": "xz", ".tar": "",
+}
+_SINGLE_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+class ArchiveCanceled(Exception):
+    """アーカイブ処理の途中でキャンセルされた（出力は書き換えない）"""
+
+def archive_kind(p: Path) -> Optional[str]:
+    """アーカイブ種別: zip / tar / single（.gz/.bz2/.xz 単体）、対象外なら None"""
+    name = p.name.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if any(name.endswith(sfx) for sfx in _TAR_SUFFIXES):
+        return "tar"
+    if any(name.endswith(sfx) for sfx in _SINGLE_OPENERS):
+        return "single"
+    return None
+
+def _is_target(name: str, exts_low: set) -> bool:
+    return Path(name).suffix.lower() in exts_low
+
+def process_archive(
+    src: Path, dst: Path, exts: Iterable[str], transform: Callable[[bytes], bytes],
+    is_canceled: Optional[Callable[[], bool]] = None
+) -> Optional[int]:
+    """src を読みながら dst に同形式で書き出し、変換したメンバー数を返す。
+    単体圧縮ファイルの中身が対象拡張子でなければ何も書かずに None を返す。"""
+    exts_low = {e.lower() for e in exts}
+    kind = archive_kind(src)
+    if kind == "zip":
+        return _process_zip(src, dst, exts_low, transform, is_canceled)
+    if kind == "tar":
+        return _process_tar(src, dst, exts_low, transform, is_canceled)
+    if kind == "single":
+        return _process_single(src, dst, exts_low, transform)
+    raise ValueError(f"未対応のアーカイブ: {src}")
+
+def _check_cancel(is_canceled):
+    if is_canceled and is_canceled():
+        raise ArchiveCanceled()
+
+def _process_zip(src, dst, exts_low, transform, is_canceled) -> int:
+    count = 0
+    with zipfile.ZipFile(src) as zin, atomic_open(dst) as f, zipfile.ZipFile(f, "w") as zout:
+        for info in zin.infolist():
+            _check_cancel(is_canceled)
+            out_info = copy.copy(info)
+            if info.is_dir():
+                zout.writestr(out_info, b"")
+            elif _is_target(info.filename, exts_low):
+                zout.writestr(out_info, transform(zin.read(info)))
+                count += 1
+            else:
+                with zin.open(info) as r, zout.open(out_info, "w", force_zip64=info.file_size > 0x7FFFFFFF) as w:
+                    shutil.copyfileobj(r, w, COPY_CHUNK)
+    return count
+
+def _tar_compression(src: Path) -> str:
+    name = src.name.lower()
+    for sfx, comp in _TAR_SUFFIXES.items():
+        if name.endswith(sfx):
+            return comp
+    return ""
+
+def _process_tar(src, dst, exts_low, transform, is_canceled) -> int:
+    count = 0
+    comp = _tar_compression(src)
+    # "r|*" / "w|gz" はシーク不要のストリームモード
+    with tarfile.open(src, mode="r|*") as tin, atomic_open(dst) as f, \
+         tarfile.open(fileobj=f, mode=f"w|{comp}") as tout:
+        for member in tin:
+            _check_cancel(is_canceled)
+            if member.isfile() and _is_target(member.name, exts_low):
+                data = transform(tin.extractfile(member).read())
+                out_member = copy.copy(member); out_member.size = len(data)
+                tout.addfile(out_member, io.BytesIO(data))
+                count += 1
+            elif member.isfile():
+                tout.addfile(member, tin.extractfile(member))
+            else:
+                tout.addfile(member)
+    return count
+
+def _process_single(src, dst, exts_low, transform) -> Optional[int]:
+    name = src.name
+    sfx = Path(name).suffix.lower()
+    inner = name[: -len(sfx)]
+    if not _is_target(inner, exts_low):
+        return None
+    opener = _SINGLE_OPENERS[sfx]
+    with opener(src, "rb") as r:
+        data = transform(r.read())
+    with atomic_open(dst) as f:
+        if sfx == ".gz":
+            # 元のファイル名をヘッダへ残す
+            with gzip.GzipFile(filename=inner, mode="wb", fileobj=f) as w:
+                w.write(data)
+        else:
+            with opener(f, "wb") as w:
+                w.write(data)
+    return 1
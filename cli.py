@@ -0,0 +1,131 @@
+import argparse, json, sys, threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from processor import process_directory, DEFAULT_TEXT_EXTS, PatternError
+from shards import parse_shard, merge_journals, JOURNAL_DIRNAME
+from watch import FolderWatcher, WATCH_INTERVAL, WATCH_DEBOUNCE
+from dryrun import dry_run_directory, format_dry_run, DRY_RUN_SAMPLE
+from report import report_settings, REPORT_DIRNAME, REPORT_FORMATS
+
+# ===== コマンドライン版（バッチ/監視） =====
+# 例) python cli.py 入力フォルダ 出力フォルダ --settings settings.json --watch
+# settings.json は processor.process_text に渡す設定dictと同じ形式（"exts" はリストで可）。
+# 分割実行) 各ノードで --shard 1/4 … --shard 4/4 を実行し、最後に --merge-journals で集約する。
+#   python cli.py 入力 共有出力 --shard 2/4
+#   python cli.py --merge-journals 共有出力/.textadjustment-journal --report report.json
+# 見積もり) python cli.py 入力 --dry-run --sample 300 --workers 8   （書き込みなし。出力フォルダは不要。処理時間は --workers の並列数で見積もる）
+# 差分レポート) python cli.py 入力 出力 --diff-report --workers 8   （出力/.textadjustment-report へ patch とHTML）
+
+def load_settings(path: str | None) -> dict:
+    settings: dict = {}
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+    exts = settings.get("exts")
+    settings["exts"] = {e if e.startswith(".") else f".{e}" for e in exts} if exts else set(DEFAULT_TEXT_EXTS)
+    return settings
+
+def _summary(stats: dict) -> str:
+    msg = f"書き込み {stats['written']} / 変更なし {stats['unchanged']} / 失敗 {stats['failed']}"
+    if stats.get("binary"):
+        msg += f" / バイナリのため除外 {stats['binary']}"
+    if stats.get("timed_out"):
+        msg += f" / 正規表現タイムアウト {stats['timed_out']}: " + ", ".join(stats["timed_out_files"])
+    if stats.get("diff_reports"):
+        msg += "\n差分レポート: " + ", ".join(stats["diff_reports"])
+    return msg
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="TextAdjustment", description="テキスト整形（バッチ/フォルダ監視）")
+    ap.add_argument("in_dir", nargs="?", help="入力フォルダ")
+    ap.add_argument("out_dir", nargs="?", help="出力フォルダ（階層を維持して出力）")
+    ap.add_argument("--settings", help="設定JSONファイル")
+    ap.add_argument("--watch", action="store_true", help="入力フォルダを監視し、変更されたファイルを再処理し続ける")
+    ap.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="監視の走査間隔（秒）")
+    ap.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE, help="変更が落ち着くまで待つ時間（秒）")
+    ap.add_argument("--rules", help="globごとの設定上書きを書いたJSON（rules.py 参照）")
+    ap.add_argument("--shard", help="i/N: 相対パスのハッシュで分割し、i番目（1始まり）だけを処理")
+    ap.add_argument("--journal-dir", help=f"1ファイル1行の結果を書くフォルダ（--shard時の既定: 出力/{JOURNAL_DIRNAME}）")
+    ap.add_argument("--merge-journals", metavar="DIR", help="各シャードのジャーナルを集約して表示（処理はしない）")
+    ap.add_argument("--report", help="--merge-journals の結果をJSONで保存")
+    ap.add_argument("--diff-report", nargs="?", const="", metavar="DIR",
+                    help=f"変更されたファイルの差分レポートを書く（既定: 出力/{REPORT_DIRNAME}）")
+    ap.add_argument("--diff-format", choices=REPORT_FORMATS, action="append",
+                    help="差分レポートの形式（patch / html。複数指定可、省略時は両方）")
+    ap.add_argument("--preserve-format", action="store_true",
+                    help="入力の文字コード・BOM・改行のまま出力する（既定はUTF-8）")
+    ap.add_argument("--workers", type=int, default=0, help="N>0 ならN個のプロセスで並列に処理（差分もワーカーで作る）")
+    ap.add_argument("--dry-run", action="store_true", help="サンプルを試行して変更件数や処理時間を見積もる（書き込みなし）")
+    ap.add_argument("--sample", type=int, default=DRY_RUN_SAMPLE, help="--dry-run で試行するファイル数")
+    ap.add_argument("--random-sample", action="store_true", help="--dry-run の抽出を拡張子別の層別ではなく単純ランダムにする")
+    return ap
+
+def main(argv=None) -> int:
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    if args.merge_journals:
+        report = merge_journals(args.merge_journals, args.report)
+        print(f"{report['files']} 件: " + ", ".join(f"{k} {v}" for k, v in report["totals"].items()))
+        if report["missing_shards"]:
+            print("未完了のシャード: " + ", ".join(map(str, report["missing_shards"])))
+        for rec in report["problems"]:
+            print(f"{rec['status']}: {rec['path']}")
+        return 1 if report["missing_shards"] or report["problems"] else 0
+    if args.dry_run and args.in_dir:
+        try:
+            settings = load_settings(args.settings)
+            if args.rules:
+                settings["rules_file"] = args.rules
+            if args.shard:
+                settings["shard"] = parse_shard(args.shard)
+            print(format_dry_run(dry_run_directory(args.in_dir, settings, sample_size=args.sample,
+                                                   stratified=not args.random_sample,
+                                                   batch_workers=max(1, args.workers))))
+            return 0
+        except (PatternError, ValueError) as e:
+            print(e, file=sys.stderr)
+            return 2
+    if not args.in_dir or not args.out_dir:
+        ap.error("入力フォルダと出力フォルダを指定してください")
+    try:
+        settings = load_settings(args.settings)
+        if args.rules:
+            settings["rules_file"] = args.rules
+        if args.preserve_format:
+            settings["preserve_format"] = True
+        if args.shard:
+            settings["shard"] = parse_shard(args.shard)
+            settings["journal_dir"] = args.journal_dir or str(Path(args.out_dir) / JOURNAL_DIRNAME)
+        elif args.journal_dir:
+            settings["journal_dir"] = args.journal_dir
+        if args.watch:
+            def report(p: Path, ok: bool):
+                print(("更新: " if ok else "失敗: ") + str(p), flush=True)
+            watcher = FolderWatcher(args.in_dir, args.out_dir, settings,
+                                    interval=args.interval, debounce=args.debounce, on_processed=report)
+            stop = threading.Event()
+            print(f"監視中: {args.in_dir} → {args.out_dir}（Ctrl+Cで終了）", flush=True)
+            try:
+                watcher.run(stop)
+            except KeyboardInterrupt:
+                stop.set()
+            print(_summary(watcher.stats))
+            return 0
+        if args.diff_report is not None:
+            settings = report_settings(settings, args.out_dir, args.diff_format)
+            if args.diff_report:
+                settings["diff_report_dir"] = args.diff_report
+        stats: dict = {}
+        if args.workers > 0:
+            with ProcessPoolExecutor(max_workers=args.workers) as ex:
+                count = process_directory(args.in_dir, args.out_dir, settings, stats=stats, executor=ex)
+        else:
+            count = process_directory(args.in_dir, args.out_dir, settings, stats=stats)
+        print(f"{count} 件を処理しました。" + _summary(stats))
+        return 1 if stats["failed"] or stats["timed_out"] else 0
+    except (PatternError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
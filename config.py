@@ -1,8 +1,11 @@
-import json, os, sys
+import atexit, json, os, sys, threading
 from pathlib import Path
+from utils import atomic_write_bytes
 
 APP_NAME = "TextAdjustment"
 CFG_FILENAME = "[config]TextAdjustment_config.json"
+SCHEMA_VERSION = 1      # 設定JSONの形式バージョン（"_schema" キーに保存）
+SAVE_DEBOUNCE = 1.0     # この秒数内の連続保存は1回の書き込みにまとめる
 
 
 def _resolve_base_dir() -> Path:
@@ -21,24 +24,94 @@ CFG_PATH: Path = CFG_DIR / CFG_FILENAME
 CFG_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _migrate(cfg: dict) -> dict:
+    """古い形式の設定を現行スキーマへ更新する（"_schema" 無し = v0）"""
+    version = cfg.get("_schema", 0)
+    if version < 1:
+        # v0 → v1: キー構成は同じ。バージョン番号だけ付与
+        cfg["_schema"] = 1
+    return cfg
+
+
+class ConfigStore:
+    """設定dictをメモリに保持し、保存は遅延してまとめて行う。
+    書き込みは一時ファイル＋renameで原子的に行い、直前の内容を .bak に残す。"""
+
+    def __init__(self, path: Path, debounce: float = SAVE_DEBOUNCE):
+        self.path = Path(path)
+        self.backup_path = self.path.with_name(self.path.name + ".bak")
+        self.debounce = debounce
+        self.data: dict = {}
+        self._lock = threading.Lock()        # _pending / _timer 用
+        self._write_lock = threading.Lock()  # 書き込みの直列化
+        self._pending: bytes | None = None
+        self._timer: threading.Timer | None = None
+
+    def load(self) -> dict:
+        """本体が壊れていればバックアップから読む。どちらも無ければ空の設定"""
+        for p in (self.path, self.backup_path):
+            try:
+                with p.open("r", encoding="utf-8") as f:
+                    cfg = json.load(f)
+                if isinstance(cfg, dict):
+                    self.data = _migrate(cfg)
+                    return self.data
+            except Exception:
+                continue
+        self.data = {"_schema": SCHEMA_VERSION}
+        return self.data
+
+    def save(self, cfg: dict | None = None) -> None:
+        """保存を予約する。内容はこの時点のものを確定し、書き込みは debounce 秒後"""
+        if cfg is not None:
+            self.data = cfg
+        self.data["_schema"] = SCHEMA_VERSION
+        try:
+            blob = json.dumps(self.data, ensure_ascii=False, indent=2).encode("utf-8")
+        except Exception:
+            return
+        with self._lock:
+            self._pending = blob
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        """予約中の保存があれば今すぐ書き込む"""
+        with self._lock:
+            blob, self._pending = self._pending, None
+            if self._timer is not None:
+                self._timer.cancel(); self._timer = None
+        if blob is None:
+            return
+        with self._write_lock:
+            try:
+                if self.path.exists():
+                    atomic_write_bytes(self.backup_path, self.path.read_bytes(), skip_unchanged=True)
+                atomic_write_bytes(self.path, blob, skip_unchanged=True, fsync=True)
+            except Exception:
+                pass
+
+
+_store = ConfigStore(CFG_PATH)
+atexit.register(_store.flush)
+
+
 def load_config() -> dict:
     """設定をJSONから読み込み"""
-    try:
-        if CFG_PATH.exists():
-            with CFG_PATH.open("r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return {}
+    return _store.load()
 
 
 def save_config(cfg: dict) -> None:
-    """設定をJSONへ保存"""
-    try:
-        with CFG_PATH.open("w", encoding="utf-8") as f:
-            json.dump(cfg, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    """設定をJSONへ保存（遅延・まとめ書き）"""
+    _store.save(cfg)
+
+
+def flush_config() -> None:
+    """遅延中の設定保存を即時に書き出す（終了時など）"""
+    _store.flush()
 
 
 def get_config_path() -> str:
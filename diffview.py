@@ -0,0 +1,46 @@
+import difflib, html
+
+# ===== 差分ハイライト（Qtに依存しないので、ワーカープロセスやバッチの差分レポートからも使う） =====
+DIFF_STYLE = (
+    "body{background:#ffffff;color:#000000;font-family:inherit;}"
+    ".line{white-space:pre-wrap; min-height:1.2em;}"  # 空行可視化
+    ".eq{} .chg{background:#ccffff;} .del{background:#ccffff;} .ins{background:#ccffff;}"
+)
+
+def _html_line(s: str) -> str:
+    """空行も高さが出るように &nbsp; として埋め、HTMLエスケープも行う"""
+    if s == "":
+        return "&nbsp;"
+    return html.escape(s)
+
+def diff_lines_html(src_text: str, dst_text: str) -> tuple[str, str]:
+    """左右の行を <div class='line ...'> の並びにする（<body> の中身だけ）"""
+    src_lines = src_text.splitlines()
+    dst_lines = dst_text.splitlines()
+    sm = difflib.SequenceMatcher(a=src_lines, b=dst_lines)
+    left_html = []
+    right_html = []
+
+    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+        if tag == "equal":
+            for ln in src_lines[i1:i2]:
+                left_html.append(f"<div class='line eq'>{_html_line(ln)}</div>")
+            for ln in dst_lines[j1:j2]:
+                right_html.append(f"<div class='line eq'>{_html_line(ln)}</div>")
+        elif tag == "delete":
+            for ln in src_lines[i1:i2]:
+                left_html.append(f"<div class='line del'>{_html_line(ln)}</div>")
+        elif tag == "insert":
+            for ln in dst_lines[j1:j2]:
+                right_html.append(f"<div class='line ins'>{_html_line(ln)}</div>")
+        elif tag == "replace":
+            for ln in src_lines[i1:i2]:
+                left_html.append(f"<div class='line chg'>{_html_line(ln)}</div>")
+            for ln in dst_lines[j1:j2]:
+                right_html.append(f"<div class='line chg'>{_html_line(ln)}</div>")
+    return "".join(left_html), "".join(right_html)
+
+def render_diff_html(src_text: str, dst_text: str) -> tuple[str, str]:
+    head = f"<html><head><meta charset='utf-8'><style>{DIFF_STYLE}</style></head><body>"
+    left, right = diff_lines_html(src_text, dst_text)
+    return head + left + "</body></html>", head + right + "</body></html>"
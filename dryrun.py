@@ -0,0 +1,148 @@
+import math, os, random, sys, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from archives import archive_kind
+from rules import ruleset_for
+from utils import read_if_text
+from processor import (
+    BATCH_CHUNK, DEFAULT_TEXT_EXTS, decode_for, iter_batch_targets, transform_bytes, validate_settings,
+)
+
+# ===== 見積もり（サンプルによる試行・書き込みなし） =====
+# 対象ファイルの一部だけを並列に処理して、バッチ全体の結果を推定する。
+# 抽出は拡張子ごとの層別（件数に比例して割り当て、各拡張子から最低1件）か単純ランダム。
+# 推定値は層ごとに「層の件数 / 抽出件数」倍して合計する。実行時間は層ごとの処理速度（秒/バイト）
+# × 層の総バイト数で CPU 時間を見積もり、本番のバッチの並列数（BATCH_CHUNK 件ずつのタスク数が
+# 上限）で割って経過時間とする（書き込み時間は含まない）。
+# アーカイブは中身の件数が事前に分からないため抽出せず、件数だけ "archives" に数える。
+
+DRY_RUN_SAMPLE = 200
+
+def default_workers() -> int:
+    """ProcessPoolExecutor の max_workers を省略した時のプロセス数（Windows は61まで）"""
+    n = os.cpu_count() or 1
+    return min(n, 61) if sys.platform == "win32" else n
+
+def _measure(path: str, settings: dict) -> dict:
+    """1ファイルを処理して差分の規模を数える（プロセスプール上で実行）"""
+    try:
+        t0 = time.perf_counter()
+        raw = read_if_text(Path(path)) if settings.get("skip_binary", True) else Path(path).read_bytes()
+        if raw is None:
+            return {"binary": True}
+        out = transform_bytes(raw, settings)
+        elapsed = time.perf_counter() - t0
+    except Exception as e:
+        return {"error": type(e).__name__}
+    if out == raw:
+        return {"bytes": len(raw), "seconds": elapsed, "changed": False,
+                "lines_added": 0, "lines_removed": 0, "chars_converted": 0}
+    src = decode_for(raw, settings); dst = decode_for(out, settings)
+    src_lines = Counter(src.split("\n")); dst_lines = Counter(dst.split("\n"))
+    # 改行の増減は行数に表れるので、文字の変化からは除く
+    lost = Counter(src.replace("\n", "")) - Counter(dst.replace("\n", ""))
+    return {"bytes": len(raw), "seconds": elapsed, "changed": True,
+            "lines_added": sum((dst_lines - src_lines).values()),
+            "lines_removed": sum((src_lines - dst_lines).values()),
+            "chars_converted": sum(lost.values())}
+
+def _sample(strata: dict, size: int, rng: random.Random) -> dict:
+    """層ごとに件数比例で抽出する（各層から最低1件）。{層: [(パス, 実効設定), ...]}"""
+    total = sum(len(v) for v in strata.values())
+    if total <= size:
+        return {k: list(v) for k, v in strata.items()}
+    picked = {}
+    for k, items in strata.items():
+        n = min(len(items), max(1, round(size * len(items) / total)))
+        picked[k] = rng.sample(items, n)
+    return picked
+
+def dry_run_directory(in_dir: str, settings: dict, sample_size: int = DRY_RUN_SAMPLE,
+                      stratified: bool = True, seed: Optional[int] = None,
+                      max_workers: Optional[int] = None, batch_workers: Optional[int] = None) -> dict:
+    """書き込まずにサンプルを処理し、process_directory 全体の結果を推定する。
+    戻り値の主なキー: total_files / sampled_files / changed_files / lines_added / lines_removed /
+    chars_converted / estimated_seconds（いずれも全体への推定値、件数系は四捨五入）。
+    estimated_seconds は CPU 時間の推定 cpu_seconds を並列数 workers で割った経過時間の目安。
+    batch_workers は本番のバッチのプロセス数（1 = 逐次、None = default_workers()）。
+    max_workers はサンプル試行のプロセス数で、1 ならプロセスを起こさずこのスレッドで処理する。
+    設定中の正規表現や置換辞書が不正なら PatternError / DictionaryError を送出する。"""
+    validate_settings(settings)
+    exts = {e.lower() for e in (settings.get("exts") or DEFAULT_TEXT_EXTS)}
+    rules = ruleset_for(settings)
+    strata: dict = {}; sizes: dict = {}; archives = 0
+    for p, rel in iter_batch_targets(in_dir, settings):
+        if p.suffix.lower() not in exts and archive_kind(p):
+            archives += 1; continue
+        key = p.suffix.lower() if stratified else "*"
+        strata.setdefault(key, []).append((str(p), rules.settings_for(rel) if rules else settings))
+        try: sizes[key] = sizes.get(key, 0) + os.path.getsize(p)
+        except OSError: pass
+    picked = _sample(strata, max(1, sample_size), random.Random(seed))
+    # 同じ実効設定（ルールのグループ）が続くように並べ、ワーカー内のパイプラインを使い回す
+    jobs = sorted(((k, path, eff) for k, items in picked.items() for path, eff in items),
+                  key=lambda j: id(j[2]))
+
+    if max_workers == 1 or len(jobs) <= 1:
+        results = [_measure(path, eff) for _, path, eff in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as ex:
+            results = list(ex.map(_measure, [j[1] for j in jobs], [j[2] for j in jobs],
+                                  chunksize=max(1, len(jobs) // 32)))
+
+    keys = ("changed_files", "lines_added", "lines_removed", "chars_converted")
+    report = {k: 0.0 for k in keys + ("binary_files",)}
+    report.update({"total_files": sum(len(v) for v in strata.values()), "sampled_files": len(jobs),
+                   "archives": archives, "failed_samples": 0, "cpu_seconds": 0.0, "by_ext": {}})
+    per: dict = {}
+    for (k, _, _), r in zip(jobs, results):
+        per.setdefault(k, []).append(r)
+    for k, rs in per.items():
+        ok = [r for r in rs if "error" not in r and "binary" not in r]
+        binary = sum(1 for r in rs if "binary" in r)
+        report["failed_samples"] += len(rs) - len(ok) - binary
+        # バイナリの推定件数は層内でサンプルに占める割合から
+        report["binary_files"] += len(strata[k]) * binary / len(rs)
+        if not ok: continue
+        scale = len(strata[k]) / (len(ok) + binary)
+        proj = {"files": len(strata[k]),
+                "changed_files": scale * sum(r["changed"] for r in ok),
+                "lines_added": scale * sum(r["lines_added"] for r in ok),
+                "lines_removed": scale * sum(r["lines_removed"] for r in ok),
+                "chars_converted": scale * sum(r["chars_converted"] for r in ok)}
+        sampled_bytes = sum(r["bytes"] for r in ok); seconds = sum(r["seconds"] for r in ok)
+        proj["cpu_seconds"] = (seconds / sampled_bytes * sizes.get(k, 0) if sampled_bytes
+                               else seconds * scale)
+        for name in keys:
+            report[name] += proj[name]
+        report["cpu_seconds"] += proj["cpu_seconds"]
+        report["by_ext"][k] = {name: (round(v) if name != "cpu_seconds" else v)
+                               for name, v in proj.items()}
+    for name in keys + ("binary_files",):
+        report[name] = round(report[name])
+    # 本番はグループ内の BATCH_CHUNK 件ずつを1タスクにするので、タスク数より多くは並列にならない
+    workers = batch_workers if batch_workers is not None else default_workers()
+    tasks = math.ceil(report["total_files"] / BATCH_CHUNK)
+    report["workers"] = max(1, min(workers, tasks)) if workers > 1 else 1
+    report["estimated_seconds"] = report["cpu_seconds"] / report["workers"]
+    return report
+
+def format_dry_run(report: dict) -> str:
+    """見積もり結果の表示用テキスト（GUI/CLI共通）"""
+    lines = [
+        f"対象: {report['total_files']} 件（うちサンプル {report['sampled_files']} 件を試行）",
+        f"変更されるファイル: 約 {report['changed_files']} 件",
+        f"行の増減: +{report['lines_added']} / -{report['lines_removed']}",
+        f"変換される文字: 約 {report['chars_converted']} 文字",
+        f"推定処理時間: 約 {report['estimated_seconds']:.1f} 秒（CPU時間 約 {report['cpu_seconds']:.1f} 秒"
+        f" ÷ {report['workers']} 並列、書き込みを除く）",
+    ]
+    if report["binary_files"]:
+        lines.append(f"バイナリと判定して除外: 約 {report['binary_files']} 件")
+    if report["archives"]:
+        lines.append(f"アーカイブ {report['archives']} 件は見積もりに含みません")
+    if report["failed_samples"]:
+        lines.append(f"サンプル中の失敗: {report['failed_samples']} 件")
+    return "\n".join(lines)
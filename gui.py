@@ -1,17 +1,30 @@
-import os, re, difflib, html
+import os, re, sys, threading, time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from PySide6.QtCore import Qt, QEvent, QPoint, QRect, QEasingCurve, QPropertyAnimation
+from PySide6.QtCore import (
+    Qt, QEvent, QPoint, QRect, QEasingCurve, QPropertyAnimation, QObject, QThread, Signal
+)
 from PySide6.QtGui import QIcon, QColor, QFont, QDragEnterEvent, QDropEvent
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, QFileDialog,
     QMessageBox, QDialog, QLabel, QGraphicsDropShadowEffect, QTextBrowser,
-    QCheckBox, QGroupBox, QFormLayout, QComboBox, QSplitter, QProgressDialog
+    QCheckBox, QGroupBox, QFormLayout, QComboBox, QSplitter, QProgressDialog, QSpinBox,
+    QListWidget, QListWidgetItem
 )
 from processor import (
-    process_text, process_directory, DEFAULT_TEXT_EXTS, enumerate_target_files
+    process_text, process_directory, write_output, settings_fingerprint, PipelineMemo, decode_input,
+    validate_settings, PatternError, PatternTimeout, DEFAULT_TEXT_EXTS, enumerate_target_files,
+    process_file_with_diff, detect_format, decode_with_format, new_cancel_flag, init_pool_worker
 )
-from utils import resource_path, is_text_like
-from config import load_config, save_config
+from replacer import DictionaryError
+from rules import RulesError
+from lineops import LINE_MEMORY_MB
+from dryrun import dry_run_directory, format_dry_run
+from diffview import render_diff_html
+from report import report_settings, REPORT_DIRNAME
+from watch import FolderWatcher
+from utils import resource_path, is_text_like, is_binary_file, lower_exts, window_codec, line_cut, LRUCache
+from config import load_config, save_config, flush_config
 
 # ====== スタイル定数 ======
 PRIMARY_COLOR    = "#4169e1"; HOVER_COLOR = "#7000e0"
@@ -26,6 +39,11 @@ PADDING_CARD     = 16; GAP_DEFAULT = 10; RESIZE_MARGIN = 8
 MENU_WIDTH       = 300
 UI_FONT_FAMILY   = "メイリオ"
 MAX_HISTORY      = 10  # 各入力欄の履歴件数
+PROGRESS_INTERVAL = 0.1  # バッチ進捗シグナルの最短送出間隔（秒）
+PREVIEW_CACHE_BYTES = 256 * 1024 * 1024  # 読み込み/プレビュー結果キャッシュの上限
+MAX_RECENT       = 20  # 最近のファイル（切替用）の件数
+LARGE_FILE_BYTES = 4 * 1024 * 1024   # これより大きいファイルは部分プレビュー
+PREVIEW_WINDOW_BYTES = 256 * 1024    # 部分プレビュー1回分の読み込み量（行境界で切る）
 
 def _build_qss(compact: bool = False) -> str:
     glass = "none" if compact else (
@@ -106,12 +124,14 @@ README_MD = r"""
 - **除外トークン**（`,`区切り・リテラル）：一致箇所には改行を入れません。
 - **行スキップ（正規表現）**：一致した行は処理対象から除外します。
 - **正規表現として扱う**：改行トークンを正規表現解釈に切り替え可能（設定メニュー）。
+- 正規表現は実行前に検証され、誤りがあればメッセージが出ます。実行には時間上限（1回の置換・1ファイル分の行判定ごとに既定2秒。1M文字ごとに延長）が掛かり、超えたファイルは「タイムアウト」として出力されません（`regex` モジュールが無い場合は別プロセスで実行して止めます）。
 
 ### 文字幅（半角/全角）変換
 - **モード**：`変更なし / 半角へ / 全角へ`
 - **対象の指定**：  
   - 任意の**対象文字列**欄に含めた文字のみ  
   - または **英語 / カタカナ / 数字 / 記号 / スペース** のチェックで一括指定
+- **全角へ** では半角カナの濁点/半濁点を合成します（`ｶﾞ`→`ガ`、`ﾊﾟ`→`パ`）。
 
 ### 行頭/行末の付加
 - 各行の**先頭**または**末尾**に任意の文字列を追加できます。
@@ -124,6 +144,8 @@ README_MD = r"""
 - **左右分割**で元/結果を表示。差分は **#ccffff** で強調。  
 - **左右スクロール同期**（比率連動）により、同じ付近を並べて確認できます。  
 - **等幅フォント**トグルで桁ズレを可視化しやすくできます。  
+- **大きいファイル**（4MB超）は先頭の一部だけを読み込んでプレビューします（設定でON/OFF）。「続きを読み込む」で次の範囲を追加表示し、保存時はファイル全体を処理します。  
+- **最近のファイル**（プレビュー下のプルダウン）で開いたファイルを切り替えられます。読み込み・変換・差分の結果はメモリに保持するため、同じファイル・同じ設定なら即座に表示されます。  
 - プレビュー背景は白、文字は黒で視認性を重視しています。
 
 ---
@@ -134,6 +156,8 @@ README_MD = r"""
   または、**フォルダをそのままドラッグ＆ドロップ**しても実行できます。
 - **再帰** をONにすると、サブフォルダも含めて処理します（**フォルダ階層は維持**して出力）。
 - 実行中は **進捗バー** が表示され、**キャンセル**が可能です。
+- **「監視」** をONにすると入力フォルダを監視し、追加・変更されたファイルだけを自動で出力フォルダへ処理し続けます（書き込みが落ち着いてから約1〜2秒で反映）。  
+  コマンドラインでは `python cli.py 入力 出力 --settings 設定.json --watch` で同じことができます。
 
 ---
 
@@ -141,7 +165,8 @@ README_MD = r"""
 
 - **単発読み込み時**は、設定の **エンコーディング自動判定（chardet）** を利用可能です。  
   失敗した場合はUTF-8で読み込みます。
-- **保存**はUTF-8で出力します。  
+- **保存**は既定でUTF-8（BOMなし）で出力します。設定の **「元の文字コード・BOM・改行のまま保存」** をONにすると、読み込んだファイルの文字コード（UTF-8 / CP932 / BOM付きUTF-16・32）・BOM・改行（CRLF/LF/CR）のまま書き出します（その文字コードで表せない文字が出力に含まれる場合は保存に失敗します）。  
+  一時ファイルに書いてから置き換えるため、中断しても途中までのファイルは残りません。  
 - **拡張子未入力で保存**した場合、読み込んだ元ファイルの拡張子を**自動付与**します（例：`.txt`）。
 
 ---
@@ -151,6 +176,8 @@ README_MD = r"""
 - **改行トークンを正規表現として扱う**（ON/OFF）  
 - **再帰（サブフォルダも処理）**（ON/OFF）  
 - **エンコーディング自動判定**（ON/OFF、単発読み込み時）  
+- **内容が同じファイルは書き込まない**（ON/OFF）：出力先に同一内容のファイルがあれば上書きしません  
+- **アーカイブ内も処理**（ON/OFF）：`.zip` `.tar.gz` `.gz` `.xz` などを展開せずに読み、対象拡張子のメンバーだけ変換して同じ形式で出力します  
 - **対象拡張子**：`.txt,.md,.csv` のように`,`区切りで指定
 
 ---
@@ -194,50 +221,6 @@ class ReadmeDialog(QDialog):
         row.addStretch(1); row.addWidget(close_btn); lay.addLayout(row)
         self.setStyleSheet(_build_qss(False))
 
-# ===== 差分ハイライト =====
-def _html_line(s: str) -> str:
-    """空行も高さが出るように &nbsp; として埋め、HTMLエスケープも行う"""
-    if s == "":
-        return "&nbsp;"
-    return html.escape(s)
-
-def render_diff_html(src_text: str, dst_text: str) -> tuple[str, str]:
-    src_lines = src_text.splitlines()
-    dst_lines = dst_text.splitlines()
-    sm = difflib.SequenceMatcher(a=src_lines, b=dst_lines)
-
-    head = (
-        "<html><head><meta charset='utf-8'><style>"
-        "body{background:#ffffff;color:#000000;font-family:inherit;}"
-        ".line{white-space:pre-wrap; min-height:1.2em;}"  # 空行可視化
-        ".eq{} .chg{background:#ccffff;} .del{background:#ccffff;} .ins{background:#ccffff;}"
-        "</style></head><body>"
-    )
-    left_html  = [head]
-    right_html = [head]
-
-    for tag, i1, i2, j1, j2 in sm.get_opcodes():
-        if tag == "equal":
-            for ln in src_lines[i1:i2]:
-                left_html.append(f"<div class='line eq'>{_html_line(ln)}</div>")
-            for ln in dst_lines[j1:j2]:
-                right_html.append(f"<div class='line eq'>{_html_line(ln)}</div>")
-        elif tag == "delete":
-            for ln in src_lines[i1:i2]:
-                left_html.append(f"<div class='line del'>{_html_line(ln)}</div>")
-        elif tag == "insert":
-            for ln in dst_lines[j1:j2]:
-                right_html.append(f"<div class='line ins'>{_html_line(ln)}</div>")
-        elif tag == "replace":
-            for ln in src_lines[i1:i2]:
-                left_html.append(f"<div class='line chg'>{_html_line(ln)}</div>")
-            for ln in dst_lines[j1:j2]:
-                right_html.append(f"<div class='line chg'>{_html_line(ln)}</div>")
-
-    left_html.append("</body></html>")
-    right_html.append("</body></html>")
-    return "".join(left_html), "".join(right_html)
-
 # ===== 履歴ヘルパ =====
 def _new_history_combo(placeholder: str) -> QComboBox:
     cb = QComboBox()
@@ -256,7 +239,106 @@ def _push_history_list(lst, text: str) -> list:
     lst.insert(0, t)
     return lst[:MAX_HISTORY]
 
+def _push_recent(lst: list, path: str) -> list:
+    """最近のファイルを前詰めで追加（重複は先頭へ）。最大 MAX_RECENT 件。"""
+    lst = [x for x in lst if x != path]
+    lst.insert(0, path)
+    return lst[:MAX_RECENT]
+
+def _future_result(fut) -> dict:
+    """プールのジョブ結果。キャンセルやプールの異常終了も失敗として返す"""
+    if fut.cancelled():
+        return {"status": "failed", "error": "キャンセルされました"}
+    exc = fut.exception()
+    return {"status": "failed", "error": str(exc)} if exc else fut.result()
+
+# ===== バッチ用ワーカー（GUIスレッド外で実行） =====
+class BatchWorker(QObject):
+    """process_directory をQThread上で実行し、進捗は PROGRESS_INTERVAL 間隔に間引いて送出"""
+    total = Signal(int)            # 対象件数（列挙完了時）
+    progress = Signal(int)         # 処理済み件数
+    finished = Signal(int, bool, object)   # (処理件数, キャンセルされたか, 内訳stats)
+    failed = Signal(str)
+
+    def __init__(self, jobs: list, settings: dict, cancel_event: threading.Event, executor=None, cancel_flag=None):
+        super().__init__()
+        self._jobs = jobs            # [(入力フォルダ, 出力フォルダ), ...]
+        self._settings = settings
+        self._cancel = cancel_event
+        self._executor = executor    # MainWindow と共有のプロセスプール
+        self._cancel_flag = cancel_flag  # プールのワーカーへキャンセルを伝える共有の整数
+
+    def run(self):
+        try:
+            s = self._settings
+            total = 0
+            for inp, _ in self._jobs:
+                for _p in enumerate_target_files(inp, s["exts"], s["recursive"],
+                                                 include_archives=s["archives"]):
+                    if self._cancel.is_set(): break
+                    total += 1
+            self.total.emit(total)
+            done = 0; last = 0.0
+            def progress_cb():
+                nonlocal done, last
+                done += 1
+                now = time.monotonic()
+                if now - last >= PROGRESS_INTERVAL:
+                    last = now; self.progress.emit(done)
+            count = 0; stats = {}
+            for i, (inp, out) in enumerate(self._jobs, 1):
+                if self._cancel.is_set(): break
+                # 複数フォルダを同じ出力先へ処理する時は、ジョブごとに別名のレポートにする
+                name = f"{i:02d}-{Path(inp).name}" if len(self._jobs) > 1 else None
+                js = report_settings(s, out, name=name) if s.get("diff_report") else s
+                count += process_directory(inp, out, js, progress_callback=progress_cb,
+                                           is_canceled=self._cancel.is_set, stats=stats,
+                                           executor=self._executor, cancel_flag=self._cancel_flag)
+            self.progress.emit(done)
+            self.finished.emit(count, self._cancel.is_set(), stats)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class EstimateWorker(QObject):
+    """バッチ実行前の見積もり（サンプル試行・書き込みなし）をQThread上で行う"""
+    finished = Signal(object)   # dry_run_directory の結果dict
+    failed = Signal(str)
+
+    def __init__(self, in_dir: str, settings: dict):
+        super().__init__()
+        self._in = in_dir; self._settings = settings
+
+    def run(self):
+        try:
+            self.finished.emit(dry_run_directory(self._in, self._settings))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+class WatchWorker(QObject):
+    """入力フォルダを監視し、変更されたファイルだけを出力フォルダへ再処理し続ける"""
+    processed = Signal(str, bool)   # (ファイルパス, 成功したか)
+    failed = Signal(str)
+    stopped = Signal()
+
+    def __init__(self, in_dir: str, out_dir: str, settings: dict, stop_event: threading.Event):
+        super().__init__()
+        self._in = in_dir; self._out = out_dir
+        self._settings = settings; self._stop = stop_event
+
+    def run(self):
+        try:
+            watcher = FolderWatcher(self._in, self._out, self._settings,
+                                    on_processed=lambda p, ok: self.processed.emit(str(p), ok))
+            watcher.run(self._stop)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.stopped.emit()
+
 class MainWindow(QWidget):
+    # 複数ファイルD&Dの完了通知 (パス, 結果dict)。プールのコールバックスレッドから送り、GUIスレッドで受ける
+    file_job_done = Signal(object, object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("TextAdjustment ©️2025 KisaragiIchigo")
@@ -279,8 +361,30 @@ class MainWindow(QWidget):
         # 内部保持
         self._src_plain = ""
         self._src_path: Path | None = None  # ★元ファイルパス（拡張子推定用）
+        self._src_mtime = 0
+        # 部分プレビュー（大きいファイル）: 読み込み済みの位置と、確定したエンコーディング
+        self._src_partial = False
+        self._src_offset = 0
+        self._src_enc: str | None = None
+        # 「元の形式のまま保存」時に読み込みで判定した (文字コード, BOM, 改行)。OFFで読んだ場合は None
+        self._src_format: tuple | None = None
+        self._dst_partial = ""
+        self._dst_partial_key: str | None = None  # _dst_partial を作った設定の指紋
+        # (path, mtime, 設定指紋) をキーに、デコード済み元テキスト/処理結果/差分HTMLを保持
+        self._cache = LRUCache(PREVIEW_CACHE_BYTES)
+        self._recent: list[str] = []
+        self._memo = PipelineMemo()  # ステージ単位の中間結果（Reプレビュー/保存で再利用）
         self._syncing_vert = False
         self._syncing_horz = False
+        self._batch_thread: QThread | None = None
+        self._batch_cancel = threading.Event()
+        self._estimate_thread: QThread | None = None
+        self._watch_thread: QThread | None = None
+        self._watch_stop = threading.Event()
+        self._watch_count = 0
+        self._pool: ProcessPoolExecutor | None = None  # 一括実行と複数ファイルD&Dで共有（初回使用時に起動）
+        self._pool_cancel = None  # プールのワーカーへバッチのキャンセルを伝える共有の整数
+        self._drop_jobs: dict = {}  # 処理中のファイル -> (リスト項目, 設定, 出力先)
 
         # ===== タイトルバー =====
         bar = QHBoxLayout()
@@ -290,15 +394,19 @@ class MainWindow(QWidget):
         self.btn_batch_in = QPushButton("入力フォルダ")
         self.btn_batch_out = QPushButton("出力フォルダ")
         self.btn_batch_run = QPushButton("一括実行")
+        self.btn_watch = QPushButton("監視"); self.btn_watch.setCheckable(True)
+        self.btn_watch.setToolTip("入力フォルダを監視し、変更されたファイルを自動で出力フォルダへ処理")
         self.btn_readme = QPushButton("README")
         self.btn_close = QPushButton("×"); self.btn_close.setFixedWidth(36)
-        for b in (self.btn_batch_in,self.btn_batch_out,self.btn_batch_run,self.btn_readme,self.btn_close):
+        for b in (self.btn_batch_in,self.btn_batch_out,self.btn_batch_run,self.btn_watch,self.btn_readme,self.btn_close):
             bar.addWidget(b)
         main.addLayout(bar)
 
         # ===== オプション（整形系） =====
         opt = QGroupBox("整形オプション"); f = QFormLayout(); f.setSpacing(6)
         self.cb_remove_blanks = QCheckBox("空白行を削除"); self.cb_remove_blanks.setChecked(True)
+        self.cb_dedupe_lines = QCheckBox("重複行を削除（最初の行を残す）")
+        self.cb_sort_lines = QCheckBox("行を並べ替え（文字コード順）")
 
         # 履歴コンボ（編集可）
         self.cmb_break_tokens  = _new_history_combo("改行トークン例: 。,！,?,END,\\d{4}-\\d{2}-\\d{2}")
@@ -307,6 +415,11 @@ class MainWindow(QWidget):
         self.cmb_break_mode = QComboBox(); self.cmb_break_mode.addItems(["直後に改行","直前に改行","前後に改行"])
         self.cmb_prefix = _new_history_combo("各行の先頭に付与（任意）")
         self.cmb_suffix = _new_history_combo("各行の末尾に付与（任意）")
+        self.spn_wrap = QSpinBox(); self.spn_wrap.setRange(0, 1000)
+        self.spn_wrap.setSpecialValueText("しない"); self.spn_wrap.setSuffix(" 桁")
+        self.spn_wrap.setToolTip("全角=2桁で数えて折り返す（句読点・閉じ括弧は行頭に来ないよう調整）")
+        self.cmb_replace_dict = _new_history_combo("置換辞書ファイル（TSV/JSON・任意）")
+        self.btn_replace_dict = QPushButton("参照"); self.btn_replace_dict.setFixedWidth(56)
 
         # 文字幅変換（モード + 対象指定）
         self.cmb_width = QComboBox(); self.cmb_width.addItems(["変更なし","半角へ","全角へ"])
@@ -320,11 +433,20 @@ class MainWindow(QWidget):
         # 等幅フォントトグル（プレビュー）
         self.cb_preview_mono = QCheckBox("等幅フォント（プレビュー）")
 
-        f.addRow(self.cb_remove_blanks)
+        blank_row = QHBoxLayout(); blank_row.setContentsMargins(0,0,0,0)
+        for w in (self.cb_remove_blanks, self.cb_dedupe_lines, self.cb_sort_lines): blank_row.addWidget(w)
+        blank_row.addStretch(1)
+        blank_holder = QWidget(); blank_holder.setLayout(blank_row)
+        f.addRow(blank_holder)
         f.addRow(QLabel("改行トークン（,区切り・正規表現は設定でON）:"), self.cmb_break_tokens)
         f.addRow(QLabel("改行除外トークン（,区切り・リテラル）:"), self.cmb_break_exclude)
         f.addRow(QLabel("改行位置:"), self.cmb_break_mode)
+        f.addRow(QLabel("折り返し（表示幅）:"), self.spn_wrap)
         f.addRow(QLabel("行スキップ（正規表現）:"), self.cmb_skip_regex)
+        dict_row = QHBoxLayout(); dict_row.setContentsMargins(0,0,0,0)
+        dict_row.addWidget(self.cmb_replace_dict, 1); dict_row.addWidget(self.btn_replace_dict)
+        dict_holder = QWidget(); dict_holder.setLayout(dict_row)
+        f.addRow(QLabel("置換辞書:"), dict_holder)
         f.addRow(QLabel("文字幅変換:"), self.cmb_width)
         f.addRow(QLabel("対象文字列:"), self.cmb_width_targets)
         cat_row = QHBoxLayout()
@@ -347,11 +469,23 @@ class MainWindow(QWidget):
         split.setSizes([600, 600])
         main.addWidget(split, 1)
 
+        # ===== 複数ファイルD&Dの結果一覧（クリックで差分を表示） =====
+        self.lst_drops = QListWidget(); self.lst_drops.setObjectName("textPanel")
+        self.lst_drops.setMaximumHeight(120); self.lst_drops.hide()
+        self.lst_drops.setToolTip("クリックでそのファイルの差分を表示")
+        main.addWidget(self.lst_drops)
+
         # ===== プレビュー下のボタン（Reプレビュー/開く/保存） =====
         filebar = QHBoxLayout()
+        self.cmb_recent = QComboBox(); self.cmb_recent.setMinimumWidth(280)
+        self.cmb_recent.setPlaceholderText("最近のファイル"); self.cmb_recent.setToolTip("開いたファイルを切り替え")
+        filebar.addWidget(self.cmb_recent)
         self.btn_repreview = QPushButton("Reプレビュー")
         self.btn_open = QPushButton("開く")
         self.btn_save = QPushButton("保存")
+        self.btn_load_more = QPushButton("続きを読み込む"); self.btn_load_more.hide()
+        self.btn_load_more.setToolTip("大きいファイルの次の範囲をプレビューに追加")
+        filebar.addWidget(self.btn_load_more)
         filebar.addStretch(1); filebar.addWidget(self.btn_repreview); filebar.addWidget(self.btn_open); filebar.addWidget(self.btn_save)
         main.addLayout(filebar)
 
@@ -359,15 +493,21 @@ class MainWindow(QWidget):
         self.btn_repreview.clicked.connect(self.repreview)
         self.btn_open.clicked.connect(self.open_file)
         self.btn_save.clicked.connect(self.save_file)
+        self.cmb_recent.activated.connect(self._on_recent_selected)
+        self.btn_load_more.clicked.connect(self.load_more)
         self.btn_readme.clicked.connect(self.show_readme)
         self.btn_close.clicked.connect(self.close)
         self.btn_batch_in.clicked.connect(self.choose_batch_in)
         self.btn_batch_out.clicked.connect(self.choose_batch_out)
         self.btn_batch_run.clicked.connect(self.run_batch)
+        self.btn_watch.toggled.connect(self.toggle_watch)
+        self.btn_replace_dict.clicked.connect(self.choose_replace_dict)
+        self.lst_drops.itemClicked.connect(self._on_drop_item_clicked)
+        self.file_job_done.connect(self._on_file_job_done)
 
         # 入力確定で履歴に積む
         for cb in (self.cmb_break_tokens, self.cmb_break_exclude, self.cmb_skip_regex,
-                   self.cmb_prefix, self.cmb_suffix, self.cmb_width_targets):
+                   self.cmb_prefix, self.cmb_suffix, self.cmb_width_targets, self.cmb_replace_dict):
             cb.lineEdit().editingFinished.connect(self._remember_histories)
 
         # スクロール同期（縦・横）
@@ -408,11 +548,39 @@ class MainWindow(QWidget):
         self.cb_break_regex = QCheckBox("改行トークンを正規表現として扱う")
         self.cb_recursive = QCheckBox("再帰（サブフォルダも処理）")
         self.cb_detect_encoding = QCheckBox("エンコーディング自動判定（chardet・単発のみ）")
+        self.cb_skip_unchanged = QCheckBox("内容が同じファイルは書き込まない")
+        self.cb_archives = QCheckBox("アーカイブ（zip/tar/gz/bz2/xz）内も処理")
+        self.cb_skip_binary = QCheckBox("中身がバイナリのファイルは処理しない")
+        self.cb_preserve_format = QCheckBox("元の文字コード・BOM・改行のまま保存（OFFならUTF-8）")
+        self.cb_windowed = QCheckBox("大きいファイルは先頭から部分プレビュー")
+        self.cb_drop_beside = QCheckBox("複数ファイルD&Dは元ファイルの隣に保存（*_adjusted）")
+        self.cb_wrap_ambiguous = QCheckBox("折り返しで曖昧幅の文字（○※α等）を全角として数える")
+        self.spn_line_memory = QSpinBox(); self.spn_line_memory.setRange(8, 4096); self.spn_line_memory.setSuffix(" MB")
+        self.spn_line_memory.setToolTip("超える大きさのファイルは一時ファイルを使って処理")
+        self.cb_estimate = QCheckBox("バッチ実行前に見積もりを表示（サンプル試行）")
+        self.cb_diff_report = QCheckBox(f"バッチの差分レポートを出力（出力フォルダ/{REPORT_DIRNAME}）")
         self.cmb_exts = _new_history_combo(",".join(sorted(DEFAULT_TEXT_EXTS)))
+        self.cmb_rules = _new_history_combo("globごとの設定上書き（JSON・任意）")
+        self.btn_rules = QPushButton("参照"); self.btn_rules.setFixedWidth(56)
         ff.addRow(self.cb_break_regex)
         ff.addRow(self.cb_recursive)
         ff.addRow(self.cb_detect_encoding)
+        ff.addRow(self.cb_skip_unchanged)
+        ff.addRow(self.cb_archives)
+        ff.addRow(self.cb_skip_binary)
+        ff.addRow(self.cb_preserve_format)
+        ff.addRow(self.cb_windowed)
+        ff.addRow(self.cb_drop_beside)
+        ff.addRow(self.cb_wrap_ambiguous)
+        ff.addRow(QLabel("重複削除/並べ替えのメモリ上限:"), self.spn_line_memory)
+        ff.addRow(self.cb_estimate)
+        ff.addRow(self.cb_diff_report)
         ff.addRow(QLabel("対象拡張子（.txt,.md,...）:"), self.cmb_exts)
+        rules_row = QHBoxLayout(); rules_row.setContentsMargins(0,0,0,0)
+        rules_row.addWidget(self.cmb_rules, 1); rules_row.addWidget(self.btn_rules)
+        rules_holder = QWidget(); rules_holder.setLayout(rules_row)
+        ff.addRow(QLabel("ルールファイル（バッチ用）:"), rules_holder)
+        self.btn_rules.clicked.connect(self.choose_rules_file)
         gb.setLayout(ff); v.addWidget(gb)
 
         btnrow = QHBoxLayout()
@@ -449,12 +617,18 @@ class MainWindow(QWidget):
         c = self.cfg
         # メイン
         self.cb_remove_blanks.setChecked(c.get("remove_blanks", True))
+        self.cb_dedupe_lines.setChecked(c.get("dedupe_lines", False))
+        self.cb_sort_lines.setChecked(c.get("sort_lines", False))
+        self.spn_line_memory.setValue(c.get("line_memory_mb", LINE_MEMORY_MB))
         self._fill_history_combo(self.cmb_break_tokens,  c.get("hist_break_tokens", []),  c.get("break_tokens",""))
         self._fill_history_combo(self.cmb_break_exclude, c.get("hist_break_exclude", []), c.get("break_exclude",""))
         self._fill_history_combo(self.cmb_skip_regex,    c.get("hist_skip_regex", []),    c.get("skip_regex",""))
         self._fill_history_combo(self.cmb_prefix,        c.get("hist_prefix", []),        c.get("prefix",""))
         self._fill_history_combo(self.cmb_suffix,        c.get("hist_suffix", []),        c.get("suffix",""))
+        self._fill_history_combo(self.cmb_replace_dict,  c.get("hist_replace_dict", []),  c.get("replace_dict",""))
         self.cmb_break_mode.setCurrentIndex(c.get("break_mode", 0))
+        self.spn_wrap.setValue(c.get("wrap_width", 0))
+        self.cb_wrap_ambiguous.setChecked(c.get("wrap_ambiguous_wide", False))
 
         self.cmb_width.setCurrentIndex(c.get("width_mode", 0))
         self._fill_history_combo(self.cmb_width_targets, c.get("hist_width_targets", []), c.get("width_targets",""))
@@ -472,7 +646,16 @@ class MainWindow(QWidget):
         self.cb_break_regex.setChecked(c.get("break_is_regex", False))
         self.cb_recursive.setChecked(c.get("recursive", True))
         self.cb_detect_encoding.setChecked(c.get("detect_encoding", True))
+        self.cb_skip_unchanged.setChecked(c.get("skip_unchanged", True))
+        self.cb_archives.setChecked(c.get("archives", False))
+        self.cb_skip_binary.setChecked(c.get("skip_binary", True))
+        self.cb_diff_report.setChecked(c.get("diff_report", False))
+        self.cb_preserve_format.setChecked(c.get("preserve_format", False))
+        self.cb_windowed.setChecked(c.get("windowed_preview", True))
+        self.cb_drop_beside.setChecked(c.get("drop_save_beside", False))
+        self.cb_estimate.setChecked(c.get("estimate_before_batch", True))
         self._fill_history_combo(self.cmb_exts, c.get("hist_exts", []), c.get("exts_csv", ",".join(sorted(DEFAULT_TEXT_EXTS))))
+        self._fill_history_combo(self.cmb_rules, c.get("hist_rules", []), c.get("rules_file", ""))
 
         # 位置
         geo = c.get("window_geo")
@@ -499,11 +682,17 @@ class MainWindow(QWidget):
         exts = {e if e.startswith(".") else f".{e}" for e in ext_items} or set(DEFAULT_TEXT_EXTS)
         return {
             "remove_blanks": self.cb_remove_blanks.isChecked(),
+            "dedupe_lines": self.cb_dedupe_lines.isChecked(),
+            "sort_lines": self.cb_sort_lines.isChecked(),
+            "line_memory_mb": self.spn_line_memory.value(),
             "break_tokens": [s.strip() for s in token_text.split(",") if s.strip()],
             "break_tokens_are_regex": self.cb_break_regex.isChecked(),
             "break_exclude_tokens": [s.strip() for s in exclude_text.split(",") if s.strip()],
             "break_mode": mode_map.get(self.cmb_break_mode.currentIndex(), "after"),
+            "wrap_width": self.spn_wrap.value(),
+            "wrap_ambiguous_wide": self.cb_wrap_ambiguous.isChecked(),
             "skip_regex": skip_text.strip(),
+            "replace_dict": self.cmb_replace_dict.currentText().strip(),
             "prefix": prefix_text,
             "suffix": suffix_text,
             "width_mode": {0:"none",1:"to_half",2:"to_full"}[self.cmb_width.currentIndex()],
@@ -517,7 +706,13 @@ class MainWindow(QWidget):
             },
             "recursive": self.cb_recursive.isChecked(),
             "detect_encoding": self.cb_detect_encoding.isChecked(),
+            "skip_unchanged": self.cb_skip_unchanged.isChecked(),
+            "archives": self.cb_archives.isChecked(),
+            "skip_binary": self.cb_skip_binary.isChecked(),
+            "diff_report": self.cb_diff_report.isChecked(),
+            "preserve_format": self.cb_preserve_format.isChecked(),
             "exts": exts,
+            "rules_file": self.cmb_rules.currentText().strip(),
         }
 
     def _remember_histories(self):
@@ -527,8 +722,10 @@ class MainWindow(QWidget):
         c["hist_skip_regex"]    = _push_history_list(c.get("hist_skip_regex", []),    self.cmb_skip_regex.currentText())
         c["hist_prefix"]        = _push_history_list(c.get("hist_prefix", []),        self.cmb_prefix.currentText())
         c["hist_suffix"]        = _push_history_list(c.get("hist_suffix", []),        self.cmb_suffix.currentText())
+        c["hist_replace_dict"]  = _push_history_list(c.get("hist_replace_dict", []),  self.cmb_replace_dict.currentText())
         c["hist_width_targets"] = _push_history_list(c.get("hist_width_targets", []), self.cmb_width_targets.currentText())
         c["hist_exts"]          = _push_history_list(c.get("hist_exts", []),          self.cmb_exts.currentText())
+        c["hist_rules"]         = _push_history_list(c.get("hist_rules", []),         self.cmb_rules.currentText())
         c["preview_mono"]       = self.cb_preview_mono.isChecked()
         save_config(c)
 
@@ -537,11 +734,17 @@ class MainWindow(QWidget):
         s = self._collect_settings(); c = self.cfg
         c.update({
             "remove_blanks": s["remove_blanks"],
+            "dedupe_lines": s["dedupe_lines"],
+            "sort_lines": s["sort_lines"],
+            "line_memory_mb": s["line_memory_mb"],
             "break_tokens": ",".join(s["break_tokens"]),
             "break_is_regex": s["break_tokens_are_regex"],
             "break_exclude": ",".join(s["break_exclude_tokens"]),
             "break_mode": {"after":0,"before":1,"around":2}[s["break_mode"]],
+            "wrap_width": s["wrap_width"],
+            "wrap_ambiguous_wide": s["wrap_ambiguous_wide"],
             "skip_regex": s["skip_regex"],
+            "replace_dict": s["replace_dict"],
             "prefix": s["prefix"], "suffix": s["suffix"],
             "width_mode": {"none":0,"to_half":1,"to_full":2}[s["width_mode"]],
             "width_targets": s["width_targets"],
@@ -552,14 +755,32 @@ class MainWindow(QWidget):
             "w_space": s["width_sets"]["space"],
             "recursive": s["recursive"],
             "detect_encoding": s["detect_encoding"],
+            "skip_unchanged": s["skip_unchanged"],
+            "archives": s["archives"],
+            "skip_binary": s["skip_binary"],
+            "diff_report": s["diff_report"],
+            "preserve_format": s["preserve_format"],
+            "windowed_preview": self.cb_windowed.isChecked(),
+            "drop_save_beside": self.cb_drop_beside.isChecked(),
+            "estimate_before_batch": self.cb_estimate.isChecked(),
             "exts_csv": self.cmb_exts.currentText(),
+            "rules_file": s["rules_file"],
             "preview_mono": self.cb_preview_mono.isChecked(),
         })
         g = self.geometry(); c["window_geo"] = {"x":g.x(),"y":g.y(),"w":g.width(),"h":g.height()}
         save_config(c)
 
     def closeEvent(self, e):
+        if self._batch_thread is not None:
+            self._batch_cancel.set(); self._batch_thread.quit(); self._batch_thread.wait()
+        if self._estimate_thread is not None:
+            self._estimate_thread.quit(); self._estimate_thread.wait()
+        if self._watch_thread is not None:
+            self._watch_stop.set(); self._watch_thread.quit(); self._watch_thread.wait()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
         self._save_runtime_config()
+        flush_config()
         super().closeEvent(e)
 
     # ===== Reプレビュー =====
@@ -569,16 +790,35 @@ class MainWindow(QWidget):
             return
         try:
             self._remember_histories()
-            dst = process_text(self._src_plain, self._collect_settings())
-            left_html, right_html = render_diff_html(self._src_plain, dst)
-            self.src_view.setHtml(left_html)
-            self.dst_view.setHtml(right_html)
-            # 先頭へ
-            self.src_view.verticalScrollBar().setValue(self.src_view.verticalScrollBar().minimum())
-            self.dst_view.verticalScrollBar().setValue(self.dst_view.verticalScrollBar().minimum())
+            self._dst_partial = ""
+            self._show_preview(self._collect_settings())
+        except (PatternError, PatternTimeout, DictionaryError) as ex:
+            QMessageBox.warning(self, "正規表現", str(ex))
         except Exception as ex:
             QMessageBox.critical(self, "エラー", f"Reプレビューで例外: {ex}")
 
+    def _show_preview(self, settings: dict, keep_scroll: bool = False):
+        """self._src_plain を処理して左右に表示（同じファイル・設定の結果はキャッシュから）"""
+        key = ("view", str(self._src_path), self._src_mtime,
+               self._src_offset if self._src_partial else None, settings_fingerprint(settings))
+        view = self._cache.get(key) if self._src_path else None
+        if view is None:
+            dst = self._memo.run(self._src_plain, settings)
+            left_html, right_html = render_diff_html(self._src_plain, dst)
+            view = (dst, left_html, right_html)
+            if self._src_path:
+                self._cache.put(key, view, sum(sys.getsizeof(x) for x in view))
+        self._set_preview_html(view[1], view[2], keep_scroll)
+
+    def _set_preview_html(self, left_html: str, right_html: str, keep_scroll: bool = False):
+        pos = self.src_view.verticalScrollBar().value()
+        self.src_view.setHtml(left_html)
+        self.dst_view.setHtml(right_html)
+        # 先頭へ（続き読み込み時は位置を保つ）
+        bar = self.src_view.verticalScrollBar()
+        bar.setValue(pos if keep_scroll else bar.minimum())
+        self._sync_scroll_ratio(self.src_view, self.dst_view, vertical=True)
+
     # ===== 等幅フォント適用 =====
     def _apply_preview_font(self, checked: bool):
         if checked:
@@ -603,22 +843,80 @@ class MainWindow(QWidget):
     def _load_and_preview(self, p: Path):
         try:
             settings = self._collect_settings()
-            src, used_enc = self._read_text(p, settings["detect_encoding"])
+            st = p.stat(); mtime = st.st_mtime_ns
+            if self.cb_windowed.isChecked() and st.st_size > LARGE_FILE_BYTES:
+                # 大きいファイル：先頭の1ウィンドウだけ読み・処理・差分表示
+                src, used_enc, offset, eof, fmt = self._read_window(
+                    p, 0, None, settings["detect_encoding"], settings["preserve_format"])
+                cached = None
+                self._src_partial = not eof; self._src_offset = offset; self._src_enc = used_enc
+            else:
+                src_key = ("src", str(p), mtime, settings["detect_encoding"], settings["preserve_format"])
+                cached = self._cache.get(src_key)
+                if cached is None:
+                    src, used_enc, fmt = self._read_text(p, settings["detect_encoding"], settings["preserve_format"])
+                    self._cache.put(src_key, (src, used_enc, fmt), sys.getsizeof(src))
+                else:
+                    src, used_enc, fmt = cached
+                self._src_partial = False; self._src_offset = 0; self._src_enc = used_enc
+            self._src_format = fmt
             self._src_plain = src
-            self._src_path = p  
-            dst = process_text(src, settings)
-            left_html, right_html = render_diff_html(src, dst)
-            self.src_view.setHtml(left_html)
-            self.dst_view.setHtml(right_html)
+            self._src_path = p
+            self._src_mtime = mtime
+            self._dst_partial = ""
+            self._show_preview(settings)
+            self._update_load_more()
+            self._remember_recent(p)
             self.cfg["last_dir"] = str(p.parent); save_config(self.cfg)
-            if used_enc and used_enc.lower() != "utf-8":
+            if cached is None and used_enc and used_enc.lower() != "utf-8":
                 QMessageBox.information(self, "エンコ検出", f"{p.name}: {used_enc} で読み込みました。")
-            # 先頭へ
-            self.src_view.verticalScrollBar().setValue(self.src_view.verticalScrollBar().minimum())
-            self.dst_view.verticalScrollBar().setValue(self.dst_view.verticalScrollBar().minimum())
         except Exception as e:
             QMessageBox.critical(self, "エラー", f"読み込み失敗: {p}\n{e}")
 
+    def load_more(self):
+        """部分プレビュー中のファイルの次のウィンドウだけを処理して追加表示する"""
+        if not (self._src_partial and self._src_path): return
+        try:
+            settings = self._collect_settings()
+            key = settings_fingerprint(settings)
+            text, _, offset, eof, _ = self._read_window(self._src_path, self._src_offset, self._src_enc, False)
+            if self._dst_partial and self._dst_partial_key == key:
+                dst_prev = self._dst_partial
+            else:
+                # 前回の追加から設定が変わった → 読み込み済みの範囲を今の設定で処理し直す
+                dst_prev = self._memo.run(self._src_plain, settings)
+            dst_new = process_text(text, settings)
+            joiner = "" if not dst_prev or dst_prev.endswith("\n") else "\n"
+            self._src_plain += text
+            self._dst_partial = dst_prev + joiner + dst_new; self._dst_partial_key = key
+            self._src_offset = offset; self._src_partial = not eof
+            left_html, right_html = render_diff_html(self._src_plain, self._dst_partial)
+            self._set_preview_html(left_html, right_html, keep_scroll=True)
+            self._update_load_more()
+        except Exception as e:
+            QMessageBox.critical(self, "エラー", f"続きの読み込み失敗: {e}")
+
+    def _update_load_more(self):
+        self.btn_load_more.setVisible(self._src_partial)
+        if self._src_partial and self._src_path:
+            total = max(1, self._src_path.stat().st_size)
+            self.btn_load_more.setText(f"続きを読み込む（{self._src_offset * 100 // total}%）")
+
+    def _remember_recent(self, p: Path):
+        self._recent = _push_recent(self._recent, str(p))
+        self.cmb_recent.blockSignals(True)
+        self.cmb_recent.clear()
+        for path in self._recent:
+            self.cmb_recent.addItem(Path(path).name, path)
+            self.cmb_recent.setItemData(self.cmb_recent.count() - 1, path, Qt.ToolTipRole)
+        self.cmb_recent.setCurrentIndex(0)
+        self.cmb_recent.blockSignals(False)
+
+    def _on_recent_selected(self, index: int):
+        path = self.cmb_recent.itemData(index)
+        if path and path != str(self._src_path):
+            self._load_and_preview(Path(path))
+
     def save_file(self):
         # ベースディレクトリと既定名（元ファイルがあれば同名を提案）
         if self._src_path:
@@ -642,8 +940,28 @@ class MainWindow(QWidget):
             if p.suffix == "" and default_ext:
                 p = p.with_suffix(default_ext)
 
-            dst_plain = process_text(self._src_plain, self._collect_settings())
-            p.write_text(dst_plain, encoding="utf-8")
+            settings = self._collect_settings()
+            fmt = None
+            preserve = settings["preserve_format"] and self._src_path is not None and self._src_path.is_file()
+            if self._src_path and (self._src_partial or (preserve and self._src_format is None)):
+                # 部分プレビュー中、または形式を判定せずに読んだファイルを元の形式で保存する時は、
+                # ファイル全体を読み直して処理する（判定は detect_format のみ。読み込み時の文字コードは使わない）
+                QApplication.setOverrideCursor(Qt.WaitCursor)
+                try:
+                    raw = self._src_path.read_bytes()
+                    if preserve:
+                        fmt = detect_format(raw)
+                        full = decode_with_format(raw, fmt)
+                    else:
+                        full = self._decode(raw, self._src_enc or "utf-8")
+                    dst_plain = process_text(full, settings)
+                finally:
+                    QApplication.restoreOverrideCursor()
+            else:
+                dst_plain = self._memo.run(self._src_plain, settings)
+                if preserve:
+                    fmt = self._src_format
+            write_output(p, dst_plain, settings, fmt)
 
             # last_dir更新（保存先フォルダ）
             self.cfg["last_dir"] = str(p.parent); save_config(self.cfg)
@@ -663,44 +981,188 @@ class MainWindow(QWidget):
         d = QFileDialog.getExistingDirectory(self, "出力フォルダ", self.cfg.get("batch_out",""))
         if d: self.cfg["batch_out"]=d; save_config(self.cfg); QMessageBox.information(self,"選択",f"出力: {d}")
 
+    def choose_replace_dict(self):
+        start = self.cmb_replace_dict.currentText().strip()
+        path, _ = QFileDialog.getOpenFileName(self, "置換辞書", start, "置換辞書 (*.tsv *.txt *.json);;All Files (*.*)")
+        if path:
+            self.cmb_replace_dict.setCurrentText(path); self._remember_histories()
+
+    def choose_rules_file(self):
+        start = self.cmb_rules.currentText().strip()
+        path, _ = QFileDialog.getOpenFileName(self, "ルールファイル", start, "JSON (*.json);;All Files (*.*)")
+        if path:
+            self.cmb_rules.setCurrentText(path); self._remember_histories()
+
     def run_batch(self):
         s = self._collect_settings()
         inp = self.cfg.get("batch_in",""); out = self.cfg.get("batch_out","")
         if not inp or not out:
             QMessageBox.warning(self,"未指定","入力/出力フォルダを選んでください。"); return
+        if self.cb_estimate.isChecked():
+            self._start_estimate(inp, out, s)
+        else:
+            self._start_batch([(inp, out)], s, "バッチ処理中...")
 
-        files = list(enumerate_target_files(inp, s["exts"], s["recursive"]))
-        total = len(files)
-        if total == 0:
-            QMessageBox.information(self, "情報", "対象ファイルがありません。"); return
+    # ===== 見積もり（バッチ実行前） =====
+    def _start_estimate(self, inp: str, out: str, settings: dict):
+        if self._batch_thread is not None or self._estimate_thread is not None:
+            QMessageBox.information(self, "実行中", "別のバッチ処理が実行中です。"); return
+        try:
+            validate_settings(settings)
+        except (PatternError, DictionaryError, RulesError) as e:
+            QMessageBox.warning(self, "正規表現", str(e)); return
+        dlg = QProgressDialog("見積もり中（サンプルを試行しています）...", "キャンセル", 0, 0, self)
+        dlg.setWindowTitle("見積もり")
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setAutoClose(False); dlg.setAutoReset(False)
+        # 試行中のサンプルは止められないので、キャンセル時は結果を捨てるだけ
+        self._estimate_canceled = False
+        dlg.canceled.connect(self._on_estimate_canceled)
+
+        thread = QThread(self)
+        worker = EstimateWorker(inp, settings)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.finished.connect(self._on_estimate_finished)
+        worker.failed.connect(self._on_estimate_failed)
+        worker.finished.connect(thread.quit); worker.failed.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater); thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(self._on_estimate_thread_done)
+        self._estimate_thread = thread; self._estimate_worker = worker
+        self._estimate_dlg = dlg; self._estimate_job = ([(inp, out)], settings)
+        dlg.show(); thread.start()
+
+    def _on_estimate_canceled(self):
+        self._estimate_canceled = True
+
+    def _on_estimate_thread_done(self):
+        self._estimate_thread = None; self._estimate_worker = None
+
+    def _on_estimate_finished(self, report: dict):
+        self._estimate_dlg.close()
+        if self._estimate_canceled:
+            return
+        ans = QMessageBox.question(self, "見積もり", format_dry_run(report) + "\n\nバッチ処理を実行しますか？")
+        if ans == QMessageBox.Yes:
+            jobs, settings = self._estimate_job
+            self._start_batch(jobs, settings, "バッチ処理中...")
+
+    def _on_estimate_failed(self, msg: str):
+        self._estimate_dlg.close()
+        QMessageBox.critical(self, "エラー", f"見積もり失敗: {msg}")
+
+    def _start_batch(self, jobs: list, settings: dict, label: str):
+        """jobs=[(入力, 出力), ...] をワーカースレッドで順に処理する"""
+        if self._batch_thread is not None:
+            QMessageBox.information(self, "実行中", "別のバッチ処理が実行中です。"); return
+        try:
+            validate_settings(settings)
+        except (PatternError, DictionaryError, RulesError) as e:
+            QMessageBox.warning(self, "正規表現", str(e)); return
 
-        dlg = QProgressDialog("バッチ処理中...", "キャンセル", 0, total, self)
+        dlg = QProgressDialog(label, "キャンセル", 0, 0, self)
         dlg.setWindowTitle("進捗 ")
         dlg.setWindowModality(Qt.WindowModal)
-        dlg.setAutoClose(True); dlg.setAutoReset(True)
-        dlg.show()
-
-        processed = 0
-        def progress_cb():
-            nonlocal processed
-            processed += 1
-            dlg.setValue(processed)
-            QApplication.processEvents()
-
-        def cancel_cb():
-            QApplication.processEvents()
-            return dlg.wasCanceled()
-
+        dlg.setAutoClose(False); dlg.setAutoReset(False)
+
+        self._batch_cancel = threading.Event()
+        thread = QThread(self)
+        worker = BatchWorker(jobs, settings, self._batch_cancel, self._executor(), self._pool_cancel)
+        worker.moveToThread(thread)
+        # キャンセルはEventを直接立てる（ワーカー側のイベントループを待たない）
+        dlg.canceled.connect(self._batch_cancel.set)
+        thread.started.connect(worker.run)
+        # 受信側はGUIスレッドのQObjectのメソッドにする（キュー接続になる）
+        worker.total.connect(self._on_batch_total)
+        worker.progress.connect(self._on_batch_progress)
+        worker.finished.connect(self._on_batch_finished)
+        worker.failed.connect(self._on_batch_failed)
+        worker.finished.connect(thread.quit); worker.failed.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater); thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(self._on_batch_thread_done)
+        self._batch_thread = thread; self._batch_worker = worker
+        self._batch_dlg = dlg; self._batch_done = 0; self._batch_total = 0
+        dlg.show(); thread.start()
+
+    def _on_batch_thread_done(self):
+        self._batch_thread = None; self._batch_worker = None
+
+    def _on_batch_total(self, total: int):
+        self._batch_total = total; self._batch_dlg.setMaximum(total)
+
+    def _on_batch_progress(self, done: int):
+        self._batch_done = done
+        if not self._batch_cancel.is_set(): self._batch_dlg.setValue(done)
+
+    def _on_batch_finished(self, count: int, canceled: bool, stats: dict):
+        done, total = self._batch_done, self._batch_total
+        self._batch_dlg.close()
+        if canceled:
+            QMessageBox.information(self, "中断", f"{done} / {total} 件でキャンセルしました。")
+        elif total == 0:
+            QMessageBox.information(self, "情報", "対象ファイルがありません。")
+        else:
+            msg = f"{count} 件を処理しました。"
+            if stats.get("unchanged"): msg += f"\n（内容が同じため書き込み省略: {stats['unchanged']} 件）"
+            if stats.get("binary"):
+                names = "\n".join(stats["binary_files"][:10])
+                msg += f"\nバイナリのため除外: {stats['binary']} 件\n{names}"
+            if stats.get("timed_out"):
+                names = "\n".join(stats["timed_out_files"][:10])
+                msg += f"\n正規表現がタイムアウト: {stats['timed_out']} 件（未出力）\n{names}"
+            if stats.get("diff_reports"):
+                msg += "\n差分レポート:\n" + "\n".join(stats["diff_reports"])
+            if stats.get("failed"): msg += f"\n失敗: {stats['failed']} 件"
+            QMessageBox.information(self, "完了", msg)
+
+    def _on_batch_failed(self, msg: str):
+        self._batch_dlg.close()
+        QMessageBox.critical(self, "エラー", f"バッチ失敗: {msg}")
+
+    # ===== フォルダ監視 =====
+    def toggle_watch(self, checked: bool):
+        if not checked:
+            self._watch_stop.set()
+            return
+        if self._watch_thread is not None:
+            return
+        inp = self.cfg.get("batch_in",""); out = self.cfg.get("batch_out","")
+        if not inp or not out:
+            QMessageBox.warning(self,"未指定","入力/出力フォルダを選んでください。")
+            self.btn_watch.setChecked(False); return
+        s = self._collect_settings()
         try:
-            count = process_directory(inp, out, s, progress_callback=progress_cb, is_canceled=cancel_cb)
-            if dlg.wasCanceled():
-                QMessageBox.information(self, "中断", f"{processed} / {total} 件でキャンセルしました。")
-            else:
-                QMessageBox.information(self, "完了", f"{count} 件を処理しました。")
-        except Exception as e:
-            QMessageBox.critical(self, "エラー", f"バッチ失敗: {e}")
-        finally:
-            dlg.close()
+            validate_settings(s)
+        except (PatternError, DictionaryError, RulesError) as e:
+            QMessageBox.warning(self, "正規表現", str(e))
+            self.btn_watch.setChecked(False); return
+
+        self._watch_stop = threading.Event(); self._watch_count = 0
+        thread = QThread(self)
+        worker = WatchWorker(inp, out, s, self._watch_stop)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.processed.connect(self._on_watch_processed)
+        worker.failed.connect(self._on_watch_failed)
+        worker.stopped.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater); thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(self._on_watch_thread_done)
+        self._watch_thread = thread; self._watch_worker = worker
+        self.btn_watch.setText("監視中")
+        thread.start()
+
+    def _on_watch_processed(self, path: str, ok: bool):
+        self._watch_count += 1
+        self.btn_watch.setText(f"監視中 ({self._watch_count})")
+        self.btn_watch.setToolTip(("更新: " if ok else "失敗: ") + path)
+
+    def _on_watch_failed(self, msg: str):
+        QMessageBox.critical(self, "エラー", f"監視を停止しました: {msg}")
+
+    def _on_watch_thread_done(self):
+        self._watch_thread = None; self._watch_worker = None
+        self.btn_watch.blockSignals(True); self.btn_watch.setChecked(False); self.btn_watch.blockSignals(False)
+        self.btn_watch.setText("監視")
 
     # ===== README =====
     def show_readme(self):
@@ -714,12 +1176,14 @@ class MainWindow(QWidget):
         try:
             urls = e.mimeData().urls()
             if not urls: return
-            s = self._collect_settings(); exts = s["exts"]
+            s = self._collect_settings(); exts_low = lower_exts(s["exts"])
 
-            for u in urls:
-                p = Path(u.toLocalFile())
-                if p.is_file() and is_text_like(p, exts):
-                    self._load_and_preview(p); break
+            files = [p for p in (Path(u.toLocalFile()) for u in urls)
+                     if p.is_file() and is_text_like(p, exts_low) and not is_binary_file(p)]
+            if len(files) == 1:
+                self._load_and_preview(files[0])
+            elif files:
+                self._start_file_jobs(files, s)
 
             dirs = [Path(u.toLocalFile()) for u in urls if Path(u.toLocalFile()).is_dir()]
             if dirs:
@@ -729,28 +1193,126 @@ class MainWindow(QWidget):
                     if not d: return
                     self.cfg["batch_out"]=d; save_config(self.cfg)
 
-                for d in dirs:
-                    files = list(enumerate_target_files(str(d), s["exts"], s["recursive"]))
-                    total = len(files)
-                    if total == 0: continue
-                    dlg = QProgressDialog(f"{d} を処理中...", "キャンセル", 0, total, self)
-                    dlg.setWindowTitle("進捗 ")
-                    dlg.setWindowModality(Qt.WindowModal); dlg.show()
-                    processed = 0
-                    def progress_cb():
-                        nonlocal processed
-                        processed += 1; dlg.setValue(processed); QApplication.processEvents()
-                    def cancel_cb():
-                        QApplication.processEvents(); return dlg.wasCanceled()
-                    process_directory(str(d), self.cfg["batch_out"], s, progress_callback=progress_cb, is_canceled=cancel_cb)
-                    dlg.close()
-
-                QMessageBox.information(self,"完了", f"フォルダD&Dの処理が完了しました。")
+                jobs = [(str(d), self.cfg["batch_out"]) for d in dirs]
+                self._start_batch(jobs, s, "フォルダを処理中...")
         except Exception as ex:
             QMessageBox.critical(self, "エラー", f"D&D処理で例外: {ex}")
 
+    # ===== 複数ファイルD&D（プロセスプールで並列処理） =====
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool_cancel = new_cancel_flag()
+            self._pool = ProcessPoolExecutor(initializer=init_pool_worker, initargs=(self._pool_cancel,))
+        return self._pool
+
+    def _start_file_jobs(self, files: list, settings: dict):
+        """各ファイルをプールで処理し、出力フォルダ（または元ファイルの隣）へ保存する"""
+        try:
+            validate_settings(settings)
+        except (PatternError, DictionaryError, RulesError) as e:
+            QMessageBox.warning(self, "正規表現", str(e)); return
+        beside = self.cb_drop_beside.isChecked()
+        if not beside and not self.cfg.get("batch_out", ""):
+            d = QFileDialog.getExistingDirectory(self, "出力フォルダ", "")
+            if not d: return
+            self.cfg["batch_out"] = d; save_config(self.cfg)
+        pool = self._executor()
+        self.lst_drops.show()
+        # 出力先が元ファイル（今回/処理中のもの）や他のファイルの出力先と重なる場合は名前を変える
+        # （別フォルダの同名ファイル、出力フォルダ自体から落としたファイルなど）
+        norm = lambda x: os.path.normcase(os.path.abspath(x))
+        taken = {norm(job[2]) for job in self._drop_jobs.values()}
+        taken |= {norm(x) for x in self._drop_jobs} | {norm(x) for x in files}
+        for p in files:
+            key = str(p)
+            if key in self._drop_jobs: continue  # 同じファイルが処理中
+            out = p.with_name(f"{p.stem}_adjusted{p.suffix}") if beside else Path(self.cfg["batch_out"]) / p.name
+            base = out; n = 2
+            while norm(out) in taken:
+                out = base.with_name(f"{base.stem} ({n}){base.suffix}"); n += 1
+            taken.add(norm(out))
+            item = self._drop_item(p)
+            item.setText(f"処理中  {p.name}")
+            item.setToolTip(f"{p}\n→ {out}")
+            self._drop_jobs[key] = (item, settings, str(out))
+            fut = pool.submit(process_file_with_diff, key, str(out), settings, LARGE_FILE_BYTES)
+            # コールバックはプール側のスレッドで呼ばれるので、シグナル経由でGUIスレッドへ渡す
+            fut.add_done_callback(lambda f, p=p: self.file_job_done.emit(p, _future_result(f)))
+
+    def _drop_item(self, p: Path) -> QListWidgetItem:
+        for i in range(self.lst_drops.count()):
+            it = self.lst_drops.item(i)
+            if it.data(Qt.UserRole) == str(p): return it
+        it = QListWidgetItem(); it.setData(Qt.UserRole, str(p)); it.setToolTip(str(p))
+        self.lst_drops.addItem(it)
+        return it
+
+    def _on_file_job_done(self, p: Path, res: dict):
+        item, settings, out = self._drop_jobs.pop(str(p), (None, None, None))
+        if item is None: return
+        label = {"written": "保存", "unchanged": "変更なし", "binary": "バイナリ",
+                 "timed_out": "タイムアウト", "failed": "失敗"}.get(res["status"], res["status"])
+        out_name = Path(out).name
+        item.setText(f"{label}  {p.name}" + (f" → {out_name}" if out_name != p.name else ""))
+        if res.get("error"): item.setToolTip(f"{p}\n→ {out}\n{res['error']}")
+        if "html" not in res: return
+        # プールで作った結果をキャッシュへ入れておき、クリック時は読み直さずに表示する
+        left_html, right_html = res["html"]
+        view = (res["dst"], left_html, right_html)
+        self._cache.put(("view", str(p), res["mtime"], None, settings_fingerprint(settings)),
+                        view, sum(sys.getsizeof(x) for x in view))
+        if "src" in res:
+            fmt = res.get("fmt")
+            src_key = ("src", str(p), res["mtime"], settings["detect_encoding"], settings["preserve_format"])
+            self._cache.put(src_key, (res["src"], fmt[0] if fmt else "utf-8", fmt), sys.getsizeof(res["src"]))
+
+    def _on_drop_item_clicked(self, item: QListWidgetItem):
+        p = Path(item.data(Qt.UserRole))
+        if p.is_file(): self._load_and_preview(p)
+
+    # ===== 部分読み込み（大きいファイル） =====
+    def _read_window(self, p: Path, offset: int, enc: str | None, detect: bool, preserve: bool = False):
+        """offset から PREVIEW_WINDOW_BYTES 分を行境界で切って読む → (text, enc, 次のoffset, 末尾か, 形式)。
+        preserve なら先頭ウィンドウで detect_format した形式（BOMを除いてデコード）も返す。
+        切る位置は文字コードの文字単位に揃える（UTF-16/32 で次のウィンドウがずれないように）"""
+        with p.open("rb") as f:
+            head = f.read(4)
+            f.seek(offset)
+            raw = f.read(PREVIEW_WINDOW_BYTES)
+            eof = len(raw) < PREVIEW_WINDOW_BYTES or not f.read(1)
+        fmt = None
+        if enc is None and preserve:
+            fmt = detect_format(raw, partial=not eof); enc = fmt[0]
+        elif enc is None:
+            enc = "utf-8"
+            if detect:
+                try:
+                    import chardet
+                    enc = chardet.detect(raw).get("encoding") or "utf-8"
+                except Exception:
+                    pass
+        window_enc, unit, newline = window_codec(head, enc)
+        if not eof:
+            cut = line_cut(raw, unit, newline)
+            if cut >= 0: raw = raw[:cut]
+        if fmt is not None:
+            return decode_with_format(raw, fmt), enc, offset + len(raw), eof, fmt
+        # 先頭は BOM ごと元の文字コードで、途中からはバイト順を明示した文字コードで読む
+        return self._decode(raw, enc if offset == 0 else window_enc), enc, offset + len(raw), eof, None
+
+    def _decode(self, raw: bytes, enc: str) -> str:
+        try:
+            text = raw.decode(enc, errors="replace")
+        except LookupError:
+            return decode_input(raw)
+        return text.replace("\r\n", "\n").replace("\r", "\n") if "\r" in text else text
+
     # ===== 読み込み（エンコ検出） =====
-    def _read_text(self, p: Path, detect: bool):
+    def _read_text(self, p: Path, detect: bool, preserve: bool = False):
+        """→ (text, enc, 形式)。preserve なら detect_format で判定して読み、形式も返す（chardet は使わない）"""
+        if preserve:
+            raw = p.read_bytes(); fmt = detect_format(raw)
+            return decode_with_format(raw, fmt), fmt[0], fmt
         enc = None
         if detect:
             try:
@@ -758,10 +1320,10 @@ class MainWindow(QWidget):
                 raw = p.read_bytes()
                 res = chardet.detect(raw)
                 enc = res.get("encoding") or "utf-8"
-                return raw.decode(enc, errors="replace"), enc
+                return raw.decode(enc, errors="replace"), enc, None
             except Exception:
                 pass
-        return p.read_text(encoding="utf-8", errors="replace"), "utf-8"
+        return p.read_text(encoding="utf-8", errors="replace"), "utf-8", None
 
     # ===== フレームレス移動/リサイズ =====
     def eventFilter(self, obj, e):
@@ -0,0 +1,195 @@
+import heapq, os, struct, tempfile
+from array import array
+from itertools import chain
+from typing import Callable, Iterator
+
+# ===== 重複行の削除・行の並べ替え（メモリ上限つき） =====
+# 小さいテキストは全行をメモリ上で処理する（dict.fromkeys / sorted。結果は厳密）。
+# 上限を超える大きさでは、行そのものは保持せずに次の方法で処理する:
+#  - 重複削除: 行の64bitハッシュだけを集合に持つ。集合が上限を超えたら (ハッシュ, 行番号) の
+#    固定長レコードを一時ファイルへ書き出し、外部ソート＋マージで「2回目以降の出現」の行番号を求めて
+#    元の順序のまま除く。ハッシュが偶然一致した別の行（2^64 分の1程度）も重複とみなす。
+#  - 並べ替え: 上限ごとに区切って並べた行を一時ファイルへ書き出し（UTF-8 のバイト順 = 文字コード順）、
+#    heapq.merge で1本にまとめる（外部マージソート）。
+# 並べ替えと重複削除を両方指定した場合は、並べ替えの後で隣り合う同じ行を除く（結果は同じで安い）。
+
+LINE_MEMORY_MB = 64
+_SET_ENTRY_BYTES = 64      # ハッシュ集合の1要素あたりの見積もり
+_LINE_OVERHEAD = 56        # str 1個あたりの見積もり（本体以外）
+_RECORD = struct.Struct("<qq")   # (ハッシュ, 行番号)
+_READ_BLOCK = 1 << 16
+
+def iter_lines(text: str, end: int = -1) -> Iterator[str]:
+    """text[:end].split("\n") と同じ行を、リストもコピーも作らずに順に返す（end<0 は末尾まで）"""
+    if end < 0:
+        end = len(text)
+    pos = 0
+    while True:
+        nl = text.find("\n", pos, end)
+        if nl < 0:
+            yield text[pos:end]
+            return
+        yield text[pos:nl]
+        pos = nl + 1
+
+class _LineJoiner:
+    """行を "\n" 区切りで貯める。一定行数ごとに結合して、行オブジェクトを大量に抱えない"""
+    def __init__(self):
+        self._chunks: list = []; self._buf: list = []
+
+    def add(self, line: str) -> None:
+        self._buf.append(line)
+        if len(self._buf) >= 65536:
+            self._chunks.append("\n".join(self._buf)); self._buf = []
+
+    def getvalue(self) -> str:
+        if self._buf or not self._chunks:
+            self._chunks.append("\n".join(self._buf)); self._buf = []
+        return "\n".join(self._chunks)
+
+def _write_records(tmpdir: str, records: list) -> str:
+    records.sort()
+    fd, path = tempfile.mkstemp(dir=tmpdir, suffix=".run")
+    with os.fdopen(fd, "wb") as f:
+        array("q", chain.from_iterable(records)).tofile(f)
+    return path
+
+def _read_records(path: str) -> Iterator[tuple]:
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(_READ_BLOCK * _RECORD.size)
+            if not buf:
+                return
+            yield from _RECORD.iter_unpack(buf)
+
+def _external_sorted_records(records: Iterator[tuple], limit: int, tmpdir: str) -> Iterator[tuple]:
+    """(int, int) の列を limit 件ずつ並べて書き出し、マージした順に返す"""
+    runs = []; buf = []
+    for rec in records:
+        buf.append(rec)
+        if len(buf) >= limit:
+            runs.append(_write_records(tmpdir, buf)); buf = []
+    if not runs:
+        buf.sort()
+        return iter(buf)
+    if buf:
+        runs.append(_write_records(tmpdir, buf))
+    return heapq.merge(*(_read_records(p) for p in runs))
+
+def _dedupe_external(lines: Callable[[], Iterator[str]], memory_bytes: int, start: int = 0) -> Iterator[str]:
+    """行番号 start 以降の行のうち、それより前（start より前も含む）に出ていない行を順に返す"""
+    limit = max(1024, memory_bytes // 100)  # 1レコード（タプル）あたり約100バイトで見積もる
+    with tempfile.TemporaryDirectory(prefix="textadj-") as tmpdir:
+        # 1) (ハッシュ, 行番号) をハッシュ順に並べ、各ハッシュの2件目以降が消す行
+        by_hash = _external_sorted_records(((hash(ln), i) for i, ln in enumerate(lines())), limit, tmpdir)
+        def drops() -> Iterator[tuple]:
+            prev = None
+            for h, i in by_hash:
+                if h == prev and i >= start:
+                    yield (i, 0)
+                prev = h
+        # 2) 消す行番号を昇順に並べ直し、元の順序で読みながら除く
+        drop_iter = (i for i, _ in _external_sorted_records(drops(), limit, tmpdir))
+        nxt = next(drop_iter, None)
+        for i, ln in enumerate(lines()):
+            if i < start:
+                continue
+            if i == nxt:
+                nxt = next(drop_iter, None)
+                continue
+            yield ln
+
+def iter_dedupe(lines: Callable[[], Iterator[str]], memory_bytes: int) -> Iterator[str]:
+    """最初の出現だけを残した行を順に返す。lines は行のイテレータを返す関数（2回呼ぶことがある）"""
+    seen: set = set()
+    cap = max(1, memory_bytes // _SET_ENTRY_BYTES)
+    for i, ln in enumerate(lines()):
+        h = hash(ln)
+        if h in seen:
+            continue
+        if len(seen) >= cap:
+            # 集合が上限を超えた → ここから先は一時ファイルを使う方法で（返し済みの行はそのまま）
+            seen = set()
+            yield from _dedupe_external(lines, memory_bytes, i)
+            return
+        seen.add(h)
+        yield ln
+
+def _join(lines: Iterator[str]) -> str:
+    out = _LineJoiner()
+    for ln in lines:
+        out.add(ln)
+    return out.getvalue()
+
+def dedupe_lines(lines: Callable[[], Iterator[str]], memory_bytes: int) -> str:
+    """最初の出現だけを残して重複行を除く。lines は行のイテレータを返す関数（2回呼ぶことがある）"""
+    return _join(iter_dedupe(lines, memory_bytes))
+
+def _write_run(tmpdir: str, lines: list) -> str:
+    lines.sort()
+    fd, path = tempfile.mkstemp(dir=tmpdir, suffix=".run")
+    with os.fdopen(fd, "wb") as f:
+        for ln in lines:
+            f.write(ln.encode("utf-8", "surrogatepass")); f.write(b"\n")
+    return path
+
+def _read_run(path: str) -> Iterator[bytes]:
+    with open(path, "rb", buffering=_READ_BLOCK) as f:
+        for ln in f:
+            yield ln[:-1]
+
+def iter_sorted(lines: Iterator[str], memory_bytes: int, unique: bool = False) -> Iterator[str]:
+    """行を文字コード順に返す。memory_bytes を超える分は一時ファイルに分けて外部マージソート。
+    unique=True なら同じ行は1つだけ返す"""
+    runs = []; buf = []; used = 0
+    with tempfile.TemporaryDirectory(prefix="textadj-") as tmpdir:
+        for ln in lines:
+            buf.append(ln); used += len(ln) * 2 + _LINE_OVERHEAD
+            if used >= memory_bytes:
+                runs.append(_write_run(tmpdir, buf)); buf = []; used = 0
+        prev = None
+        if runs:
+            if buf:
+                runs.append(_write_run(tmpdir, buf)); buf = []
+            merged = (b.decode("utf-8", "surrogatepass")
+                      for b in heapq.merge(*(_read_run(p) for p in runs)))
+        else:
+            buf.sort(); merged = iter(buf)
+        for ln in merged:
+            if unique and ln == prev:
+                continue
+            prev = ln
+            yield ln
+
+def sort_lines(lines: Iterator[str], memory_bytes: int, unique: bool = False) -> str:
+    """行を文字コード順に並べる（iter_sorted の結果を "\n" でつないだもの）"""
+    return _join(iter_sorted(lines, memory_bytes, unique))
+
+def dedupe_and_sort(text: str, dedupe: bool, sort: bool, memory_bytes: int) -> str:
+    """重複削除/並べ替えを text に適用する。末尾の改行は保ったまま行として扱わない"""
+    if not (dedupe or sort) or not text:
+        return text
+    trailing = text.endswith("\n")
+    end = len(text) - 1 if trailing else len(text)
+    if len(text) * 4 + text.count("\n") * _LINE_OVERHEAD <= memory_bytes:
+        lines = text[:end].split("\n")
+        if sort:
+            lines = sorted(set(lines)) if dedupe else sorted(lines)
+        else:
+            lines = list(dict.fromkeys(lines))
+        result = "\n".join(lines)
+    elif sort:
+        result = sort_lines(iter_lines(text, end), memory_bytes, unique=dedupe)
+    else:
+        result = dedupe_lines(lambda: iter_lines(text, end), memory_bytes)
+    return result + "\n" if trailing else result
+
+def iter_dedupe_and_sort(lines: Callable[[], Iterator[str]], dedupe: bool, sort: bool,
+                         memory_bytes: int) -> Iterator[str]:
+    """dedupe_and_sort の行単位版。テキスト全体を持たずに結果の行を順に返す（ファイルのストリーム処理用）。
+    lines は行のイテレータを返す関数（重複削除では2回呼ぶことがある）"""
+    if sort:
+        return iter_sorted(lines(), memory_bytes, unique=dedupe)
+    if dedupe:
+        return iter_dedupe(lines, memory_bytes)
+    return lines()
@@ -1,6 +1,20 @@
-import os, re, unicodedata
+import os, re, json, codecs, hashlib, multiprocessing, tempfile, time, unicodedata
+from bisect import bisect_right
+from concurrent.futures import wait as futures_wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import accumulate
 from pathlib import Path
 from typing import Iterable, Callable, Iterator, Optional
+from utils import atomic_write_bytes, atomic_open, looks_binary, is_binary_file, lower_exts, read_if_text, SNIFF_BYTES
+from archives import archive_kind, process_archive, ArchiveCanceled
+from shards import shard_of, journal_name
+from replacer import load_replacer, dictionary_signature
+from rules import ruleset_for
+from lineops import dedupe_and_sort, iter_dedupe_and_sort, LINE_MEMORY_MB
+from regexworker import run_isolated
+from diffview import render_diff_html
+from report import start_report, write_diff_part, write_omitted_part, finish_report
 
 DEFAULT_TEXT_EXTS = {
     ".txt",".md",".csv",".tsv",".log",".json",".jsonl",".xml",".yml",".yaml",
@@ -66,6 +80,23 @@ def is_halfwidth_kana(ch: str) -> bool:
 def convert_kana_fw_to_hw(ch: str) -> str:
     return _KANA_MAP.get(ch, ch)
 
+# ===== カナ半角→全角（_KANA_MAP の逆方向） =====
+# NFKC の結果を起動時に1回だけ表にしておく。濁点/半濁点は前の文字と合成（ｶﾞ→ガ, ﾊﾟ→パ, ﾜﾞ→ヷ）し、
+# 合成できない単独の ﾞ/ﾟ は結合文字ではなく ゛/゜ にする。
+_HW_KANA_TO_FULL = {chr(c): unicodedata.normalize("NFKC", chr(c)) for c in range(0xFF61, 0xFFA0)}
+_HW_KANA_TO_FULL[_DAKU] = "\u309B"
+_HW_KANA_TO_FULL[_HANDA] = "\u309C"
+_HW_KANA_PAIRS = {}
+for _c in range(0xFF66, 0xFF9E):
+    for _mark in (_DAKU, _HANDA):
+        _composed = unicodedata.normalize("NFKC", chr(_c) + _mark)
+        if len(_composed) == 1:
+            _HW_KANA_PAIRS[chr(_c) + _mark] = _composed
+_HW_KANA_PAIR_RE = re.compile("|".join(sorted(_HW_KANA_PAIRS)))
+
+def convert_kana_hw_to_fw(ch: str) -> str:
+    return _HW_KANA_TO_FULL.get(ch, ch)
+
 def convert_ascii_to_fullwidth(ch: str) -> str:
     if ch == " ":
         return "\u3000"
@@ -95,14 +126,14 @@ def convert_char(ch: str, mode: str, sets: dict, targets_set: set[str]) -> str:
         if sets.get("num") and is_digit(ch): eligible = True
         if sets.get("space") and is_space(ch): eligible = True
         if sets.get("sym") and is_symbol(ch): eligible = True
-        if sets.get("kata") and is_katakana(ch): eligible = True
+        if sets.get("kata") and (is_katakana(ch) or is_halfwidth_kana(ch)): eligible = True
     if not eligible:
         return ch
 
     if mode == "to_full":
-        # 半角英数/記号/スペース → 全角、半角カナはNFKCで全角化
+        # 半角英数/記号/スペース → 全角、半角カナは逆引き表で全角化
         if is_halfwidth_kana(ch):
-            return unicodedata.normalize("NFKC", ch)
+            return convert_kana_hw_to_fw(ch)
         return convert_ascii_to_fullwidth(ch)
 
     # to_half
@@ -113,14 +144,119 @@ def convert_char(ch: str, mode: str, sets: dict, targets_set: set[str]) -> str:
         return convert_kana_fw_to_hw(ch)
     return ch
 
-def apply_width_transform(text: str, mode: str, targets: str, sets: dict) -> str:
+def apply_width_transform(text: str, mode: str, targets: str, sets: dict,
+                          cache: Optional[tuple] = None) -> str:
+    """cache=(変換表, 判定済み文字の集合) を渡すと、同じ設定で繰り返し呼ぶ時に文字ごとの判定を使い回す"""
     if mode == "none":
         return text
     targets_set = set(targets) if targets else set()
-    out_chars = []
-    for ch in text:
-        out_chars.append(convert_char(ch, mode, sets, targets_set))
-    return "".join(out_chars)
+    if mode == "to_full" and _HW_KANA_PAIR_RE.search(text):
+        # 半角カナ＋濁点/半濁点の2文字を先に1文字へ合成（対象は先頭の文字で判定）
+        def compose(m):
+            pair = m.group(0)
+            if convert_char(pair[0], mode, sets, targets_set) == pair[0]:
+                return pair
+            return _HW_KANA_PAIRS[pair]
+        text = _HW_KANA_PAIR_RE.sub(compose, text)
+    # 出現する文字ごとに1回だけ判定し、str.translate で一括置換
+    table, seen = cache if cache is not None else ({}, set())
+    new = set(text) - seen
+    for ch in new:
+        conv = convert_char(ch, mode, sets, targets_set)
+        if conv != ch:
+            table[ord(ch)] = conv
+    seen |= new
+    return text.translate(table) if table else text
+
+# ===== 正規表現ガード =====
+# ユーザー入力の正規表現（行スキップ/改行トークン/置換辞書）が破滅的バックトラックで止まらないようにする。
+# regex モジュールがあれば実行ごとに時間上限を掛け、無ければ常駐の子プロセスで実行して
+# 時間切れならプロセスごと止める（regexworker.py）。どちらも形による事前の禁止はしない。
+# 上限は1回の検索/置換（行スキップなら1ファイルの全行の判定）ごとで、対象 1M 文字ごとに REGEX_TIMEOUT 秒まで。
+REGEX_TIMEOUT = 2.0  # 1回の検索/置換あたりの上限（秒）
+_REGEX_BUDGET_CHARS = 1 << 20
+
+try:
+    import regex as _regex_backend  # 任意依存（pip install regex）
+except ImportError:
+    _regex_backend = None
+
+class PatternError(ValueError):
+    """正規表現が不正で実行できない"""
+
+class PatternTimeout(TimeoutError):
+    """正規表現の実行が時間上限を超えた"""
+
+@lru_cache(maxsize=256)
+def compile_user_regex(pattern: str | bytes, flags: int = 0):
+    """検証してコンパイル（結果はキャッシュ）。不正なら PatternError"""
+    shown = pattern.decode("ascii", "replace") if isinstance(pattern, bytes) else pattern
+    try:
+        if _regex_backend is not None:
+            return _regex_backend.compile(pattern, flags)
+        return re.compile(pattern, flags)
+    except (re.error, getattr(_regex_backend, "error", re.error)) as e:
+        raise PatternError(f"正規表現エラー: {shown} ({e})") from None
+
+def _budget(timeout: float, size: int) -> float:
+    return timeout * max(1.0, size / _REGEX_BUDGET_CHARS)
+
+def _guarded_call(method, *args, timeout: float):
+    """regex モジュールのメソッドを時間上限つきで呼ぶ"""
+    try:
+        return method(*args, timeout=timeout)
+    except TimeoutError:
+        raise PatternTimeout(f"正規表現が {timeout} 秒以内に終わりませんでした") from None
+
+def _isolated(op: str, pattern, flags: int, args: tuple, timeout: float, size: int):
+    try:
+        return run_isolated(op, pattern, flags, args, _budget(timeout, size))
+    except TimeoutError as e:
+        raise PatternTimeout(str(e)) from None
+    except ValueError as e:
+        raise PatternError(f"正規表現の実行エラー: {e}") from None
+
+def guarded_sub(pattern, flags: int, repl, data, timeout: float = REGEX_TIMEOUT):
+    """re.sub の時間上限つき版（str / bytes）。時間切れは PatternTimeout"""
+    reg = compile_user_regex(pattern, flags)
+    if _regex_backend is not None:
+        return _guarded_call(reg.sub, repl, data, timeout=_budget(timeout, len(data)))
+    if not data:
+        return data
+    return _isolated("sub", pattern, flags, (repl, data), timeout, len(data))
+
+def guarded_matching_lines(pattern, flags: int, lines: list, timeout: float = REGEX_TIMEOUT) -> set:
+    """search が一致する行の番号（時間上限は全行の判定を合わせて）"""
+    reg = compile_user_regex(pattern, flags)
+    if _regex_backend is not None:
+        # 行ごとに上限を掛けると行数倍まで延びるので、期限を1つにして残り時間を渡す
+        budget = _budget(timeout, sum(map(len, lines)))
+        deadline = time.monotonic() + budget; hits = set()
+        for i, ln in enumerate(lines):
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise PatternTimeout(f"正規表現が {budget:g} 秒以内に終わりませんでした")
+            if _guarded_call(reg.search, ln, timeout=left):
+                hits.add(i)
+        return hits
+    if not lines:
+        return set()
+    return set(_isolated("lines", pattern, flags, (lines,), timeout, sum(map(len, lines))))
+
+def validate_settings(settings: dict) -> None:
+    """処理前に設定中の正規表現をすべて検証する（バッチ開始前など）。問題があれば PatternError"""
+    if settings.get("skip_regex"):
+        compile_user_regex(settings["skip_regex"], re.MULTILINE)
+    if settings.get("break_tokens_are_regex", False):
+        for pat in settings.get("break_tokens", []):
+            if pat: compile_user_regex(pat, re.MULTILINE)
+    if settings.get("replace_dict"):
+        load_replacer(settings["replace_dict"])  # 読めない/不正な辞書は DictionaryError(ValueError)
+    rules = ruleset_for(settings)  # 読めないルールファイルは RulesError(ValueError)
+    if rules:
+        for _, overrides in rules.rules:
+            eff = dict(settings); eff.update(overrides); eff["rules"] = None; eff["rules_file"] = None
+            validate_settings(eff)
 
 # ===== 改行挿入 =====
 def _insert_breaks_literal(text: str, tokens: list[str], exclude_tokens: list[str], mode: str) -> str:
@@ -143,18 +279,95 @@ def _insert_breaks_literal(text: str, tokens: list[str], exclude_tokens: list[st
         text = text.replace(ph, ex)
     return text
 
-def _insert_breaks_regex(text: str, tokens_regex: list[str], mode: str) -> str:
+def _insert_breaks_regex(text: str, tokens_regex: list[str], mode: str, timeout: float = REGEX_TIMEOUT) -> str:
     if not tokens_regex:
         return text
     repl = {"after": r"\g<0>\n", "before": r"\n\g<0>", "around": r"\n\g<0>\n"}[mode]
     for pat in sorted(set(tokens_regex), key=len, reverse=True):
         if not pat: continue
-        try:
-            text = re.sub(pat, repl, text, flags=re.MULTILINE)
-        except re.error:
-            pass
+        text = guarded_sub(pat, re.MULTILINE, repl, text, timeout)
     return text
 
+# ===== 桁数での折り返し（東アジアの文字幅・禁則処理） =====
+# 全角（East Asian Width が W/F、設定によっては曖昧幅 A も）は2桁、結合文字・書式文字は0桁、他は1桁。
+# 幅は BMP 分を事前に作った表で str.translate して一度に求め、文字ごとに unicodedata を呼ばない。
+# 折り返し位置は累積幅の二分探索で決め、行頭禁則/行末禁則に当たれば数文字まで前へ戻す（追い出し）。
+# 戻しきれない時は行頭禁則の文字を前の行にぶら下げる。各文字を定数回しか見ないので行の長さに線形。
+_KINSOKU_NO_START = frozenset(
+    "、。，．,.・：；？！?!:;)]}）］｝〕〉》」』】〙〗〟’”｠»"
+    "ーぁぃぅぇぉっゃゅょゎゕゖァィゥェォッャュョヮヵヶㇰㇱㇲㇳㇴㇵㇶㇷㇸㇹㇺㇻㇼㇽㇾㇿ"
+    "ゝゞヽヾ々〻‐゠–〜～｡､｣ｰｧｨｩｪｫｯｬｭｮﾞﾟ")
+_KINSOKU_NO_END = frozenset("([{（［｛〔〈《「『【〘〖〝‘“｟«｢")
+_KINSOKU_LOOKBACK = 4
+
+def _char_width(ch: str, ambiguous_wide: bool) -> int:
+    if unicodedata.category(ch) in ("Mn", "Me", "Cf"):
+        return 0
+    eaw = unicodedata.east_asian_width(ch)
+    return 2 if eaw in ("W", "F") or (ambiguous_wide and eaw == "A") else 1
+
+@lru_cache(maxsize=2)
+def _eaw_table(ambiguous_wide: bool) -> bytes:
+    """BMP の各コードポイントの表示幅（0/1/2）。str.translate の変換表として使う"""
+    return bytes(_char_width(chr(cp), ambiguous_wide) for cp in range(0x10000))
+
+_astral_widths: dict = {}  # (ambiguous_wide) -> {コードポイント: 幅の文字}
+
+def _widths(line: str, ambiguous_wide: bool) -> bytes:
+    """行の各文字の表示幅を並べたバイト列"""
+    ws = line.translate(_eaw_table(ambiguous_wide))  # BMP 外は表に無いのでそのまま残る
+    if not ws.isascii():
+        table = _astral_widths.setdefault(ambiguous_wide, {})
+        for ch in set(ws):
+            if ch > "\x7f" and ord(ch) not in table:
+                table[ord(ch)] = chr(_char_width(ch, ambiguous_wide))
+        ws = ws.translate(table)
+    return ws.encode("ascii")
+
+def _wrap_line(line: str, width: int, ambiguous_wide: bool) -> list[str]:
+    n = len(line)
+    if n * 2 <= width:
+        return [line]  # 全部全角でも収まる
+    ws = _widths(line, ambiguous_wide)
+    cum = list(accumulate(ws, initial=0))  # cum[k] = 先頭k文字の幅
+    out = []; s = 0
+    while cum[n] - cum[s] > width:
+        e = bisect_right(cum, cum[s] + width, s) - 1  # line[s:e] が収まる最長
+        if e <= s:
+            e = s + 1  # 1文字で幅を超える場合も最低1文字は置く
+        if e >= n:
+            out.append(line[s:])  # 残りが1文字だけ（幅を超える全角など）。禁則の判定は不要
+            return out
+        def bad(b: int) -> bool:
+            if b >= n:
+                return False
+            return line[b] in _KINSOKU_NO_START or ws[b] == 0 or line[b - 1] in _KINSOKU_NO_END
+        b = e
+        while b > s + 1 and e - b < _KINSOKU_LOOKBACK and bad(b):
+            b -= 1
+        if not bad(b):
+            e = b  # 追い出し
+        else:
+            while e < n and (line[e] in _KINSOKU_NO_START or ws[e] == 0):
+                e += 1  # ぶら下げ
+        out.append(line[s:e]); s = e
+        if s >= n:
+            return out
+    out.append(line[s:])
+    return out
+
+def wrap_text(text: str, width: int, ambiguous_wide: bool = False) -> str:
+    """各行を表示幅 width 桁で折り返す。行スキップで保護された行（プレースホルダ）はそのまま"""
+    if width <= 0:
+        return text
+    out = []
+    for line in text.split("\n"):
+        if line.startswith("__SKIPLINE_") and _SKIPLINE_TAG_RE.fullmatch(line):
+            out.append(line)
+        else:
+            out.extend(_wrap_line(line, width, ambiguous_wide))
+    return "\n".join(out)
+
 # ===== 行頭/行末・空白行 =====
 def _add_prefix_suffix(text: str, prefix: str, suffix: str) -> str:
     if not prefix and not suffix: return text
@@ -164,96 +377,869 @@ def _remove_blank_lines(text: str) -> str:
     return "\n".join(line for line in text.splitlines() if line.strip())
 
 # ===== 行スキップ保護 =====
-def _protect_skipped_lines_for_break(text: str, pattern: str):
+def _protect_skipped_lines_for_break(text: str, pattern: str, timeout: float = REGEX_TIMEOUT):
     if not pattern: return text, {}
-    try: reg = re.compile(pattern, re.MULTILINE)
-    except re.error: return text, {}
     lines = text.splitlines(False); protected = {}; kept=[]
+    hits = guarded_matching_lines(pattern, re.MULTILINE, lines, timeout)
     for i, ln in enumerate(lines):
-        if reg.search(ln):
+        if i in hits:
             tag = f"__SKIPLINE_{i}__"; protected[tag] = ln; kept.append(tag)
         else:
             kept.append(ln)
     return "\n".join(kept), protected
 
+_SKIPLINE_TAG_RE = re.compile(r"__SKIPLINE_\d+__")
+_SKIPLINE_TAG_SPLIT_RE = re.compile(r"(__SKIPLINE_\d+__)")
+
 def _restore_protected_lines(text: str, protected: dict) -> str:
-    for tag, ln in protected.items():
-        text = text.replace(tag, ln)
-    return text
+    if not protected: return text
+    # タグごとの replace（タグ数×全文）ではなく1パスで戻す
+    return _SKIPLINE_TAG_RE.sub(lambda m: protected.get(m.group(0), m.group(0)), text)
 
-# ===== メイン処理 =====
-def process_text(text: str, settings: dict) -> str:
-    # 0) 文字幅（対象限定）
-    text = apply_width_transform(text,
+# ===== 処理ステージ =====
+# 各ステージ関数は (text, protected, settings) -> (text, protected)。
+# protected は行スキップ保護で退避した行（保護解除ステージで戻す）。
+def _stage_width(text: str, protected: dict, settings: dict):
+    return apply_width_transform(text,
                                  settings.get("width_mode","none"),
                                  settings.get("width_targets",""),
-                                 settings.get("width_sets", {}))
+                                 settings.get("width_sets", {})), protected
 
-    # 1) 行スキップ保護
-    text, protected = _protect_skipped_lines_for_break(text, settings.get("skip_regex",""))
+def _stage_protect(text: str, protected: dict, settings: dict):
+    return _protect_skipped_lines_for_break(text, settings.get("skip_regex",""),
+                                            settings.get("regex_timeout", REGEX_TIMEOUT))
 
-    # 2) 改行挿入
+def _stage_replace(text: str, protected: dict, settings: dict):
+    if settings.get("replace_dict"):
+        replacer = load_replacer(settings["replace_dict"])
+        timeout = settings.get("regex_timeout", REGEX_TIMEOUT)
+        if protected:
+            # 保護済みの行（プレースホルダ）には置換を掛けない
+            parts = _SKIPLINE_TAG_SPLIT_RE.split(text)
+            parts[::2] = [replacer.apply(x, timeout) for x in parts[::2]]
+            text = "".join(parts)
+        else:
+            text = replacer.apply(text, timeout)
+    return text, protected
+
+def _stage_breaks(text: str, protected: dict, settings: dict):
     mode = settings.get("break_mode","after")
     if settings.get("break_tokens_are_regex", False):
-        text = _insert_breaks_regex(text, settings.get("break_tokens", []), mode)
+        text = _insert_breaks_regex(text, settings.get("break_tokens", []), mode,
+                                    settings.get("regex_timeout", REGEX_TIMEOUT))
     else:
         text = _insert_breaks_literal(text, settings.get("break_tokens", []),
                                       settings.get("break_exclude_tokens", []), mode)
+    return text, protected
+
+def _stage_wrap(text: str, protected: dict, settings: dict):
+    return wrap_text(text, int(settings.get("wrap_width", 0) or 0),
+                     settings.get("wrap_ambiguous_wide", False)), protected
+
+def _stage_prefix_suffix(text: str, protected: dict, settings: dict):
+    return _add_prefix_suffix(text, settings.get("prefix",""), settings.get("suffix","")), protected
+
+def _stage_remove_blanks(text: str, protected: dict, settings: dict):
+    if settings.get("remove_blanks", False):
+        text = _remove_blank_lines(text)
+    return text, protected
+
+def _stage_restore(text: str, protected: dict, settings: dict):
+    return _restore_protected_lines(text, protected), {}
+
+def _line_memory(settings: dict) -> int:
+    return int(settings.get("line_memory_mb", LINE_MEMORY_MB) or LINE_MEMORY_MB) << 20
+
+def _stage_lines(text: str, protected: dict, settings: dict):
+    return dedupe_and_sort(text, settings.get("dedupe_lines", False), settings.get("sort_lines", False),
+                           _line_memory(settings)), protected
+
+# (ステージ名, そのステージが参照する設定キー, 関数) を処理順に並べたもの
+PIPELINE_STAGES = (
+    ("width",         ("width_mode", "width_targets", "width_sets"), _stage_width),            # 0) 文字幅（対象限定）
+    ("skip",          ("skip_regex", "regex_timeout"), _stage_protect),                        # 1) 行スキップ保護
+    ("replace",       ("replace_dict",), _stage_replace),                                      # 2) 置換辞書
+    ("break",         ("break_mode", "break_tokens_are_regex", "break_tokens",
+                       "break_exclude_tokens", "regex_timeout"), _stage_breaks),               # 3) 改行挿入
+    ("wrap",          ("wrap_width", "wrap_ambiguous_wide"), _stage_wrap),                     # 4) 桁数で折り返し
+    ("prefix_suffix", ("prefix", "suffix"), _stage_prefix_suffix),                             # 5) 行頭/行末
+    ("remove_blanks", ("remove_blanks",), _stage_remove_blanks),                               # 6) 空白行削除
+    ("restore",       (), _stage_restore),                                                     # 7) 保護解除
+    ("lines",         ("dedupe_lines", "sort_lines", "line_memory_mb"), _stage_lines),         # 8) 重複削除/並べ替え
+)
+
+# ===== メイン処理 =====
+def process_text(text: str, settings: dict) -> str:
+    protected: dict = {}
+    for _, _, fn in PIPELINE_STAGES:
+        text, protected = fn(text, protected, settings)
+    return text
+
+class PipelineMemo:
+    """ステージごとの中間結果を覚えておき、設定が変わったステージ以降だけ再計算する。
+    同じ元テキスト・同じ設定で再度呼ぶと最終結果をそのまま返す（プレビュー→保存など）。"""
+    def __init__(self):
+        self._source: Optional[str] = None
+        self._keys: list = []     # 各ステージの依存設定の指紋
+        self._states: list = []   # 各ステージ後の (text, protected)
+
+    def run(self, text: str, settings: dict) -> str:
+        if text is not self._source and text != self._source:
+            self._source = text; self._keys = []; self._states = []
+        state = (text, {})
+        for i, (_, keys, fn) in enumerate(PIPELINE_STAGES):
+            key = settings_fingerprint({k: settings.get(k) for k in keys})
+            if i < len(self._keys) and self._keys[i] == key:
+                state = self._states[i]
+                continue
+            del self._keys[i:]; del self._states[i:]
+            state = fn(state[0], state[1], settings)
+            self._keys.append(key); self._states.append(state)
+        return state[0]
+
+def _stage_active(name: str, settings: dict) -> bool:
+    """そのステージが何かを変えうるか（無効なステージは素通しと同じ結果になる）"""
+    if name == "width":         return settings.get("width_mode", "none") != "none"
+    if name in ("skip", "restore"): return bool(settings.get("skip_regex"))
+    if name == "replace":       return bool(settings.get("replace_dict"))
+    if name == "break":         return bool(settings.get("break_tokens"))
+    if name == "wrap":          return bool(settings.get("wrap_width"))
+    if name == "prefix_suffix": return bool(settings.get("prefix") or settings.get("suffix"))
+    if name == "remove_blanks": return bool(settings.get("remove_blanks", False))
+    if name == "lines":         return bool(settings.get("dedupe_lines") or settings.get("sort_lines"))
+    return True
+
+class Pipeline:
+    """1つの設定に対して1回だけ用意する処理パイプライン（バッチで同じ設定の多数ファイルに使い回す）。
+    設定の検証（正規表現のコンパイル・置換辞書の読み込み）を済ませ、有効なステージだけを並べる。
+    文字幅変換の文字ごとの判定結果もファイルをまたいで共有する。"""
+    def __init__(self, settings: dict):
+        validate_settings(settings)
+        self.settings = settings
+        self._stages = [(name, fn) for name, _, fn in PIPELINE_STAGES if _stage_active(name, settings)]
+        self.exts_low = lower_exts(settings.get("exts") or DEFAULT_TEXT_EXTS)  # 対象の拡張子（小文字）
+        self._width_cache: tuple = ({}, set())
+
+    def process_text(self, text: str) -> str:
+        return self._run(text, self._stages)
+
+    def process_block(self, text: str) -> str:
+        """重複削除/並べ替え（"lines"）以外のステージを掛ける（行のストリーム処理で、行のまとまりごとに使う）"""
+        return self._run(text, [st for st in self._stages if st[0] != "lines"])
+
+    def _run(self, text: str, stages: list) -> str:
+        s = self.settings; protected: dict = {}
+        for name, fn in stages:
+            if name == "width":
+                text = apply_width_transform(text, s.get("width_mode", "none"), s.get("width_targets", ""),
+                                             s.get("width_sets", {}), self._width_cache)
+            else:
+                text, protected = fn(text, protected, s)
+        return text
+
+    def transform_bytes(self, raw: bytes) -> bytes:
+        if self.settings.get("preserve_format", False):
+            return self._transform_preserving(raw)
+        if self.settings.get("bytes_fast_path", True):
+            out = process_bytes(raw, self.settings)
+            if out is not None:
+                return out
+        return encode_output(self.process_text(decode_input(raw)))
+
+    def _transform_preserving(self, raw: bytes) -> bytes:
+        """入力と同じ文字コード・BOM・改行で出力する。内容が変わらなければ入力のバイト列をそのまま返す"""
+        fmt = detect_format(raw)
+        enc, bom, newline = fmt
+        body = raw[len(bom):] if bom else raw
+        if enc == "utf-8" and self.settings.get("bytes_fast_path", True):
+            # UTF-8 はデコードもエンコードもせずバイト列のまま処理し、改行だけ元の形に戻す
+            out = process_bytes(body, self.settings, newline)
+            if out is not None:
+                return raw if out == body else bom + out
+        text = decode_with_format(raw, fmt)
+        out_text = self.process_text(text)
+        if out_text == text:
+            return raw  # 改行が混在していても元のまま
+        return encode_output(out_text, fmt)
+
+_PIPELINE_CACHE_SIZE = 16
+_pipelines: dict = {}  # 設定の指紋 -> Pipeline
+
+def compile_pipeline(settings: dict) -> Pipeline:
+    """設定から Pipeline を作る。同じ内容の設定なら（プロセス内で）以前のものを返す"""
+    key = settings_fingerprint(settings)
+    pipe = _pipelines.get(key)
+    if pipe is None:
+        pipe = Pipeline(settings)
+        while len(_pipelines) >= _PIPELINE_CACHE_SIZE:
+            _pipelines.pop(next(iter(_pipelines)))
+        _pipelines[key] = pipe
+    return pipe
+
+# ===== バイト列のまま処理する高速経路（ASCII / UTF-8） =====
+# デコード→処理→エンコードを省き、生のバイト列に bytes.replace / bytes正規表現 を掛ける。
+# str 経路と結果が完全に一致する場合だけ使い、それ以外は None を返して str 経路に任せる。
+# ※ PIPELINE_STAGES にステージを追加したら _bytes_path_ok と process_bytes も対応させること。
+
+# str.splitlines / str.strip / 正規表現 \s が bytes と解釈を変える制御文字（\v \f \x1c-\x1f）と
+# UTF-8 の行区切り（U+0085, U+2028, U+2029）
+_BYTES_UNSAFE = (b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e", b"\x1f")
+_BYTES_UNSAFE_UTF8 = (b"\xc2\x85", b"\xe2\x80\xa8", b"\xe2\x80\xa9")
+_SKIPLINE_TAG_BYTES_RE = re.compile(rb"__SKIPLINE_\d+__")
+
+def _bytes_pattern_ok(pat: str) -> bool:
+    """bytes の正規表現としても使えるか（\\u / \\U / \\N{..} などは str でしか書けない）"""
+    if not pat:
+        return True
+    if not pat.isascii():
+        return False
+    try:
+        compile_user_regex(pat.encode("ascii"), re.MULTILINE)
+    except PatternError:
+        return False
+    return True
+
+def _bytes_path_ok(raw: bytes, settings: dict) -> bool:
+    if settings.get("replace_dict") or settings.get("wrap_width") \
+            or settings.get("dedupe_lines") or settings.get("sort_lines"):
+        return False  # 置換辞書・折り返し・重複削除/並べ替えは str 経路のみ
+    is_ascii = raw.isascii()
+    width_mode = settings.get("width_mode", "none")
+    if width_mode == "to_full":
+        return False
+    if width_mode == "to_half" and not is_ascii:
+        return False  # ASCIIのみなら半角化は何も変えない
+    skip = settings.get("skip_regex", "")
+    if skip and not (is_ascii and _bytes_pattern_ok(skip)):
+        return False
+    if settings.get("break_tokens_are_regex", False):
+        if settings.get("break_tokens") and not (is_ascii and all(map(_bytes_pattern_ok, settings["break_tokens"]))):
+            return False
+    if settings.get("remove_blanks", False) and not is_ascii:
+        return False  # 全角スペース等の strip() 判定が bytes と異なる
+    # 文字クラスの正規表現より、個別の部分一致検索のほうが速い
+    if any(b in raw for b in _BYTES_UNSAFE):
+        return False
+    if not is_ascii:
+        if any(b in raw for b in _BYTES_UNSAFE_UTF8):
+            return False
+        try:
+            raw.decode("utf-8")  # 不正なバイト列は str 経路で U+FFFD に置き換える
+        except UnicodeDecodeError:
+            return False
+    return True
+
+def _insert_breaks_literal_bytes(data: bytes, tokens: list[str], exclude_tokens: list[str], mode: str) -> bytes:
+    # 並び順は str 版と同じ（文字数の降順）にする
+    if not tokens:
+        return data
+    placeholders = {}
+    for ex in sorted(set(exclude_tokens), key=len, reverse=True):
+        if not ex: continue
+        ph = f"__EXCL_{hash(ex)}__".encode("ascii")
+        data = data.replace(ex.encode("utf-8"), ph)
+        placeholders[ph] = ex.encode("utf-8")
+    for t in sorted(set(tokens), key=len, reverse=True):
+        if not t: continue
+        tb = t.encode("utf-8")
+        if mode == "after":    data = data.replace(tb, tb + b"\n")
+        elif mode == "before": data = data.replace(tb, b"\n" + tb)
+        else:                  data = data.replace(tb, b"\n" + tb + b"\n")
+    for ph, ex in placeholders.items():
+        data = data.replace(ph, ex)
+    return data
+
+def process_bytes(raw: bytes, settings: dict, newline: Optional[str] = None) -> Optional[bytes]:
+    """UTF-8 のバイト列を直接処理し、encode_output と同じ形式のバイト列を返す（改行は newline、省略時はOS既定）。
+    設定や内容が高速経路に向かない場合は None（呼び出し側で str 経路へ）"""
+    if not _bytes_path_ok(raw, settings):
+        return None
+    timeout = settings.get("regex_timeout", REGEX_TIMEOUT)
+    data = raw
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+    # 1) 行スキップ保護
+    protected = {}
+    if settings.get("skip_regex"):
+        kept = []; lines = data.splitlines()
+        hits = guarded_matching_lines(settings["skip_regex"].encode("ascii"), re.MULTILINE, lines, timeout)
+        for i, ln in enumerate(lines):
+            if i in hits:
+                tag = f"__SKIPLINE_{i}__".encode("ascii"); protected[tag] = ln; kept.append(tag)
+            else:
+                kept.append(ln)
+        data = b"\n".join(kept)
+
+    # 2) 改行挿入
+    mode = settings.get("break_mode", "after")
+    tokens = settings.get("break_tokens", [])
+    if settings.get("break_tokens_are_regex", False):
+        if tokens:
+            repl = {"after": rb"\g<0>\n", "before": rb"\n\g<0>", "around": rb"\n\g<0>\n"}[mode]
+            for pat in sorted(set(tokens), key=len, reverse=True):
+                if not pat: continue
+                data = guarded_sub(pat.encode("ascii"), re.MULTILINE, repl, data, timeout)
+    else:
+        data = _insert_breaks_literal_bytes(data, tokens, settings.get("break_exclude_tokens", []), mode)
 
     # 3) 行頭/行末
-    text = _add_prefix_suffix(text, settings.get("prefix",""), settings.get("suffix",""))
+    prefix = settings.get("prefix", ""); suffix = settings.get("suffix", "")
+    if prefix or suffix:
+        pb = prefix.encode("utf-8"); sb = suffix.encode("utf-8")
+        lines = data.splitlines()
+        # 行ごとの連結を避け、区切り側に行末+改行+行頭を入れて1回のjoinで済ませる
+        data = pb + (sb + b"\n" + pb).join(lines) + sb if lines else b""
 
     # 4) 空白行削除
     if settings.get("remove_blanks", False):
-        text = _remove_blank_lines(text)
+        data = b"\n".join(filter(bytes.strip, data.splitlines()))
 
     # 5) 保護解除
-    return _restore_protected_lines(text, protected)
+    if protected:
+        data = _SKIPLINE_TAG_BYTES_RE.sub(lambda m: protected.get(m.group(0), m.group(0)), data)
+
+    newline = os.linesep if newline is None else newline
+    if newline != "\n":
+        data = data.replace(b"\n", newline.encode("ascii"))
+    return data
+
+_FILE_SETTING_KEYS = ("replace_dict", "rules_file")  # 値がファイルパスの設定
+
+def settings_fingerprint(settings: dict) -> str:
+    """設定dictの内容から安定したハッシュ文字列を作る（キャッシュのキー用）"""
+    def norm(v):
+        if isinstance(v, (set, frozenset)): return sorted(norm(x) for x in v)
+        if isinstance(v, dict): return {str(k): norm(x) for k, x in v.items()}
+        if isinstance(v, (list, tuple)): return [norm(x) for x in v]
+        return v
+    settings = dict(settings)
+    for k in _FILE_SETTING_KEYS:
+        if settings.get(k):  # 参照先ファイルの更新でもキーが変わるようにする
+            settings[k + "@sig"] = dictionary_signature(settings[k])
+    blob = json.dumps(norm(settings), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
 
 # ====== 進捗対応：対象列挙 → ディレクトリ処理 ======
-def enumerate_target_files(in_dir: str, exts: Iterable[str], recursive: bool) -> Iterator[Path]:
+def enumerate_target_files(in_dir: str, exts: Iterable[str], recursive: bool,
+                           include_archives: bool = False) -> Iterator[Path]:
     src_root = Path(in_dir)
-    exts_low = {e.lower() for e in exts}
+    exts_low = lower_exts(exts)
+    def wanted(p: Path) -> bool:
+        return p.suffix.lower() in exts_low or (include_archives and archive_kind(p) is not None)
     if recursive:
         for root, _, files in os.walk(src_root):
             rp = Path(root)
             for name in files:
                 p = rp / name
-                if p.suffix.lower() in exts_low:
+                if wanted(p):
                     yield p
     else:
         for p in src_root.iterdir():
-            if p.is_file() and p.suffix.lower() in exts_low:
+            if p.is_file() and wanted(p):
                 yield p
 
+def decode_input(raw: bytes) -> str:
+    """Path.read_text(encoding="utf-8", errors="replace") と同じ結果（改行は \n に統一）"""
+    text = raw.decode("utf-8", errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def encode_output(text: str, fmt: Optional[tuple] = None) -> bytes:
+    """Path.write_text(encoding="utf-8") と同じバイト列（改行はOS既定）にする。
+    fmt=(文字コード, BOM, 改行)（detect_format の戻り値）を渡すとその形で1回だけエンコードする。
+    その文字コードで表せない文字があれば UnicodeEncodeError（黙って別の文字にはしない）。"""
+    enc, bom, newline = fmt or ("utf-8", b"", os.linesep)
+    if bom and text.startswith("\ufeff"):
+        text = text[1:]  # BOM を文字として読んだテキスト（utf-8 指定で読んだ場合など）
+    if newline != "\n":
+        text = text.replace("\n", newline)
+    return bom + text.encode(enc)
+
+# ===== 入力の形式（文字コード・BOM・改行）を保つ =====
+# settings["preserve_format"] がONなら、読み込んだバイト列から形式を判定し、出力も同じ形で書く。
+# 文字コードは BOM → UTF-8 として正しいか → CP932 の順に判定（どれでもなければ UTF-8 として置換読み）。
+# 改行は最初に現れた改行の形（CRLF / LF / CR）に揃える。
+_BOMS = (  # 長いものから照合する（UTF-32LE の BOM は UTF-16LE の BOM で始まる）
+    (b"\xff\xfe\x00\x00", "utf-32-le"), (b"\x00\x00\xfe\xff", "utf-32-be"),
+    (b"\xef\xbb\xbf", "utf-8"), (b"\xff\xfe", "utf-16-le"), (b"\xfe\xff", "utf-16-be"),
+)
+
+# 判定器（chardet等）の名前を、書き戻しても文字が欠けにくい上位互換の文字コードへ寄せる
+_ENCODING_ALIASES = {"utf-8-sig": "utf-8", "ascii": "utf-8", "shift_jis": "cp932"}
+
+def _first_newline(s, cr, lf) -> str:
+    i = s.find(lf)
+    if i < 0:
+        return "\r" if cr in s else os.linesep
+    j = s.find(cr, 0, i)
+    if j >= 0 and j < i - 1:
+        return "\r"        # LF より前に単独の CR
+    return "\r\n" if j == i - 1 else "\n"
+
+def detect_format(raw: bytes, encoding: Optional[str] = None, partial: bool = False) -> tuple[str, bytes, str]:
+    """バイト列の (文字コード, BOM, 改行) を返す。encoding を渡すと文字コードはそれに従う（BOMと改行は判定）。
+    partial=True は raw がファイルの先頭部分だけの場合（末尾で文字が途切れていても判定を誤らない）"""
+    bom = b""
+    for b, enc in _BOMS:
+        if raw.startswith(b):
+            bom = b; encoding = enc; break
+    if encoding is None:
+        encoding = "utf-8"
+        if not raw.isascii():
+            try:
+                codecs.getincrementaldecoder("utf-8")().decode(raw, final=not partial)
+            except UnicodeDecodeError:
+                try:
+                    codecs.getincrementaldecoder("cp932")().decode(raw, final=not partial); encoding = "cp932"
+                except UnicodeDecodeError:
+                    pass
+    else:
+        try:
+            encoding = codecs.lookup(encoding).name
+        except LookupError:
+            encoding = "utf-8"
+        encoding = _ENCODING_ALIASES.get(encoding, encoding)
+    if encoding.startswith("utf-16") or encoding.startswith("utf-32"):
+        newline = _first_newline(raw[len(bom):len(bom) + SNIFF_BYTES].decode(encoding, errors="ignore"), "\r", "\n")
+    else:
+        newline = _first_newline(raw, b"\r", b"\n")
+    return encoding, bom, newline
+
+def decode_with_format(raw: bytes, fmt: tuple) -> str:
+    """detect_format の形式でデコードする（BOM は除き、改行は \n に統一）"""
+    text = raw[len(fmt[1]):].decode(fmt[0], errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def decode_for(raw: bytes, settings: dict) -> str:
+    """設定に合わせて入力をデコードする（preserve_format なら判定した文字コードで）"""
+    return decode_with_format(raw, detect_format(raw)) if settings.get("preserve_format", False) \
+        else decode_input(raw)
+
+def transform_bytes(raw: bytes, settings: dict) -> bytes:
+    """ファイル内容（バイト列）→ 出力バイト列。可能ならバイト列のまま処理する"""
+    return compile_pipeline(settings).transform_bytes(raw)
+
+def write_bytes_output(out_path: Path, data: bytes, settings: dict) -> bool:
+    """エンコード済みの出力を書き出す（write_output のバイト列版）"""
+    return atomic_write_bytes(out_path, data, skip_unchanged=settings.get("skip_unchanged", False))
+
+def write_output(out_path: Path, text: str, settings: dict, fmt: Optional[tuple] = None) -> bool:
+    """処理結果を一時ファイル経由で書き出す。skip_unchanged時、同一内容なら書かずに False。
+    fmt（detect_format の戻り値）を渡すとその文字コード・BOM・改行で書く"""
+    return write_bytes_output(out_path, encode_output(text, fmt), settings)
+
+# ===== 大きいファイルの重複削除/並べ替え（行のストリーム処理） =====
+# 重複削除・並べ替えはファイル全体の行を見るため、通常の経路ではファイル全体を読んでから処理する。
+# 全体を読むと line_memory_mb を超えそうなファイルは、全体を持たずに次の2段で処理する:
+#  1) 入力を少しずつ読んでデコードし、行の区切りで切ったまとまりごとに "lines" 以外のステージを掛け、
+#     結果の行を一時ファイルへ書く
+#  2) その行に lineops の重複削除/並べ替え（上限を超えれば一時ファイルを使う）を掛けながら、出力へ少しずつ書く
+# 各ステージは行ごとに働くので、全体を一度に処理した結果と同じになる。ただし改行をまたぐ置換辞書の項目や
+# 改行位置の正規表現は、まとまり（line_memory_mb の数十分の1程度の文字数）の境目ではつながらない。
+# 差分レポートには「大きいファイルのため省略」とだけ載せる。
+_STREAM_FACTOR = 6            # 全体を読む経路のピークメモリの見積もり（ファイルサイズの倍数）
+_STREAM_READ = 1 << 20        # 1回に読むバイト数
+_STREAM_MIN_BLOCK = 1 << 16   # まとまりの最小文字数
+
+def needs_line_streaming(path: Path, settings: dict) -> bool:
+    """重複削除/並べ替えが有効で、ファイル全体を読むとメモリの上限を超えそうか"""
+    if not (settings.get("dedupe_lines") or settings.get("sort_lines")):
+        return False
+    try:
+        return os.stat(path).st_size * _STREAM_FACTOR > _line_memory(settings)
+    except OSError:
+        return False
+
+def _iter_line_blocks(f, head: bytes, fmt: tuple, block_chars: int, digest) -> Iterator[str]:
+    """f（先頭 head は読み済み）を少しずつデコードして改行を \n に揃え、行の区切りで切ったまとまりを返す。
+    まとまり同士は "\n" でつなぐと全体になる。最後のまとまりは1つ前と合わせて返す（末尾の扱いを全体と揃える）。
+    読んだバイト列は digest にも渡す"""
+    decoder = codecs.getincrementaldecoder(fmt[0])(errors="replace")
+    raw = head[len(fmt[1]):]; digest.update(head)
+    buf = ""; cr = ""; prev = None
+    while True:
+        final = not raw
+        text = cr + decoder.decode(raw, final)
+        cr = "\r" if not final and text.endswith("\r") else ""  # CRLF が読み込みの境目で切れた
+        if cr: text = text[:-1]
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        buf += text
+        if len(buf) >= block_chars:
+            cut = buf.rfind("\n")
+            if cut >= 0:
+                if prev is not None:
+                    yield prev
+                prev = buf[:cut]; buf = buf[cut + 1:]
+        if final:
+            yield buf if prev is None else prev + "\n" + buf
+            return
+        raw = f.read(_STREAM_READ); digest.update(raw)
+
+class _SameOutput(Exception):
+    pass
+
+def _file_digest(path: Path, size: int) -> Optional[bytes]:
+    try:
+        if os.stat(path).st_size != size:
+            return None
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            while True:
+                buf = f.read(_STREAM_READ)
+                if not buf:
+                    return h.digest()
+                h.update(buf)
+    except OSError:
+        return None
+
+def _stream_lines_file(p: Path, out_path: Path, settings: dict, pipeline: Pipeline,
+                       is_canceled: Optional[Callable[[], bool]] = None) -> tuple[bool, bool]:
+    """needs_line_streaming なファイルを、全体を読まずに処理して out_path へ書く。
+    戻り値は (書いたか, 入力から内容が変わったか)。skip_unchanged で出力が既存と同じなら書かない。
+    キャンセル時は ArchiveCanceled を送出する（書きかけの出力は残らない）"""
+    memory = _line_memory(settings)
+    block_chars = max(_STREAM_MIN_BLOCK, memory // (_STREAM_FACTOR * 4))
+    remove_blanks = settings.get("remove_blanks", False)
+    src_digest = hashlib.sha1()
+    with open(p, "rb") as f, tempfile.TemporaryDirectory(prefix="textadj-") as tmpdir:
+        head = f.read(_STREAM_READ)
+        fmt = detect_format(head, partial=True) if settings.get("preserve_format", False) \
+            else ("utf-8", b"", os.linesep)
+        spill = os.path.join(tmpdir, "lines")
+        last = None
+        with open(spill, "wb") as sp:
+            for block in _iter_line_blocks(f, head, fmt, block_chars, src_digest):
+                if is_canceled and is_canceled():
+                    raise ArchiveCanceled()
+                if last is not None:
+                    sp.write(last.encode("utf-8", "surrogatepass")); sp.write(b"\n")
+                last = pipeline.process_block(block)
+                if remove_blanks and not last:
+                    last = None  # 空行を消した結果が空のまとまりは、行を1つも持たない
+            trailing = last is not None and last.endswith("\n")
+            if last is not None:
+                sp.write((last[:-1] if trailing else last).encode("utf-8", "surrogatepass")); sp.write(b"\n")
+
+        def lines() -> Iterator[str]:
+            with open(spill, "rb", buffering=_STREAM_READ) as r:
+                for b in r:
+                    yield b[:-1].decode("utf-8", "surrogatepass")
+
+        enc, bom, newline = fmt
+        encoder = codecs.getincrementalencoder(enc)()
+        dst_digest = hashlib.sha1(bom); size = len(bom)
+        try:
+            with atomic_open(out_path) as out:
+                out.write(bom)
+                batch = []; used = 0; first = True
+                def flush():
+                    nonlocal size
+                    data = encoder.encode("".join(batch))
+                    out.write(data); dst_digest.update(data); size += len(data)
+                for ln in iter_dedupe_and_sort(lines, settings.get("dedupe_lines", False),
+                                               settings.get("sort_lines", False), memory):
+                    if not first:
+                        batch.append(newline)
+                    batch.append(ln); used += len(ln); first = False
+                    if used >= _STREAM_READ:
+                        if is_canceled and is_canceled():
+                            raise ArchiveCanceled()
+                        flush(); batch = []; used = 0
+                if trailing:
+                    batch.append(newline)
+                flush()
+                if settings.get("skip_unchanged", False) and _file_digest(out_path, size) == dst_digest.digest():
+                    raise _SameOutput()
+        except _SameOutput:
+            return False, dst_digest.digest() != src_digest.digest()
+    return True, dst_digest.digest() != src_digest.digest()
+
+_STAT_COUNTERS = ("written", "unchanged", "failed", "timed_out", "archive_members", "binary")
+
+def init_stats(stats: Optional[dict] = None) -> dict:
+    """バッチ結果の集計dictを用意する（既存のdictには足りないキーだけ足す）"""
+    if stats is None: stats = {}
+    for k in _STAT_COUNTERS: stats.setdefault(k, 0)
+    stats.setdefault("timed_out_files", [])
+    stats.setdefault("binary_files", [])
+    stats.setdefault("diff_reports", [])
+    return stats
+
+# process_file の結果のうち「処理できた」とみなすもの
+PROCESSED_STATUSES = ("written", "unchanged")
+
+def process_file(
+    p: Path, src_root: Path, dst_root: Path, settings: dict, stats: Optional[dict] = None,
+    is_canceled: Optional[Callable[[], bool]] = None, pipeline: Optional[Pipeline] = None
+) -> str:
+    """src_root 配下の1ファイル（またはアーカイブ）を dst_root の同じ相対位置へ出力する。
+    結果を "written" / "unchanged" / "skipped" / "binary" / "timed_out" / "failed" で返し、stats にも数える。
+    settings["skip_binary"]（既定ON）なら、先頭を嗅いでバイナリと判定したファイルは全体を読まずに "binary"。
+    pipeline を渡すとそれで変換する（省略時は compile_pipeline(settings)）。
+    settings["diff_report_dir"] があれば、内容が変わったファイルの差分をその場で作業フォルダへ書く
+    （report.py。レポートへの連結は process_directory が行う。アーカイブは対象外）。
+    重複削除/並べ替えが有効で全体を読むとメモリの上限を超えそうなファイルは、行のストリームとして処理する
+    （needs_line_streaming / _stream_lines_file）。
+    キャンセル時のみ ArchiveCanceled を送出する。"""
+    stats = init_stats(stats)
+    pipeline = pipeline or compile_pipeline(settings)
+    skip_binary = settings.get("skip_binary", True)
+    def transform(raw: bytes) -> bytes:
+        # アーカイブ内のバイナリらしいメンバーは変換せずそのまま入れる
+        if skip_binary and looks_binary(raw[:SNIFF_BYTES]):
+            return raw
+        return pipeline.transform_bytes(raw)
+    try:
+        rel = p.relative_to(src_root)
+    except Exception:
+        rel = p.name
+    try:
+        if settings.get("archives", False) and p.suffix.lower() not in pipeline.exts_low and archive_kind(p):
+            members = process_archive(p, dst_root / rel, pipeline.exts_low, transform, is_canceled)
+            if members is None:
+                return "skipped"
+            stats["archive_members"] += members; stats["written"] += 1
+            return "written"
+        if needs_line_streaming(p, settings):
+            if skip_binary and is_binary_file(p):
+                stats["binary"] += 1; stats["binary_files"].append(str(rel))
+                return "binary"
+            written, changed = _stream_lines_file(p, dst_root / rel, settings, pipeline, is_canceled)
+            if settings.get("diff_report_dir") and changed:
+                write_omitted_part(settings, Path(rel).as_posix())
+        else:
+            raw = read_if_text(p) if skip_binary else p.read_bytes()
+            if raw is None:
+                stats["binary"] += 1; stats["binary_files"].append(str(rel))
+                return "binary"
+            data = pipeline.transform_bytes(raw)
+            if settings.get("diff_report_dir") and data != raw:
+                write_diff_part(settings, Path(rel).as_posix(), decode_for(raw, settings), decode_for(data, settings))
+            written = write_bytes_output(dst_root / rel, data, settings)
+        if written:
+            stats["written"] += 1
+            return "written"
+        stats["unchanged"] += 1
+        return "unchanged"
+    except ArchiveCanceled:
+        raise
+    except PatternTimeout:
+        stats["timed_out"] += 1; stats["timed_out_files"].append(str(rel))
+        return "timed_out"
+    except Exception:
+        # 1件失敗しても続行
+        stats["failed"] += 1
+        return "failed"
+
+def process_file_with_diff(src_path: str, out_path: str, settings: dict, max_diff_bytes: int) -> dict:
+    """src_path を処理して out_path へ書き、プレビュー用の差分HTMLも作って返す（GUIの複数ファイルD&D・ワーカープロセス用）。
+    戻り値: {"status", "mtime"} と、max_diff_bytes 以下なら {"src", "dst", "html": (左, 右)}。
+    "src" は GUI の読み込みと同じ結果になる場合だけ入れる（UTF-8 として読めた時、または
+    preserve_format で detect_format した時。後者は "fmt" に形式も入れる）。"""
+    p = Path(src_path)
+    try:
+        mtime = os.stat(p).st_mtime_ns
+        if needs_line_streaming(p, settings):
+            # 全体を読まずに処理する（差分は作らない）
+            if settings.get("skip_binary", True) and is_binary_file(p):
+                return {"status": "binary", "mtime": mtime}
+            written, _ = _stream_lines_file(p, Path(out_path), settings, compile_pipeline(settings))
+            return {"status": "written" if written else "unchanged", "mtime": mtime}
+        raw = read_if_text(p) if settings.get("skip_binary", True) else p.read_bytes()
+        if raw is None:
+            return {"status": "binary", "mtime": mtime}
+        data = compile_pipeline(settings).transform_bytes(raw)
+        written = write_bytes_output(Path(out_path), data, settings)
+    except PatternTimeout:
+        return {"status": "timed_out"}
+    except Exception as e:
+        return {"status": "failed", "error": str(e)}
+    res = {"status": "written" if written else "unchanged", "mtime": mtime}
+    if len(raw) <= max_diff_bytes:
+        src = decode_for(raw, settings); dst = decode_for(data, settings)
+        if settings.get("preserve_format", False):
+            res["src"] = src; res["fmt"] = detect_format(raw)
+        else:
+            try:
+                raw.decode("utf-8"); res["src"] = src
+            except UnicodeDecodeError:
+                pass
+        res["dst"] = dst
+        res["html"] = render_diff_html(src, dst)
+    return res
+
+def iter_batch_targets(in_dir: str, settings: dict) -> Iterator[tuple[Path, str]]:
+    """バッチの対象を (パス, 相対パス(posix)) で列挙する。settings["shard"] があればそのシャード分だけ"""
+    src_root = Path(in_dir)
+    exts = settings.get("exts") or DEFAULT_TEXT_EXTS
+    shard = tuple(settings["shard"]) if settings.get("shard") else None
+    for p in enumerate_target_files(in_dir, exts, settings.get("recursive", True),
+                                    include_archives=settings.get("archives", False)):
+        rel = p.relative_to(src_root).as_posix()
+        if shard and shard_of(rel, shard[1]) != shard[0]:
+            continue
+        yield p, rel
+
+BATCH_CHUNK = 16  # executor 使用時、1タスクにまとめるファイル数（同じグループのみ）
+
+def _merge_stats(dst: dict, src: dict) -> None:
+    for k, v in src.items():
+        if isinstance(v, list): dst.setdefault(k, []).extend(v)
+        else: dst[k] = dst.get(k, 0) + v
+
+# ===== プロセスプールへのキャンセル通知 =====
+# ワーカーは親スレッドの is_canceled を見られないので、プール起動時に共有の整数（new_cancel_flag）を
+# init_pool_worker で渡しておく。親はキャンセルされたバッチの番号をそこへ書き、ワーカーはファイルごと
+# （アーカイブはメンバーごと）にそれを見て止まる。プールは共有のまま、次のバッチは別の番号で動く。
+_CANCEL_POLL = 0.1  # 親がキャンセルを確かめる間隔（秒）
+_pool_cancel = None  # ワーカー側: init_pool_worker で受け取った共有の整数
+
+def new_cancel_flag():
+    """ProcessPoolExecutor(initializer=init_pool_worker, initargs=(flag,)) に渡す共有の整数"""
+    return multiprocessing.Value("q", 0, lock=False)
+
+def init_pool_worker(flag) -> None:
+    global _pool_cancel
+    _pool_cancel = flag
+
+def _process_chunk(items: list, src_root: Path, dst_root: Path, settings: dict, batch_id: int = 0):
+    """executor 上で同じ実効設定のファイルをまとめて処理する（ワーカー内でパイプラインを使い回す）。
+    キャンセルされたら処理済みの分だけを返す"""
+    stats = init_stats(); pipeline = compile_pipeline(settings)
+    flag = _pool_cancel
+    canceled = (lambda: flag.value == batch_id) if batch_id and flag is not None else None
+    results = []
+    for p, rel in items:
+        if canceled and canceled():
+            break
+        try:
+            results.append((rel, process_file(p, src_root, dst_root, settings, stats, canceled, pipeline)))
+        except ArchiveCanceled:
+            break
+    return results, stats
+
+def _batch_groups(in_dir: str, settings: dict) -> list:
+    """[(実効設定, [(パス, 相対パス), ...] または iterator), ...]。ルールが無ければ1グループ"""
+    rules = ruleset_for(settings)
+    if rules is None:
+        return [(settings, iter_batch_targets(in_dir, settings))]
+    groups: dict = {}
+    for p, rel in iter_batch_targets(in_dir, settings):
+        groups.setdefault(rules.group_key(rel), []).append((p, rel))
+    return [(rules.settings_for_key(k), items) for k, items in groups.items()]
+
 def process_directory(
     in_dir: str, out_dir: str, settings: dict,
     progress_callback: Optional[Callable[[], None]] = None,
-    is_canceled: Optional[Callable[[], bool]] = None
+    is_canceled: Optional[Callable[[], bool]] = None,
+    stats: Optional[dict] = None,
+    executor=None,
+    cancel_flag=None
 ) -> int:
+    """戻り値は処理できた件数（変更なしで書き込みを省いた分も含む）。
+    stats を渡すと written / unchanged / failed / timed_out / archive_members / binary の件数を加算し、
+    正規表現がタイムアウトしたファイルは stats["timed_out_files"]、バイナリと判定して飛ばしたファイルは
+    stats["binary_files"] に相対パスで残す。
+    settings["archives"] がONなら zip/tar/gz/bz2/xz も中身を展開せずに処理する。
+    settings["shard"] = (i, N) なら相対パスのハッシュが i 番目のシャードに当たるファイルだけを処理し、
+    settings["journal_dir"] があれば1ファイル1行の結果をそこへ書く（shards.merge_journals で集約）。
+    settings["rules"] / settings["rules_file"] があれば glob ごとの上書き（rules.py）を適用し、
+    同じ実効設定のファイルをまとめて、グループごとに1回だけパイプラインを用意して処理する。
+    executor（concurrent.futures）を渡すと、グループ内の BATCH_CHUNK 件ずつを並列に処理する
+    （各ワーカーでもパイプラインはグループ単位で使い回される）。プールを init_pool_worker で起動し、
+    その共有の整数を cancel_flag に渡せば、キャンセルは実行中のワーカーにもファイル/アーカイブのメンバー
+    単位で伝わる（渡さなければ投入済みの分は最後まで処理される）。
+    settings["diff_report_dir"] があれば、変更されたファイルの差分レポート（patch / ページ分けしたHTML）を
+    そこへ書き、書いたファイルを stats["diff_reports"] に残す（差分はワーカーが変換と同時に作る。report.py）。
+    設定中の正規表現が不正なら、1件も処理せずに PatternError を送出する。"""
+    validate_settings(settings)
     src_root = Path(in_dir); dst_root = Path(out_dir)
-    recursive = settings.get("recursive", True)
-    exts = settings.get("exts") or DEFAULT_TEXT_EXTS
-    count = 0
+    shard = tuple(settings["shard"]) if settings.get("shard") else None
+    stats = init_stats(stats)
+    groups = _batch_groups(in_dir, settings)
+    pipelines = [compile_pipeline(eff) for eff, _ in groups]  # 全グループの設定を先に検証
+    count = 0; canceled = False
+    report = bool(settings.get("diff_report_dir")); reported: list = []
+    if report:
+        start_report(settings)
 
-    for p in enumerate_target_files(in_dir, exts, recursive):
-        if is_canceled and is_canceled():
-            break
-        try:
-            rel = p.relative_to(src_root)
-        except Exception:
-            rel = p.name
+    def run_serial() -> Iterator[tuple[str, str]]:
+        nonlocal canceled
+        for (eff, items), pipeline in zip(groups, pipelines):
+            for p, rel in items:
+                if is_canceled and is_canceled():
+                    canceled = True; return
+                try:
+                    yield rel, process_file(p, src_root, dst_root, eff, stats, is_canceled, pipeline)
+                except ArchiveCanceled:
+                    canceled = True; return
+
+    def run_pool() -> Iterator[tuple[str, str]]:
+        nonlocal canceled
+        limit = max(2, 2 * (getattr(executor, "_max_workers", None) or 4))
+        chunks = ((eff, chunk) for eff, items in groups for chunk in _chunked(items, BATCH_CHUNK))
+        batch_id = int.from_bytes(os.urandom(7), "big") + 1 if cancel_flag is not None else 0
+        pending: set = set()
         try:
-            data = p.read_text(encoding="utf-8", errors="replace")
-            out = process_text(data, settings)
-            out_path = dst_root / rel
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(out, encoding="utf-8")
-            count += 1
-        except Exception:
-            # 1件失敗しても続行
-            pass
+            while True:
+                while len(pending) < limit and not canceled:
+                    nxt = next(chunks, None)
+                    if nxt is None: break
+                    pending.add(executor.submit(_process_chunk, nxt[1], src_root, dst_root, nxt[0], batch_id))
+                if not pending:
+                    return
+                # キャンセルに早く気付けるよう、チャンクの完了を待ちつつ定期的に確かめる
+                done, pending = futures_wait(pending, timeout=_CANCEL_POLL, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    if fut.cancelled(): continue
+                    results, part = fut.result()
+                    _merge_stats(stats, part)
+                    yield from results
+                if not canceled and is_canceled and is_canceled():
+                    canceled = True
+                    if cancel_flag is not None:
+                        cancel_flag.value = batch_id  # 実行中のワーカーは次のファイルの前で止まる
+                    for fut in pending: fut.cancel()
         finally:
+            for fut in pending: fut.cancel()
+            if pending: futures_wait(pending)
+
+    journal_dir = settings.get("journal_dir")
+    with (atomic_open(Path(journal_dir) / journal_name(shard)) if journal_dir else _no_journal()) as journal:
+        for rel, status in (run_pool() if executor is not None else run_serial()):
+            if status in PROCESSED_STATUSES:
+                count += 1
+                if report: reported.append(rel)
+            if journal:
+                journal.write(_journal_line({"path": rel, "status": status}))
             if progress_callback:
                 progress_callback()
+        # 最後まで処理した時だけまとめ行を書く（無ければ未完了シャードとして扱われる）
+        if journal and not canceled:
+            journal.write(_journal_line({"summary": {k: stats[k] for k in _STAT_COUNTERS},
+                                         "shard": list(shard) if shard else None}))
+    if report:
+        # キャンセル時もそこまでに処理したファイルの分は出す
+        stats["diff_reports"].extend(finish_report(settings, reported))
     return count
+
+def _chunked(items, n: int) -> Iterator[list]:
+    chunk = []
+    for it in items:
+        chunk.append(it)
+        if len(chunk) >= n:
+            yield chunk; chunk = []
+    if chunk:
+        yield chunk
+
+def _journal_line(rec: dict) -> bytes:
+    return json.dumps(rec, ensure_ascii=False).encode("utf-8") + b"\n"
+
+@contextmanager
+def _no_journal():
+    yield None
@@ -0,0 +1,78 @@
+import multiprocessing, re, threading, weakref
+from functools import lru_cache
+
+# ===== 正規表現を別プロセスで実行し、時間切れならプロセスごと止める =====
+# 標準の re は実行途中で止められないため、regex モジュールが無い環境ではユーザー入力の正規表現を
+# 常駐の子プロセスで実行する。時間内に返らなければ kill して、次の呼び出しで作り直す。
+# 子プロセスはスレッドごとに1つ（GUIのプレビューとバッチが互いを待たない）。
+# 子は spawn で起動する（スレッドを持つGUIプロセスからの fork を避ける。Windows/exe と同じ動き）。
+# そのため、これを使うスクリプトは if __name__ == "__main__": の中から処理を始めること。
+
+@lru_cache(maxsize=64)
+def _compile(pattern, flags: int):
+    return re.compile(pattern, flags)
+
+def _serve(conn) -> None:
+    """子プロセス側: (操作, パターン, フラグ, 引数) を受けて結果を返し続ける"""
+    while True:
+        try:
+            op, pattern, flags, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reg = _compile(pattern, flags)
+            if op == "sub":
+                res = reg.sub(args[0], args[1])
+            else:  # "lines": search が一致した行の番号
+                res = [i for i, ln in enumerate(args[0]) if reg.search(ln)]
+            conn.send((True, res))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_serve, args=(child,), name="textadj-regex",
+                                daemon=not multiprocessing.current_process().daemon)
+        self.proc.start()
+        child.close()
+        # スレッドが終わって参照が無くなったら子も止める
+        self._finalizer = weakref.finalize(self, _stop, self.proc, self.conn)
+
+    def kill(self) -> None:
+        self._finalizer()
+
+def _stop(proc, conn) -> None:
+    try:
+        proc.kill(); proc.join()
+    finally:
+        conn.close()
+
+_local = threading.local()
+
+def run_isolated(op: str, pattern, flags: int, args: tuple, timeout: float):
+    """子プロセスで op（"sub" / "lines"）を実行する。timeout 秒を超えたら子を止めて TimeoutError。
+    実行中の例外（置換文字列の誤りなど）は ValueError にして送出する"""
+    w = getattr(_local, "worker", None)
+    if w is None or not w.proc.is_alive():
+        w = _local.worker = _Worker()
+    try:
+        w.conn.send((op, pattern, flags, args))
+        ready = w.conn.poll(timeout)
+    except (OSError, EOFError):
+        ready = False
+    if not ready:
+        _local.worker = None
+        w.kill()
+        raise TimeoutError(f"正規表現が {timeout:g} 秒以内に終わりませんでした")
+    try:
+        ok, res = w.conn.recv()
+    except (OSError, EOFError):
+        # 子が異常終了した（起動に失敗した場合も含む）
+        _local.worker = None
+        w.kill()
+        raise ValueError("正規表現を実行する子プロセスが終了しました") from None
+    if not ok:
+        raise ValueError(res)
+    return res
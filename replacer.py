@@ -0,0 +1,229 @@
+import hashlib, json, os, re
+from pathlib import Path
+from typing import Optional
+
+# ===== 置換辞書（大量のリテラル/正規表現を1パスで適用） =====
+# リテラルはトライ木を1本の正規表現に変換する（各分岐の先頭文字が異なり、語尾は貪欲な省略可能グループ
+# なので、同じ開始位置では最長一致・全体では最左一致になる）。正規表現は名前付きグループで1本に束ねる。
+# どちらも re.sub 1回で全文を走査するため、エントリ数に比例した全文の繰り返し走査は起きない。
+# 適用順は「リテラル → 正規表現」。正規表現同士が同じ位置で一致した場合は辞書の先の行が優先。
+# 束ねる時は各エントリのグループ番号（\1 や (?(1)..)）を束ねた式での番号へずらし、名前付きグループには
+# エントリごとの接頭辞を付ける（置換テンプレートは一致したエントリ単体で照合し直して展開する）。
+# 正規表現は processor の compile_user_regex / guarded_sub を通す（検証と時間上限。循環 import を避けて遅延 import）。
+# それでも束ねられない場合（グループ番号が 99 を超える等）は1件ずつ順に適用する。
+
+_REGEX_FLAGS = {"1", "true", "yes", "re", "regex"}
+_MAX_COMPILED = 8  # 保持するコンパイル済み辞書の数
+
+class DictionaryError(ValueError):
+    """置換辞書の読み込み/解釈に失敗した"""
+
+def parse_dictionary(data: bytes, suffix: str) -> list:
+    """辞書ファイルの中身を [(検索, 置換, 正規表現か), ...] にする。
+    TSV: 「検索<TAB>置換[<TAB>regex]」、#で始まる行はコメント。
+    JSON: {"検索": "置換", ...} または [{"find": .., "replace": .., "regex": bool}, ...]"""
+    text = data.decode("utf-8-sig")
+    entries = []
+    if suffix.lower() == ".json":
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise DictionaryError(f"置換辞書のJSONが不正です: {e}") from None
+        if isinstance(obj, dict):
+            entries = [(str(k), str(v), False) for k, v in obj.items()]
+        elif isinstance(obj, list):
+            for it in obj:
+                if not isinstance(it, dict) or "find" not in it:
+                    raise DictionaryError(f"置換辞書の要素に find がありません: {it!r}")
+                entries.append((str(it["find"]), str(it.get("replace", "")), bool(it.get("regex", False))))
+        else:
+            raise DictionaryError("置換辞書のJSONはオブジェクトか配列にしてください")
+    else:
+        for ln in text.splitlines():
+            if not ln or ln.startswith("#"):
+                continue
+            cols = ln.split("\t")
+            flag = len(cols) >= 3 and cols[2].strip().lower() in _REGEX_FLAGS
+            entries.append((cols[0], cols[1] if len(cols) > 1 else "", flag))
+    return [e for e in entries if e[0]]
+
+def _trie_pattern(words) -> str:
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # 語の終わり
+    def build(node: dict) -> Optional[str]:
+        if "" in node and len(node) == 1:
+            return None
+        alts, chars = [], []
+        for ch in sorted(k for k in node if k):
+            sub = build(node[ch])
+            if sub is None:
+                chars.append(re.escape(ch))
+            else:
+                alts.append(re.escape(ch) + sub)
+        only_chars = not alts
+        if chars:
+            alts.append(chars[0] if len(chars) == 1 else "[" + "".join(chars) + "]")
+        out = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            # ここで終わる語もある → 続きは省略可能（貪欲なので長い方を先に試す）
+            out = (out if only_chars and len(alts) == 1 else "(?:" + out + ")") + "?"
+        return out
+    return build(trie) or ""
+
+_LEADING_FLAGS_RE = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+def _scoped(pat: str) -> str:
+    """先頭のグローバルフラグ (?i) などを束ねても有効な (?i:...) に書き換える"""
+    m = _LEADING_FLAGS_RE.match(pat)
+    if m:
+        return f"(?{m.group(1)}:{pat[m.end():]})"
+    return pat
+
+_DIGITS = "0123456789"
+_OCTAL = "01234567"
+_GROUP_NAME_RE = re.compile(r"\(\?P([<=])(\w+)([>)])")   # (?P<name> / (?P=name)
+_GROUP_COND_RE = re.compile(r"\(\?\((\w+)\)")          # (?(1)..) / (?(name)..)
+
+def _group_ref(ref: str, offset: int, prefix: str) -> str:
+    if ref[0] in _DIGITS:
+        num = int(ref) + offset
+        if num > 99:
+            raise ValueError("グループ番号が多すぎて束ねられません")
+        return str(num)
+    return prefix + ref
+
+def _shift_groups(pat: str, offset: int, prefix: str) -> str:
+    """束ねた式の中でも同じ意味になるよう、番号の後方参照を offset ずらし、グループ名に prefix を付ける"""
+    out = []; i = 0; n = len(pat); in_class = False
+    while i < n:
+        c = pat[i]
+        if c == "\\":
+            d = pat[i + 1:i + 2]
+            if not in_class and d and d in _DIGITS and d != "0":
+                if len(pat[i + 1:i + 4]) == 3 and all(ch in _OCTAL for ch in pat[i + 1:i + 4]):
+                    out.append(pat[i:i + 4]); i += 4  # 8進数の文字
+                    continue
+                j = i + 3 if pat[i + 2:i + 3] and pat[i + 2] in _DIGITS else i + 2
+                # (?:..) で囲み、後ろの数字と続けて読まれないようにする
+                out.append(f"(?:\\{_group_ref(pat[i + 1:j], offset, prefix)})"); i = j
+                continue
+            out.append(pat[i:i + 2]); i += 2
+        elif in_class:
+            if c == "]":
+                in_class = False
+            out.append(c); i += 1
+        elif c == "[":
+            j = i + 1
+            if pat[j:j + 1] == "^": j += 1
+            if pat[j:j + 1] == "]": j += 1  # 先頭の ] は文字
+            out.append(pat[i:j]); i = j; in_class = True
+        elif c == "(":
+            m = _GROUP_NAME_RE.match(pat, i) or _GROUP_COND_RE.match(pat, i)
+            if m is None:
+                out.append(c); i += 1
+            elif m.re is _GROUP_NAME_RE:
+                out.append(f"(?P{m.group(1)}{prefix}{m.group(2)}{m.group(3)}"); i = m.end()
+            else:
+                out.append(f"(?({_group_ref(m.group(1), offset, prefix)})"); i = m.end()
+        else:
+            out.append(c); i += 1
+    return "".join(out)
+
+class _EntryRepl:
+    """束ねた式の一致を、一致したエントリの置換テンプレートで展開する。
+    子プロセス（regexworker）へ渡せるよう、関数ではなくモジュール直下のクラスにしている"""
+    def __init__(self, entries: list):
+        self.entries = entries  # [(検索パターン, 置換テンプレート)]
+
+    def __call__(self, m) -> str:
+        find, template = self.entries[int(m.lastgroup[2:])]
+        if "\\" not in template:
+            return template
+        # グループ番号は束ねた式ではずれるので、該当エントリ単体で同じ位置を照合して展開（同じ実装の正規表現で）
+        if isinstance(m.re, re.Pattern):
+            rx = re.compile(find, re.MULTILINE)
+        else:
+            import regex
+            rx = regex.compile(find, re.MULTILINE)
+        return rx.match(m.string, m.start()).expand(template)
+
+class Replacer:
+    def __init__(self, entries: list):
+        self.literals: dict = {}
+        for find, repl, is_re in entries:
+            if not is_re:
+                self.literals.setdefault(find, repl)  # 同じ検索語は先の行を優先
+        self._lit_re = re.compile(_trie_pattern(self.literals)) if self.literals else None
+
+        from processor import compile_user_regex, PatternError
+        self._rx = [(find, repl) for find, repl, is_re in entries if is_re]  # [(検索パターン, 置換テンプレート)]
+        parts = []; group = 1
+        for i, (find, _) in enumerate(self._rx):
+            try:
+                groups = compile_user_regex(find, re.MULTILINE).groups
+            except PatternError as e:
+                raise DictionaryError(f"置換辞書の{e}") from None
+            if parts is not None:
+                try:
+                    parts.append(f"(?P<_r{i}>{_shift_groups(_scoped(find), group, f'_r{i}_')})")
+                except ValueError:
+                    parts = None
+            group += 1 + groups
+        self._fused = None
+        if self._rx and parts:
+            fused = "|".join(parts)
+            try:
+                compile_user_regex(fused, re.MULTILINE)
+                self._fused = fused
+            except PatternError:
+                pass  # 束ねられない → 1件ずつ適用
+        self._repl = _EntryRepl(self._rx)
+
+    def _literal_sub(self, m) -> str:
+        return self.literals[m.group(0)]
+
+    def apply(self, text: str, timeout: Optional[float] = None) -> str:
+        """辞書を適用する。正規表現は timeout 秒（省略時は processor.REGEX_TIMEOUT）を超えると PatternTimeout"""
+        from processor import guarded_sub, REGEX_TIMEOUT
+        if timeout is None:
+            timeout = REGEX_TIMEOUT
+        if self._lit_re is not None:
+            text = self._lit_re.sub(self._literal_sub, text)
+        if self._fused is not None:
+            text = guarded_sub(self._fused, re.MULTILINE, self._repl, text, timeout)
+        else:
+            for find, template in self._rx:
+                text = guarded_sub(find, re.MULTILINE, template, text, timeout)
+        return text
+
+_compiled: dict = {}     # 内容ハッシュ -> Replacer
+_signatures: dict = {}   # (path, mtime_ns, size) -> 内容ハッシュ
+
+def dictionary_signature(path: str) -> Optional[tuple]:
+    """辞書ファイルの (mtime_ns, size)。設定の指紋に混ぜて、辞書の更新でキャッシュを外すのに使う"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def load_replacer(path: str) -> Replacer:
+    """辞書ファイルを読み込んでコンパイル。内容ハッシュが同じなら以前のものを再利用する"""
+    sig = dictionary_signature(path)
+    if sig is None:
+        raise DictionaryError(f"置換辞書が見つかりません: {path}")
+    digest = _signatures.get((path, sig))
+    if digest is None or digest not in _compiled:
+        data = Path(path).read_bytes()
+        digest = hashlib.sha1(data).hexdigest()
+        _signatures[(path, sig)] = digest
+        if digest not in _compiled:
+            replacer = Replacer(parse_dictionary(data, Path(path).suffix))
+            while len(_compiled) >= _MAX_COMPILED:
+                _compiled.pop(next(iter(_compiled)))
+            _compiled[digest] = replacer
+    return _compiled[digest]
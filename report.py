@@ -0,0 +1,140 @@
+import difflib, hashlib, html, re, shutil
+from pathlib import Path
+from typing import Iterable, Optional
+from diffview import DIFF_STYLE, diff_lines_html
+from utils import atomic_open
+
+# ===== バッチの差分レポート =====
+# settings["diff_report_dir"] があれば、バッチで内容が変わったファイルの差分をそのフォルダへ出力する。
+# settings["diff_report_formats"] は ("patch", "html") の部分集合（省略時は両方）:
+#   changes.patch              : unified diff（a/相対パス → b/相対パス。patch -p1 で出力側に当てられる形）
+#   index.html / page-0001.html… : 左右並びの差分（プレビューと同じ配色）。1ページ REPORT_PAGE_FILES 件
+# 差分はファイルを変換したワーカー（プロセス）がその場で作り、作業フォルダへ1ファイル1つずつ書く。
+# 親はバッチの最後に相対パス順に連結するだけなので、全ファイルの差分をメモリに溜めない。
+# REPORT_MAX_BYTES より大きいファイルは差分を作らず、省略した旨だけ載せる。
+# シャード実行時は出力名に shard-i-of-N- を付ける（同じフォルダへ各シャードが書ける）。
+# settings["diff_report_name"] があれば出力名の先頭に「名前-」を付ける（複数の入力フォルダを
+# 同じ出力フォルダへ処理する時に、ジョブごとのレポートが上書きし合わないように）。
+
+REPORT_DIRNAME = ".textadjustment-report"
+REPORT_FORMATS = ("patch", "html")
+REPORT_PAGE_FILES = 50
+REPORT_MAX_BYTES = 4 * 1024 * 1024
+
+_PAGE_STYLE = (
+    DIFF_STYLE +
+    "h2{font-size:1em;margin:1.5em 0 .3em;} nav{margin:.5em 0;}"
+    "table.pair{width:100%;border-collapse:collapse;table-layout:fixed;}"
+    "table.pair td{vertical-align:top;border:1px solid #ccc;padding:2px 4px;}"
+)
+
+def _formats(settings: dict) -> tuple:
+    return tuple(f for f in REPORT_FORMATS if f in (settings.get("diff_report_formats") or REPORT_FORMATS))
+
+def _prefix(settings: dict) -> str:
+    name = settings.get("diff_report_name"); shard = settings.get("shard")
+    return (f"{name}-" if name else "") + (f"shard-{shard[0]:05d}-of-{shard[1]:05d}-" if shard else "")
+
+def _parts_dir(settings: dict) -> Path:
+    return Path(settings["diff_report_dir"]) / f".parts-{_prefix(settings) or 'all'}"
+
+def _part_name(rel: str) -> str:
+    return hashlib.sha1(rel.encode("utf-8", "surrogatepass")).hexdigest()
+
+def _unified(rel: str, src_text: str, dst_text: str) -> str:
+    out = []
+    for ln in difflib.unified_diff(src_text.splitlines(keepends=True), dst_text.splitlines(keepends=True),
+                                   f"a/{rel}", f"b/{rel}"):
+        out.append(ln if ln.endswith("\n") else ln + "\n\\ No newline at end of file\n")
+    return "".join(out)
+
+def start_report(settings: dict) -> None:
+    """前回の作業フォルダが残っていれば消す（バッチ開始時に親で呼ぶ）"""
+    shutil.rmtree(_parts_dir(settings), ignore_errors=True)
+
+def write_diff_part(settings: dict, rel: str, src_text: str, dst_text: str) -> bool:
+    """1ファイル分の差分を作業フォルダへ書く（ワーカー側で呼ぶ）。内容が同じなら何もせず False"""
+    if src_text == dst_text:
+        return False
+    big = max(len(src_text), len(dst_text)) > REPORT_MAX_BYTES
+    _write_part(settings, rel, src_text, dst_text, big)
+    return True
+
+def write_omitted_part(settings: dict, rel: str) -> None:
+    """差分を作らずに「大きいファイルのため省略」とだけ載せる（全体を読まずに処理したファイル用）"""
+    _write_part(settings, rel, "", "", True)
+
+def _write_part(settings: dict, rel: str, src_text: str, dst_text: str, big: bool) -> None:
+    parts = _parts_dir(settings); parts.mkdir(parents=True, exist_ok=True)
+    name = _part_name(rel); formats = _formats(settings)
+    if "patch" in formats:
+        body = f"# 差分省略（大きいファイル）: {rel}\n" if big else _unified(rel, src_text, dst_text)
+        (parts / f"{name}.patch").write_bytes(body.encode("utf-8", "surrogateescape"))
+    if "html" in formats:
+        if big:
+            cells = "<td colspan='2'>大きいファイルのため差分は省略しました</td>"
+        else:
+            left, right = diff_lines_html(src_text, dst_text)
+            cells = f"<td>{left}</td><td>{right}</td>"
+        section = (f"<section id='{name}'><h2>{html.escape(rel)}</h2>"
+                   f"<table class='pair'><tr>{cells}</tr></table></section>\n")
+        (parts / f"{name}.html").write_bytes(section.encode("utf-8", "surrogateescape"))
+
+def _page_head(title: str) -> bytes:
+    return (f"<html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+            f"<style>{_PAGE_STYLE}</style></head><body>\n").encode("utf-8")
+
+def _nav(prefix: str, page: int, pages: int) -> bytes:
+    links = [f"<a href='{prefix}index.html'>一覧</a>"]
+    if page > 1: links.append(f"<a href='{prefix}page-{page - 1:04d}.html'>前へ</a>")
+    if page < pages: links.append(f"<a href='{prefix}page-{page + 1:04d}.html'>次へ</a>")
+    return f"<nav>{' | '.join(links)}（{page} / {pages}）</nav>\n".encode("utf-8")
+
+def finish_report(settings: dict, rels: Iterable[str]) -> list:
+    """ワーカーが書いた差分を相対パス順に連結してレポートにする（親で呼ぶ）。書いたファイルのパスを返す"""
+    parts = _parts_dir(settings); out_dir = Path(settings["diff_report_dir"])
+    prefix = _prefix(settings); formats = _formats(settings)
+    present = [(rel, _part_name(rel)) for rel in sorted(set(rels))
+               if any((parts / f"{_part_name(rel)}.{f}").exists() for f in formats)]
+    written = []
+    try:
+        if "patch" in formats:
+            path = out_dir / f"{prefix}changes.patch"
+            with atomic_open(path) as out:
+                for _, name in present:
+                    with open(parts / f"{name}.patch", "rb") as f:
+                        shutil.copyfileobj(f, out)
+            written.append(str(path))
+        if "html" in formats:
+            pages = max(1, -(-len(present) // REPORT_PAGE_FILES))
+            index = out_dir / f"{prefix}index.html"
+            with atomic_open(index) as idx:
+                idx.write(_page_head("差分レポート"))
+                idx.write(f"<h1>差分レポート</h1><p>変更されたファイル: {len(present)} 件</p><ol>\n".encode("utf-8"))
+                for page in range(1, pages + 1):
+                    chunk = present[(page - 1) * REPORT_PAGE_FILES: page * REPORT_PAGE_FILES]
+                    page_name = f"{prefix}page-{page:04d}.html"
+                    with atomic_open(out_dir / page_name) as out:
+                        out.write(_page_head(f"差分レポート {page}/{pages}")); out.write(_nav(prefix, page, pages))
+                        for rel, name in chunk:
+                            with open(parts / f"{name}.html", "rb") as f:
+                                shutil.copyfileobj(f, out)
+                            idx.write(f"<li><a href='{page_name}#{name}'>{html.escape(rel)}</a></li>\n"
+                                      .encode("utf-8", "surrogateescape"))
+                        out.write(_nav(prefix, page, pages)); out.write(b"</body></html>\n")
+                idx.write(b"</ol></body></html>\n")
+            written.append(str(index))
+    finally:
+        shutil.rmtree(parts, ignore_errors=True)
+    return written
+
+def report_settings(settings: dict, out_dir: str, formats: Optional[Iterable[str]] = None,
+                    name: Optional[str] = None) -> dict:
+    """出力フォルダの REPORT_DIRNAME へ差分レポートを書く設定を足したコピー（GUI/CLI用）。
+    name を渡すと出力名の先頭に付ける（ファイル名/リンクに使えない文字は _ にする）"""
+    s = dict(settings, diff_report_dir=str(Path(out_dir) / REPORT_DIRNAME))
+    if formats is not None:
+        s["diff_report_formats"] = list(formats)
+    if name:
+        s["diff_report_name"] = re.sub(r"[^\w.-]", "_", name)
+    return s
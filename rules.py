@@ -0,0 +1,67 @@
+import fnmatch, json
+from pathlib import Path
+from typing import Optional
+
+# ===== パスのパターン（glob）ごとの設定上書き =====
+# ルールファイル（JSON）:
+#   [{"glob": "*.csv", "settings": {"break_tokens": [], "width_mode": "to_half"}},
+#    {"glob": "logs/*.log", "settings": {"remove_blanks": false}}]
+# （{"rules": [...]} の形でも可）。glob に "/" を含まなければファイル名、含めば入力フォルダからの
+# 相対パス（/区切り）と照合する。fnmatch の * は / も含めて一致する。
+# 一致したルールを上から順に基本設定へ上書きする（後のルールが優先・キー単位の置き換え）。
+# 対象の列挙や実行単位に関わるキーは上書きできない。
+
+FIXED_KEYS = ("exts", "recursive", "archives", "shard", "journal_dir", "rules", "rules_file",
+              "diff_report_dir", "diff_report_formats", "diff_report_name")
+
+class RulesError(ValueError):
+    """ルールファイルの読み込み/解釈に失敗した"""
+
+def load_rules(path: str) -> list:
+    try:
+        obj = json.loads(Path(path).read_text(encoding="utf-8-sig"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise RulesError(f"ルールファイルを読み込めません: {path} ({e})") from None
+    if isinstance(obj, dict):
+        obj = obj.get("rules", [])
+    if not isinstance(obj, list):
+        raise RulesError("ルールファイルは配列か {\"rules\": [...]} にしてください")
+    for r in obj:
+        if not isinstance(r, dict) or not isinstance(r.get("glob"), str) \
+                or not isinstance(r.get("settings", {}), dict):
+            raise RulesError(f"ルールには glob（文字列）と settings（オブジェクト）が必要です: {r!r}")
+    return obj
+
+class RuleSet:
+    """基本設定とルール列から、ファイルごとの実効設定を求める。
+    一致したルールの組み合わせ（グループ）ごとに同じ dict を返すので、グループ単位で
+    compile_pipeline のキャッシュが効く。"""
+    def __init__(self, base: dict, rules: list):
+        self.base = base
+        self.rules = [(r["glob"], {k: v for k, v in r.get("settings", {}).items() if k not in FIXED_KEYS})
+                      for r in rules]
+        self._groups: dict = {}  # 一致したルール番号のタプル -> 実効設定
+
+    def group_key(self, rel: str) -> tuple:
+        name = rel.rsplit("/", 1)[-1]
+        return tuple(i for i, (g, _) in enumerate(self.rules)
+                     if fnmatch.fnmatch(rel if "/" in g else name, g))
+
+    def settings_for_key(self, key: tuple) -> dict:
+        eff = self._groups.get(key)
+        if eff is None:
+            eff = dict(self.base)
+            for i in key:
+                eff.update(self.rules[i][1])
+            self._groups[key] = eff
+        return eff
+
+    def settings_for(self, rel: str) -> dict:
+        return self.settings_for_key(self.group_key(rel))
+
+def ruleset_for(settings: dict) -> Optional[RuleSet]:
+    """settings["rules"]（ルールのリスト）か settings["rules_file"]（JSONのパス）があれば RuleSet"""
+    rules = settings.get("rules")
+    if rules is None and settings.get("rules_file"):
+        rules = load_rules(settings["rules_file"])
+    return RuleSet(settings, rules) if rules else None
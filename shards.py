@@ -0,0 +1,61 @@
+import hashlib, json
+from pathlib import Path
+from typing import Optional
+
+# ===== バッチの分割実行（複数マシン/プロセス） =====
+# 入力ルートからの相対パスの安定ハッシュで担当シャードを決める。
+# Python の hash() と違いプロセス・OSに依らず同じ値になるので、各ノードは
+# 同じ入力ツリーを列挙して自分の担当分だけを処理すればよい。
+
+JOURNAL_DIRNAME = ".textadjustment-journal"
+# process_file の結果のうち問題ではないもの（対象外のアーカイブ・バイナリとして飛ばしたものを含む）
+OK_STATUSES = ("written", "unchanged", "skipped", "binary")
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """シャード指定 "i/N"（1始まり）を (i, N) にする"""
+    try:
+        i, n = (int(x) for x in spec.split("/", 1))
+    except ValueError:
+        raise ValueError(f"シャード指定は i/N の形式です: {spec}") from None
+    if n < 1 or not 1 <= i <= n:
+        raise ValueError(f"シャード番号は 1..N の範囲です: {spec}")
+    return i, n
+
+def shard_of(rel_path: str, shard_count: int) -> int:
+    """相対パスの担当シャード（1始まり）。区切りは / に統一してハッシュする"""
+    key = str(rel_path).replace("\\", "/").encode("utf-8")
+    h = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+    return h % shard_count + 1
+
+def journal_name(shard: Optional[tuple[int, int]]) -> str:
+    if not shard:
+        return "journal.jsonl"
+    i, n = shard
+    return f"shard-{i:05d}-of-{n:05d}.jsonl"
+
+def merge_journals(journal_dir: str, report_path: Optional[str] = None) -> dict:
+    """各シャードのジャーナル（1行1ファイルのJSON Lines、最終行がまとめ）を1つのレポートにする。
+    途中で止まったシャードはジャーナルが残らないので missing_shards に出る。"""
+    totals: dict = {}; shards: dict = {}; problems: list = []
+    files = 0; shard_count = 0; done = set()
+    for jp in sorted(Path(journal_dir).glob("*.jsonl")):
+        with jp.open("r", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                if "summary" not in rec:
+                    files += 1
+                    if rec["status"] not in OK_STATUSES:
+                        problems.append(rec)
+                    continue
+                shards[jp.name] = rec["summary"]
+                if rec.get("shard"):
+                    done.add(rec["shard"][0]); shard_count = max(shard_count, rec["shard"][1])
+                for k, v in rec["summary"].items():
+                    if isinstance(v, int):
+                        totals[k] = totals.get(k, 0) + v
+    report = {"files": files, "totals": totals, "shards": shards,
+              "missing_shards": [i for i in range(1, shard_count + 1) if i not in done],
+              "problems": problems}
+    if report_path:
+        Path(report_path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return report
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# モジュールはリポジトリ直下に置いているので、そこを import パスに足す
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,26 @@
+import asyncio
+from pathlib import Path
+
+from aprocessor import aprocess_directory
+from processor import process_directory
+
+def test_async_batch_writes_the_same_diff_report(tmp_path: Path):
+    src = tmp_path / "in"; (src / "sub").mkdir(parents=True)
+    (src / "a.txt").write_text("abc\n", encoding="utf-8")
+    (src / "sub" / "b.txt").write_text("x。y\n", encoding="utf-8")
+    (src / "same.txt").write_text("", encoding="utf-8")
+    def settings(name):
+        return {"break_tokens": ["。"], "prefix": "> ", "diff_report_dir": str(tmp_path / name)}
+
+    async def run():
+        s = settings("arep")
+        events = [ev async for ev in aprocess_directory(str(src), str(tmp_path / "aout"), s)]
+        return events[-1]["stats"]
+    stats = asyncio.run(run())
+    process_directory(str(src), str(tmp_path / "out"), settings("rep"))
+
+    assert stats["diff_reports"]
+    patch = (tmp_path / "arep" / "changes.patch").read_text(encoding="utf-8")
+    assert "a/sub/b.txt" in patch and "same.txt" not in patch
+    assert patch == (tmp_path / "rep" / "changes.patch").read_text(encoding="utf-8")
+    assert not list((tmp_path / "arep").glob(".parts-*"))
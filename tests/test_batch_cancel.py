@@ -0,0 +1,37 @@
+import threading, time
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from processor import init_pool_worker, new_cancel_flag, process_directory
+
+@pytest.fixture
+def tree(tmp_path):
+    src = tmp_path / "in"; src.mkdir()
+    for i in range(400):
+        (src / f"f{i:03d}.txt").write_text(f"行{i}。次。\n" * 2000, encoding="utf-8")
+    return src, tmp_path / "out"
+
+def test_pool_batch_cancels_running_chunks(tree):
+    src, out = tree
+    flag = new_cancel_flag()
+    cancel = threading.Event()
+    done = 0
+    def progress():
+        nonlocal done
+        done += 1
+        if done == 5: cancel.set()
+    with ProcessPoolExecutor(max_workers=2, initializer=init_pool_worker, initargs=(flag,)) as ex:
+        stats: dict = {}
+        t0 = time.monotonic()
+        process_directory(str(src), str(out), {"break_tokens": ["。"]}, progress_callback=progress,
+                          is_canceled=cancel.is_set, stats=stats, executor=ex, cancel_flag=flag)
+        elapsed = time.monotonic() - t0
+    # 投入済みのチャンク（最大 2×2×16 件）を全部処理する前に止まる
+    assert stats["written"] < 64
+    assert elapsed < 10
+
+def test_pool_batch_without_cancel_processes_everything(tree):
+    src, out = tree
+    flag = new_cancel_flag()
+    with ProcessPoolExecutor(max_workers=2, initializer=init_pool_worker, initargs=(flag,)) as ex:
+        n = process_directory(str(src), str(out), {"break_tokens": ["。"]}, executor=ex, cancel_flag=flag)
+    assert n == 400
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from processor import decode_input, encode_output, process_bytes, process_text, transform_bytes
+from processor import transform_bytes as process_file_bytes
+
+# 高速経路（process_bytes）が使われた時は、str 経路と同じバイト列を返すこと
+PIECES = ["a", "b", "Z", "1", " ", "\t", "。", "、", "あ", "ｱ", "Ａ", "　", "\n", "\r\n", "\r",
+          "__SKIPLINE_1__", "#", "x", "END"]
+UNSAFE = ["\v", "\x0c", "\x1c", "\u2028", "\x85"]  # 高速経路を使わないはずの文字
+BAD_BYTES = [b"\xff", b"\xe3\x81", b"\x80"]
+
+def _random_raw(rng: random.Random) -> bytes:
+    ascii_only = rng.random() < 0.5
+    pieces = [p for p in PIECES if p.isascii()] if ascii_only else PIECES
+    text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 80)))
+    if rng.random() < 0.1:
+        pos = rng.randint(0, len(text))
+        text = text[:pos] + rng.choice(UNSAFE) + text[pos:]
+    raw = text.encode("utf-8")
+    if not ascii_only and rng.random() < 0.1:
+        pos = rng.randint(0, len(raw))
+        raw = raw[:pos] + rng.choice(BAD_BYTES) + raw[pos:]
+    return raw
+
+def _random_settings(rng: random.Random) -> dict:
+    s = {"width_mode": rng.choice(["none", "none", "to_half", "to_full"]),
+         "width_targets": "", "width_sets": {},
+         "skip_regex": rng.choice(["", "", r"^#", r"x$", "あ", r"\N{NUMBER SIGN}", r"\u0078$"]),
+         "break_mode": rng.choice(["after", "before", "around"]),
+         "prefix": rng.choice(["", "", "> ", "「"]),
+         "suffix": rng.choice(["", "", " <"]),
+         "remove_blanks": rng.random() < 0.4}
+    if rng.random() < 0.3:
+        s["break_tokens_are_regex"] = True
+        s["break_tokens"] = rng.choice([[r"b+"], [r"\d"], ["。"], [r"^a"], [r"\u0021"], [r"\U00000062"],
+                                        [r"\N{LATIN SMALL LETTER A}"]])
+    else:
+        s["break_tokens"] = rng.choice([[], ["。"], ["b", "ab"], ["END"]])
+        s["break_exclude_tokens"] = rng.choice([[], ["ab"], ["。。"]])
+    return s
+
+@pytest.mark.parametrize("newline", [None, "\r\n", "\n"])
+def test_process_bytes_matches_str_pipeline(newline):
+    rng = random.Random(35)
+    fast = 0
+    for _ in range(1500):
+        raw = _random_raw(rng); settings = _random_settings(rng)
+        out = process_bytes(raw, settings, newline)
+        if out is None:
+            continue
+        fast += 1
+        fmt = None if newline is None else ("utf-8", b"", newline)
+        assert out == encode_output(process_text(decode_input(raw), settings), fmt), (raw, settings)
+    assert fast > 200  # 高速経路が実際に試されていること
+
+@pytest.mark.parametrize("settings", [
+    {"break_tokens": [r"\u0021"], "break_tokens_are_regex": True},
+    {"break_tokens": [r"\N{EXCLAMATION MARK}"], "break_tokens_are_regex": True},
+    {"skip_regex": r"\N{NUMBER SIGN}", "prefix": "> "},
+    {"skip_regex": r"^\U00000023", "prefix": "> "},
+])
+def test_str_only_escapes_fall_back_to_str_path(settings):
+    # \u / \U / \N{..} は bytes の正規表現では使えない → 高速経路を使わずに str 経路で処理する
+    raw = b"#a!b\nc!d\n"
+    assert process_bytes(raw, settings) is None
+    assert transform_bytes(raw, settings) == encode_output(process_text(decode_input(raw), settings))
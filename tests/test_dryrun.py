@@ -0,0 +1,27 @@
+from pathlib import Path
+
+import pytest
+
+from dryrun import dry_run_directory, format_dry_run
+from processor import BATCH_CHUNK
+
+SETTINGS = {"width_mode": "to_half", "skip_binary": True}
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    for i in range(BATCH_CHUNK * 4):
+        (tmp_path / f"{i}.txt").write_text("ＡＢＣ　あいう\n" * 200, encoding="utf-8")
+    return tmp_path
+
+def test_estimate_divides_cpu_time_by_batch_workers(tree: Path):
+    serial = dry_run_directory(str(tree), SETTINGS, max_workers=1, batch_workers=1)
+    assert serial["workers"] == 1 and serial["estimated_seconds"] == serial["cpu_seconds"] > 0
+    par = dry_run_directory(str(tree), SETTINGS, max_workers=1, batch_workers=3)
+    assert par["workers"] == 3
+    assert par["estimated_seconds"] == pytest.approx(par["cpu_seconds"] / 3)
+    assert "÷ 3 並列" in format_dry_run(par)
+
+def test_parallelism_is_capped_by_batch_tasks(tree: Path):
+    # 4 タスク分（BATCH_CHUNK 件ずつ）しか無いので、それ以上のプロセスは効かない
+    report = dry_run_directory(str(tree), SETTINGS, max_workers=1, batch_workers=32)
+    assert report["workers"] == 4
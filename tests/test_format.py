@@ -0,0 +1,24 @@
+from processor import detect_format, decode_with_format, encode_output, process_file_with_diff, transform_bytes
+
+def test_detect_cp932_crlf_without_forced_encoding():
+    raw = "あいう\r\nえお\r\n".encode("cp932")
+    fmt = detect_format(raw)
+    assert fmt == ("cp932", b"", "\r\n")
+    assert decode_with_format(raw, fmt) == "あいう\nえお\n"
+
+def test_round_trip_keeps_bom_and_newline():
+    raw = b"\xef\xbb\xbf" + "a\r\nb\r\n".encode()
+    fmt = detect_format(raw)
+    assert encode_output(decode_with_format(raw, fmt), fmt) == raw
+
+def test_unchanged_text_returns_source_bytes():
+    raw = "かき\r\nくけ\nこ".encode("cp932")
+    assert transform_bytes(raw, {"preserve_format": True}) is raw
+
+def test_process_file_with_diff_reports_format(tmp_path):
+    src = tmp_path / "a.txt"; src.write_bytes("あい。う\r\n".encode("cp932"))
+    res = process_file_with_diff(str(src), str(tmp_path / "out.txt"),
+                                 {"preserve_format": True, "break_tokens": ["。"]}, 1 << 20)
+    assert res["fmt"] == ("cp932", b"", "\r\n")
+    assert res["src"] == "あい。う\n"
+    assert (tmp_path / "out.txt").read_bytes() == "あい。\r\nう\r\n".encode("cp932")
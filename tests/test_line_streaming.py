@@ -0,0 +1,39 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from processor import needs_line_streaming, process_file, transform_bytes
+
+BASE = {"dedupe_lines": True, "line_memory_mb": 1, "skip_binary": True}
+
+def _make_text(seed: int) -> str:
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "ｶﾀｶﾅ", "かな。", "ＡＢＣ", "", "  ", "skip:me", "x" * 70]
+    lines = [" ".join(rng.choice(words) for _ in range(rng.randint(0, 6))) for _ in range(30000)]
+    return "\n".join(lines) + ("\n" if seed % 2 else "")
+
+@pytest.mark.parametrize("extra", [
+    {},
+    {"dedupe_lines": False, "sort_lines": True},
+    {"sort_lines": True},
+    {"remove_blanks": True, "prefix": "> "},
+    {"wrap_width": 20, "break_tokens": ["。"], "break_mode": "after"},
+    {"skip_regex": r"^skip:", "width_mode": "to_full"},
+])
+@pytest.mark.parametrize("seed", [1, 2])
+def test_streamed_matches_whole_file(tmp_path: Path, extra: dict, seed: int):
+    settings = dict(BASE, **extra)
+    raw = _make_text(seed).replace("\n", "\r\n").encode("utf-8")
+    src = tmp_path / "in"; src.mkdir(); (src / "a.txt").write_bytes(raw)
+    assert needs_line_streaming(src / "a.txt", settings)
+    assert process_file(src / "a.txt", src, tmp_path / "out", settings) == "written"
+    assert (tmp_path / "out" / "a.txt").read_bytes() == transform_bytes(raw, settings)
+
+def test_streamed_preserves_format_and_skips_unchanged(tmp_path: Path):
+    settings = dict(BASE, preserve_format=True, skip_unchanged=True)
+    raw = _make_text(3).replace("\n", "\r\n").encode("cp932")
+    src = tmp_path / "in"; src.mkdir(); (src / "a.txt").write_bytes(raw)
+    assert process_file(src / "a.txt", src, tmp_path / "out", settings) == "written"
+    assert (tmp_path / "out" / "a.txt").read_bytes() == transform_bytes(raw, settings)
+    assert process_file(src / "a.txt", src, tmp_path / "out", settings) == "unchanged"
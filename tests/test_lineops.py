@@ -0,0 +1,19 @@
+import random
+
+import pytest
+
+from lineops import dedupe_and_sort
+
+def _random_text(rng: random.Random) -> str:
+    words = ["", "a", "b", "あ", "ｱ", "z" * 30, "\ud800", "x y", "😀"]
+    lines = [rng.choice(words) + str(rng.randint(0, 300)) * rng.randint(0, 1) for _ in range(rng.randint(1, 3000))]
+    return "\n".join(lines) + rng.choice(["", "\n"])
+
+@pytest.mark.parametrize("dedupe,sort", [(True, False), (False, True), (True, True)])
+def test_external_matches_in_memory(dedupe, sort):
+    # 上限を小さくして一時ファイルを使う経路にし、全行をメモリで処理した結果と比べる
+    rng = random.Random(44)
+    for _ in range(20):
+        text = _random_text(rng)
+        expected = dedupe_and_sort(text, dedupe, sort, 1 << 30)
+        assert dedupe_and_sort(text, dedupe, sort, 2048) == expected
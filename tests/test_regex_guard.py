@@ -0,0 +1,53 @@
+import time
+import pytest
+import processor
+from processor import PatternTimeout, process_text, validate_settings
+
+@pytest.fixture
+def stdlib_re(monkeypatch):
+    # regex モジュールが入っていても標準 re（子プロセスで実行）の経路を通す
+    monkeypatch.setattr(processor, "_regex_backend", None)
+
+@pytest.mark.parametrize("pattern", [r"(a|aa)+$", r"(a|a)*$", r"(.*a){25}$"])
+def test_catastrophic_pattern_times_out(stdlib_re, pattern):
+    settings = {"skip_regex": pattern, "regex_timeout": 0.5}
+    t0 = time.monotonic()
+    with pytest.raises(PatternTimeout):
+        process_text("a" * 40 + "b", settings)
+    assert time.monotonic() - t0 < 5
+
+def test_worker_recovers_after_timeout(stdlib_re):
+    with pytest.raises(PatternTimeout):
+        process_text("a" * 40 + "b", {"skip_regex": r"(a|aa)+$", "regex_timeout": 0.3})
+    assert process_text("x\n#y\nz", {"skip_regex": r"^#", "remove_blanks": True}) == "x\n#y\nz"
+
+def test_nested_quantifier_is_not_rejected(stdlib_re):
+    validate_settings({"skip_regex": r"(\w+\.)+com"})
+    out = process_text("www.example.com 。a", {"break_tokens": [r"(\w+\.)+com"],
+                                               "break_tokens_are_regex": True, "break_mode": "after"})
+    assert out == "www.example.com\n 。a"
+
+class _SlowBackend:
+    """regex モジュールの代わり。search は1行ごとに少し時間がかかり、渡された timeout を記録する"""
+    error = ValueError
+
+    def __init__(self):
+        self.timeouts = []
+
+    def compile(self, pattern, flags=0):
+        backend = self
+        class Pattern:
+            def search(self, s, timeout=None):
+                backend.timeouts.append(timeout)
+                time.sleep(0.02)
+                return None
+        return Pattern()
+
+def test_regex_backend_uses_one_deadline_for_all_lines(monkeypatch):
+    backend = _SlowBackend()
+    monkeypatch.setattr(processor, "_regex_backend", backend)
+    t0 = time.monotonic()
+    with pytest.raises(PatternTimeout):
+        processor.guarded_matching_lines("slow-per-line", 0, ["x"] * 500, timeout=0.3)
+    assert time.monotonic() - t0 < 1
+    assert backend.timeouts[-1] < backend.timeouts[0] <= 0.3  # 残り時間を渡している
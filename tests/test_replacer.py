@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+import processor
+from processor import PatternTimeout
+from replacer import DictionaryError, Replacer, parse_dictionary
+
+@pytest.fixture(params=["default", "stdlib_re"])
+def backend(request, monkeypatch):
+    # regex モジュールの有無に関わらず、標準 re（子プロセスで実行）の経路も通す
+    if request.param == "stdlib_re":
+        monkeypatch.setattr(processor, "_regex_backend", None)
+
+def test_longest_literal_wins(backend):
+    r = Replacer([("ab", "X", False), ("abc", "Y", False), ("b", "Z", False)])
+    assert r.apply("abcab b") == "YX Z"
+
+def test_first_literal_entry_wins_for_duplicates(backend):
+    assert Replacer([("a", "1", False), ("a", "2", False)]).apply("a") == "1"
+
+def test_literals_then_regex_in_dictionary_order(backend):
+    r = Replacer([("ab", "1", True), ("abc", "2", True), ("x", "ab", False)])
+    assert r.apply("abc x") == "1c 1"
+
+def test_numbered_backreference_after_other_entries(backend):
+    r = Replacer([("x", "X", True), (r"(a)\1", "Z", True)])
+    assert r.apply("aa x aa") == "Z X Z"
+
+def test_replacement_groups_and_named_groups(backend):
+    r = Replacer([(r"(x)(y)", "", True), (r"(\w)-(\w)", r"\2-\g<1>", True),
+                  (r"(?P<q>c)(?P=q)", "1", True), (r"(?P<q>d)(?P=q)", r"<\g<q>>", True),
+                  (r"(<)?e(?(1)>)", "E", True)])
+    assert r.apply("xy a-b cc dd <e> e") == " b-a 1 <d> E E"
+
+def test_octal_escape_and_class_are_not_renumbered(backend):
+    r = Replacer([("(q)", "Q", True), (r"\101[\1]", "ok", True)])
+    assert r.apply("A\x01 q") == "ok Q"
+
+def test_invalid_regex_is_a_dictionary_error():
+    with pytest.raises(DictionaryError):
+        Replacer([("(", "x", True)])
+
+def test_catastrophic_regex_times_out(backend):
+    r = Replacer([(r"(a|aa)+$", "x", True)])
+    t0 = time.monotonic()
+    with pytest.raises(PatternTimeout):
+        r.apply("a" * 40 + "b", timeout=0.5)
+    assert time.monotonic() - t0 < 5
+
+def test_parse_tsv_and_json():
+    assert parse_dictionary(b"# c\na\tb\nx+\ty\tregex\n", ".tsv") == [("a", "b", False), ("x+", "y", True)]
+    assert parse_dictionary(b'[{"find": "a", "replace": "b", "regex": true}]', ".json") == [("a", "b", True)]
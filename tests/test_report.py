@@ -0,0 +1,18 @@
+from pathlib import Path
+
+from processor import process_directory
+from report import REPORT_DIRNAME, report_settings
+
+def test_named_reports_for_jobs_sharing_an_output_dir(tmp_path: Path):
+    # GUI の複数フォルダD&Dと同じ: 入力フォルダごとのジョブが同じ出力フォルダへレポートを書く
+    out = tmp_path / "out"
+    for i, name in enumerate(["a b", "c#d"], 1):
+        src = tmp_path / name; src.mkdir()
+        (src / f"{i}.txt").write_text(f"x。{i}\n", encoding="utf-8")
+        s = report_settings({"break_tokens": ["。"]}, str(out), name=f"{i:02d}-{name}")
+        process_directory(str(src), str(out), s)
+    rep = out / REPORT_DIRNAME
+    assert "b/1.txt" in (rep / "01-a_b-changes.patch").read_text(encoding="utf-8")
+    assert "b/2.txt" in (rep / "02-c_d-changes.patch").read_text(encoding="utf-8")
+    assert "href='02-c_d-page-0001.html" in (rep / "02-c_d-index.html").read_text(encoding="utf-8")
+    assert not list(rep.glob(".parts-*"))
@@ -0,0 +1,38 @@
+import gzip, json, subprocess, sys
+from pathlib import Path
+
+from processor import process_directory
+from shards import JOURNAL_DIRNAME, merge_journals
+
+ROOT = Path(__file__).resolve().parent.parent
+SETTINGS = {"archives": True, "prefix": "> ", "break_tokens": ["。"]}
+
+def _make_tree(src: Path) -> None:
+    for i in range(40):
+        d = src / f"d{i % 4}"; d.mkdir(parents=True, exist_ok=True)
+        (d / f"f{i}.txt").write_text(f"line {i}。next\n" * (i % 3 + 1), encoding="utf-8")
+    (src / "image.txt").write_bytes(b"\x00\x01\x02" * 100)                # バイナリ → "binary"
+    (src / "data.bin.gz").write_bytes(gzip.compress(b"not a text member"))  # 対象外 → "skipped"
+
+def _tree(root: Path) -> dict:
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in root.rglob("*")
+            if p.is_file() and JOURNAL_DIRNAME not in p.parts}
+
+def test_parallel_shards_match_single_run(tmp_path: Path):
+    src = tmp_path / "in"; _make_tree(src)
+    process_directory(str(src), str(tmp_path / "single"), dict(SETTINGS))
+
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text(json.dumps(SETTINGS), encoding="utf-8")
+    out = tmp_path / "sharded"; n = 3
+    procs = [subprocess.Popen([sys.executable, str(ROOT / "cli.py"), str(src), str(out),
+                               "--settings", str(settings_file), "--shard", f"{i}/{n}"], cwd=ROOT)
+             for i in range(1, n + 1)]
+    assert [p.wait(timeout=120) for p in procs] == [0] * n
+
+    assert _tree(out) == _tree(tmp_path / "single")
+    report = merge_journals(str(out / JOURNAL_DIRNAME))
+    assert report["files"] == 42 and report["missing_shards"] == [] and report["problems"] == []
+    merged = subprocess.run([sys.executable, str(ROOT / "cli.py"), "--merge-journals", str(out / JOURNAL_DIRNAME)],
+                            cwd=ROOT, capture_output=True)
+    assert merged.returncode == 0
@@ -0,0 +1,21 @@
+import os
+from pathlib import Path
+
+from watch import FolderWatcher
+
+def test_unchanged_output_is_not_reprocessed_on_restart(tmp_path: Path):
+    src = tmp_path / "in"; out = tmp_path / "out"; src.mkdir()
+    f = src / "a.txt"; f.write_text("abc\n", encoding="utf-8")
+    settings = {"skip_unchanged": True, "prefix": "> "}
+    w = FolderWatcher(str(src), str(out), settings); w.prime()
+    assert w.poll() == [f] and w.stats["written"] == 1
+
+    # 内容は同じまま元が出力より新しくなった → 書き込みは省かれるが、出力の mtime は更新される
+    mtime = f.stat().st_mtime_ns - 10**10
+    os.utime(out / "a.txt", ns=(mtime, mtime))
+    w = FolderWatcher(str(src), str(out), settings); w.prime()
+    assert w.poll() == [f] and w.stats["unchanged"] == 1
+    assert (out / "a.txt").stat().st_mtime_ns >= f.stat().st_mtime_ns
+
+    w = FolderWatcher(str(src), str(out), settings); w.prime()
+    assert w.poll() == []
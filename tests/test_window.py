@@ -0,0 +1,42 @@
+import codecs
+
+import pytest
+
+from utils import line_cut, window_codec
+
+# 0x0A を文字の途中に含む文字（U+0A0A "ਊ", U+0A00, U+110A）を混ぜる
+TEXT = "ab\nਊ਀\nᄊc\n" * 50 + "ਊ਀"
+
+@pytest.mark.parametrize("enc,bom", [
+    ("utf-8", b""), ("utf-16-le", b""), ("utf-16-be", b""),
+    ("utf-16", codecs.BOM_UTF16_LE), ("utf-16", codecs.BOM_UTF16_BE),
+    ("utf-32", codecs.BOM_UTF32_LE), ("utf-32", codecs.BOM_UTF32_BE), ("utf-32-be", b""),
+])
+@pytest.mark.parametrize("size", [7, 16, 33, 64])
+def test_windows_cut_on_line_boundaries(enc: str, bom: bytes, size: int):
+    body_enc = {codecs.BOM_UTF16_LE: "utf-16-le", codecs.BOM_UTF16_BE: "utf-16-be",
+                codecs.BOM_UTF32_LE: "utf-32-le", codecs.BOM_UTF32_BE: "utf-32-be"}.get(bom, enc)
+    data = bom + TEXT.encode(body_enc)
+    window_enc, unit, newline = window_codec(data[:4], enc)
+    assert window_enc == body_enc
+    # gui の _read_window と同じ手順: size バイト読んで最後の改行で切り、続きから読む
+    offset, parts = len(bom), []
+    while offset < len(data):
+        raw = data[offset:offset + size]
+        if offset + size < len(data):
+            cut = line_cut(raw, unit, newline)
+            if cut >= 0:
+                raw = raw[:cut]
+                assert raw.decode(window_enc).endswith("\n")
+            else:
+                raw = data[offset:]  # 1行がウィンドウより長い → 残りを全部読む
+        parts.append(raw.decode(window_enc)); offset += len(raw)
+    assert "".join(parts) == TEXT
+
+def test_line_cut_skips_misaligned_newline_bytes():
+    raw = "ਊਊ".encode("utf-16-le")  # b"\x0a\x0a\x0a\x0a": 文字単位の改行は無い
+    assert line_cut(raw, 2, b"\n\x00") == -1
+    assert line_cut(b"a\nb", 1, b"\n") == 2
+
+def test_unknown_encoding_falls_back_to_bytes():
+    assert window_codec(b"", "no-such-codec") == ("no-such-codec", 1, b"\n")
@@ -0,0 +1,20 @@
+import pytest
+from processor import wrap_text
+
+@pytest.mark.parametrize("text, width, expected", [
+    ("あ", 1, "あ"),
+    ("aあ", 1, "a\nあ"),
+    ("aあ", 2, "a\nあ"),
+    ("ああ", 1, "あ\nあ"),
+    ("abcあ", 2, "ab\nc\nあ"),
+    ("あい。", 2, "あ\nい。"),
+])
+def test_trailing_wide_char_narrow_width(text, width, expected):
+    # 幅を超える全角が最後の1文字として残っても例外にならない
+    assert wrap_text(text, width) == expected
+
+def test_kinsoku_no_start_is_pushed_back():
+    assert wrap_text("あいうえ。", 8) == "あいう\nえ。"
+
+def test_width_zero_is_noop():
+    assert wrap_text("ああああ", 0) == "ああああ"
@@ -1,9 +1,189 @@
-import os, sys
+import os, sys, codecs, secrets
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
 
 def resource_path(relative_path: str) -> str:
     base_path = getattr(sys, '_MEIPASS', os.path.abspath("."))
     return os.path.join(base_path, relative_path)
 
-def is_text_like(p: Path, exts) -> bool:
-    return p.is_file() and p.suffix.lower() in {e.lower() for e in exts}
+def lower_exts(exts) -> frozenset:
+    """拡張子の一覧を小文字の集合にする（バッチ/ドロップごとに1回だけ作って is_text_like に渡す）"""
+    return frozenset(e.lower() for e in exts)
+
+def is_text_like(p: Path, exts_low: frozenset) -> bool:
+    """exts_low は lower_exts で作った小文字の拡張子の集合"""
+    return p.is_file() and p.suffix.lower() in exts_low
+
+# ===== バイナリ判定（先頭の数KBだけを見る） =====
+# NULバイト（BOM付きUTF-16/32は除く）、制御文字の割合、UTF-8 / CP932 として読めるかで判定する。
+# 判定結果は (パス, mtime, サイズ) ごとに覚えておき、変更のないファイルは読み直さない。
+SNIFF_BYTES = 8192
+SNIFF_CONTROL_RATIO = 0.10   # 改行・タブ等以外の制御文字がこれを超えたらバイナリ
+_SNIFF_CACHE_SIZE = 8192
+_TEXT_CONTROLS = bytes([7, 8, 9, 10, 11, 12, 13, 27])   # \a \b \t \n \v \f \r ESC
+_CONTROL_BYTES = bytes(b for b in range(32) if b not in _TEXT_CONTROLS) + b"\x7f"
+_WIDE_BOMS = (b"\xff\xfe", b"\xfe\xff")  # UTF-16/32（LE/BE）
+_sniff_cache: "OrderedDict[tuple, bool]" = OrderedDict()
+
+def _decodes(head: bytes, encoding: str) -> bool:
+    try:
+        head.decode(encoding)
+        return True
+    except UnicodeDecodeError as e:
+        # 読み込み範囲の末尾で多バイト文字が切れただけなら読めるとみなす
+        return e.start >= len(head) - 3
+
+def looks_binary(head: bytes) -> bool:
+    """先頭のバイト列がテキストらしくなければ True"""
+    if not head or head.startswith(_WIDE_BOMS):
+        return False
+    if b"\0" in head:
+        return True
+    if len(head) - len(head.translate(None, _CONTROL_BYTES)) > len(head) * SNIFF_CONTROL_RATIO:
+        return True
+    if head.isascii():
+        return False
+    return not (_decodes(head, "utf-8") or _decodes(head, "cp932"))
+
+def _sniff_key(path, st) -> tuple:
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+def _remember_sniff(key: tuple, verdict: bool) -> None:
+    _sniff_cache[key] = verdict
+    while len(_sniff_cache) > _SNIFF_CACHE_SIZE:
+        _sniff_cache.popitem(last=False)
+
+def is_binary_file(path: Path) -> bool:
+    """先頭 SNIFF_BYTES を見てバイナリか判定する（(パス, mtime, サイズ) ごとにキャッシュ）"""
+    try:
+        with open(path, "rb") as f:
+            key = _sniff_key(path, os.fstat(f.fileno()))
+            verdict = _sniff_cache.get(key)
+            if verdict is None:
+                verdict = looks_binary(f.read(SNIFF_BYTES))
+                _remember_sniff(key, verdict)
+            return verdict
+    except OSError:
+        return False
+
+def read_if_text(path: Path) -> Optional[bytes]:
+    """テキストならファイル全体のバイト列、バイナリなら None（全体は読まない）。判定は is_binary_file と共有"""
+    with open(path, "rb") as f:
+        key = _sniff_key(path, os.fstat(f.fileno()))
+        verdict = _sniff_cache.get(key)
+        if verdict is None:
+            head = f.read(SNIFF_BYTES)
+            verdict = looks_binary(head)
+            _remember_sniff(key, verdict)
+            if not verdict and len(head) < SNIFF_BYTES:
+                return head  # 小さいファイルは先頭の読み込みで全体
+            f.seek(0)
+        return None if verdict else f.read()
+
+# ===== 部分読み込み（ファイルの途中を行境界で切る） =====
+# UTF-16/32 では改行の 0x0A が文字の途中のバイトにも現れるので、改行を文字単位の位置でだけ探す。
+# 途中から読むウィンドウには BOM が無いため、バイト順を明示した文字コードでデコードする。
+def window_codec(head: bytes, enc: str) -> tuple[str, int, bytes]:
+    """(途中から読む時の文字コード, 1文字単位のバイト数, 改行のバイト列)。head はファイル先頭（BOM判定用）"""
+    try:
+        name = codecs.lookup(enc).name
+    except LookupError:
+        return enc, 1, b"\n"
+    if not name.startswith(("utf-16", "utf-32")):
+        return enc, 1, b"\n"
+    base = name[:6]
+    if name == base:  # バイト順は BOM で決まる（無ければ LE）
+        be = head.startswith(b"\xfe\xff") or head.startswith(b"\x00\x00\xfe\xff")
+        name = f"{base}-{'be' if be else 'le'}"
+    return name, 2 if base == "utf-16" else 4, "\n".encode(name)
+
+def line_cut(raw: bytes, unit: int = 1, newline: bytes = b"\n") -> int:
+    """raw の最後の改行の直後の位置（文字単位 unit に揃った改行だけを見る）。無ければ -1"""
+    end = len(raw)
+    while True:
+        i = raw.rfind(newline, 0, end)
+        if i < 0:
+            return -1
+        if i % unit == 0:
+            return i + len(newline)
+        end = i + len(newline) - 1  # 文字の途中だった → それより前から探し直す
+
+# ===== 書き込み（一時ファイル＋rename） =====
+def same_content(path: Path, data: bytes, chunk_size: int = 1 << 20) -> bool:
+    """既存ファイルが data と同一か。サイズを先に比べ、一致した時だけ中身を分割比較"""
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+        view = memoryview(data); pos = 0
+        with open(path, "rb") as f:
+            while True:
+                buf = f.read(chunk_size)
+                if not buf:
+                    return pos == len(data)
+                if view[pos:pos + len(buf)] != buf:
+                    return False
+                pos += len(buf)
+    except OSError:
+        return False
+
+@contextmanager
+def atomic_open(path: Path, fsync: bool = False):
+    """同じフォルダの一時ファイルへ書かせ、正常終了時のみ os.replace で差し替える。
+    例外（キャンセル含む）時は一時ファイルを消すので、途中まで書かれた出力は残らない。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.parent / f".{path.name}.{secrets.token_hex(4)}.tmp"
+    # mkstempだと0600になるので、umaskに従う通常の作成モードで開く
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            if fsync:
+                f.flush(); os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)  # 既存ファイルの権限を引き継ぐ
+        except OSError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+
+def atomic_write_bytes(path: Path, data: bytes, skip_unchanged: bool = False, fsync: bool = False) -> bool:
+    """data を原子的に書き込む。skip_unchanged で内容が同一なら書かずに False を返す"""
+    if skip_unchanged and same_content(path, data):
+        return False
+    with atomic_open(path, fsync=fsync) as f:
+        f.write(data)
+    return True
+
+# ===== メモリ上限付きLRU =====
+class LRUCache:
+    """合計サイズ（呼び出し側が申告するバイト数）が max_bytes を超えたら古い順に捨てるLRU"""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict = OrderedDict()  # key -> (value, size)
+        self._total = 0
+
+    def get(self, key, default=None):
+        item = self._items.get(key)
+        if item is None:
+            return default
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key, value, size: int) -> None:
+        if key in self._items:
+            self._total -= self._items.pop(key)[1]
+        if size > self.max_bytes:
+            return  # 1件で上限を超えるものは保持しない
+        self._items[key] = (value, size); self._total += size
+        while self._total > self.max_bytes:
+            _, (_, old) = self._items.popitem(last=False)
+            self._total -= old
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -0,0 +1,105 @@
+import os, threading, time
+from pathlib import Path
+from typing import Callable, Optional
+from processor import (
+    DEFAULT_TEXT_EXTS, PROCESSED_STATUSES, enumerate_target_files, process_file,
+    validate_settings, init_stats
+)
+from rules import ruleset_for
+
+# ===== フォルダ監視（ポーリング） =====
+# 入力フォルダを一定間隔で走査し、(mtime, size) が変わったファイルだけを出力ツリーへ再処理する。
+# 書き込み途中のファイルを拾わないよう、変化が debounce 秒止まってから処理する。
+# 変更から出力までの遅延はおおよそ interval + debounce 秒以内。
+# 開始時（prime）は出力の mtime が元より古いファイルを処理し直す。skip_unchanged で書き込みを省いた時も
+# 出力の mtime を更新しておき、内容の変わらない出力を起動のたびに処理し直さないようにする。
+
+WATCH_INTERVAL = 1.0
+WATCH_DEBOUNCE = 0.5
+
+class FolderWatcher:
+    def __init__(self, in_dir: str, out_dir: str, settings: dict,
+                 interval: float = WATCH_INTERVAL, debounce: float = WATCH_DEBOUNCE,
+                 on_processed: Optional[Callable[[Path, bool], None]] = None):
+        validate_settings(settings)  # 不正な正規表現は開始前に弾く
+        self.src_root = Path(in_dir); self.dst_root = Path(out_dir)
+        self.settings = settings
+        self.rules = ruleset_for(settings)  # glob ごとの上書き（あれば）
+        self.interval = interval; self.debounce = debounce
+        self.on_processed = on_processed
+        self.stats = init_stats()
+        self._seen: dict = {}     # path -> (mtime_ns, size)
+        self._pending: dict = {}  # path -> ((mtime_ns, size), 最後に変化を見た時刻)
+
+    def _scan(self) -> dict:
+        s = self.settings
+        snap = {}
+        for p in enumerate_target_files(str(self.src_root), s.get("exts") or DEFAULT_TEXT_EXTS,
+                                        s.get("recursive", True),
+                                        include_archives=s.get("archives", False)):
+            try:
+                st = p.stat()
+            except OSError:
+                continue  # 走査中に消えた
+            snap[p] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def _out_path(self, p: Path) -> Path:
+        try:
+            return self.dst_root / p.relative_to(self.src_root)
+        except ValueError:
+            return self.dst_root / p.name
+
+    def prime(self) -> None:
+        """現在の状態を基準にする。出力が無い/元より古いファイルだけ処理待ちに入れる"""
+        now = time.monotonic()
+        self._seen = self._scan()
+        for p, sig in self._seen.items():
+            try:
+                stale = os.stat(self._out_path(p)).st_mtime_ns < sig[0]
+            except OSError:
+                stale = True
+            if stale:
+                self._pending[p] = (sig, now - self.debounce)
+
+    def poll(self) -> list:
+        """1回走査し、落ち着いた変更ファイルを処理する。処理したパスを返す"""
+        now = time.monotonic()
+        snap = self._scan()
+        for p, sig in snap.items():
+            if self._seen.get(p) != sig:
+                self._pending[p] = (sig, now)  # 変化したら待ち時間をやり直す
+        self._seen = snap
+        done = []
+        for p, (sig, t) in list(self._pending.items()):
+            if snap.get(p) != sig:
+                if p not in snap: del self._pending[p]  # 削除された
+                continue
+            if now - t < self.debounce:
+                continue
+            del self._pending[p]
+            settings = self.settings
+            if self.rules:
+                settings = self.rules.settings_for(self._out_path(p).relative_to(self.dst_root).as_posix())
+            status = process_file(p, self.src_root, self.dst_root, settings, self.stats)
+            if status in ("skipped", "binary"):
+                continue
+            if status == "unchanged":
+                try:
+                    os.utime(self._out_path(p))  # 元より新しい出力として次回の prime で飛ばす
+                except OSError:
+                    pass
+            ok = status in PROCESSED_STATUSES
+            done.append(p)
+            if self.on_processed:
+                self.on_processed(p, ok)
+        return done
+
+    def run(self, stop_event: threading.Event) -> None:
+        """stop_event が立つまで監視を続ける"""
+        self.prime()
+        while not stop_event.is_set():
+            self.poll()
+            # 処理待ちがあれば debounce 経過に合わせて早めに見に行く
+            wait = min(self.interval, self.debounce) if self._pending else self.interval
+            stop_event.wait(wait)